@@ -0,0 +1,43 @@
+#Launch file of the person tracking pipeline.
+#   ros2 launch person_tracking person_tracking.launch.py composed:=true   -> camera, detector and trigger in one process (frames handed without copy)
+#   ros2 launch person_tracking person_tracking.launch.py composed:=false  -> one process per node, frames sent over ROS topics
+#   ros2 launch person_tracking person_tracking.launch.py num_threads:=8     -> threads of the multi-threaded executor of each process
+#   ros2 launch person_tracking person_tracking.launch.py trace_file:=~/trace.json -> latency trace written when the monitor stops
+from launch import LaunchDescription
+from launch.actions import DeclareLaunchArgument
+from launch.conditions import IfCondition, UnlessCondition
+from launch.substitutions import LaunchConfiguration
+from launch_ros.actions import Node
+
+
+def generate_launch_description():
+    composed = LaunchConfiguration('composed')
+    executor_parameters = [{'num_threads': LaunchConfiguration('num_threads')}]
+
+    return LaunchDescription([
+        DeclareLaunchArgument('composed', default_value='true',
+                              description='Run the camera, detector and trigger nodes in a single process'),
+        DeclareLaunchArgument('num_threads', default_value='4',
+                              description='Amount of threads of the executor of each process'),
+        DeclareLaunchArgument('trace_file', default_value='',
+                              description='Chrome trace file the latency monitor writes when it stops (empty: none)'),
+
+        #Composed mode
+        Node(package='person_tracking', executable='pipeline_node', output='screen', condition=IfCondition(composed),
+             parameters=executor_parameters),
+
+        #Distributed mode
+        Node(package='tello', executable='camera_pub', output='screen', condition=UnlessCondition(composed),
+             remappings=[('image_raw', '/camera/image_raw')]),
+        Node(package='person_tracking', executable='all_detected_node', output='screen', condition=UnlessCondition(composed),
+             parameters=executor_parameters),
+        Node(package='person_tracking', executable='trigger_node', output='screen', condition=UnlessCondition(composed),
+             parameters=executor_parameters),
+
+        #The tracker runs in its own process in both modes
+        Node(package='person_tracking', executable='tracker_node', output='screen', parameters=executor_parameters),
+
+        #Percentiles of the latency of each stage, on /diagnostics
+        Node(package='person_tracking', executable='latency_monitor', output='screen',
+             parameters=[{'trace_file': LaunchConfiguration('trace_file')}]),
+    ])
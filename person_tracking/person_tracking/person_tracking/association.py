@@ -0,0 +1,183 @@
+#To compute the cost matrices
+import numpy as np
+
+#To keep the associations of the last frames
+from collections import OrderedDict
+
+#Optimal assignment (Hungarian algorithm)
+from scipy.optimize import linear_sum_assignment
+
+
+def iou_matrix(boxes_a:np.ndarray, boxes_b:np.ndarray)->np.ndarray:
+    """Intersection over union between each box of boxes_a (M,4) and each box of boxes_b (N,4). Returns a (M,N) matrix.
+    Boxes are given as [x1, y1, x2, y2]"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    areas_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    areas_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / np.maximum(areas_a[:, None] + areas_b[None, :] - intersection, 1e-9)
+
+
+def center_distance_matrix(boxes_a:np.ndarray, boxes_b:np.ndarray)->np.ndarray:
+    """Euclidean distance between the center of each box of boxes_a (M,4) and the center of each box of boxes_b (N,4). Returns a (M,N) matrix"""
+    centers_a = (boxes_a[:, :2] + boxes_a[:, 2:]) / 2
+    centers_b = (boxes_b[:, :2] + boxes_b[:, 2:]) / 2
+    return np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2)
+
+
+def enclosing_boxes(boxes:np.ndarray, point_groups:np.ndarray)->np.ndarray:
+    """For each group of points (M,K,2), index of the tightest box of boxes (N,4) containing all of its points, or -1 if none does.
+    With several groups (e.g. the wrists of several persons doing a gesture), each group gets a different box, and the boxes are chosen
+    to minimize the total area. The tightest box is the right one when boxes overlap (a person in front of another, groups)."""
+    if len(boxes) == 0 or len(point_groups) == 0:
+        return np.full(len(point_groups), -1)
+    points = point_groups[:, None, :, :] #(M,1,K,2)
+    inside = (boxes[None, :, None, :2] <= points) & (points <= boxes[None, :, None, 2:]) #(M,N,K,2)
+    contains = np.all(inside, axis=(2, 3)) #(M,N)
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+
+    result = np.full(len(point_groups), -1)
+    if len(point_groups) == 1:
+        if contains[0].any():
+            result[0] = int(np.argmin(np.where(contains[0], areas, np.inf)))
+        return result
+
+    #Assignment of different boxes to the groups. Boxes not containing a group cost more than any possible assignment.
+    cost = np.where(contains, areas[None, :], areas.sum() + 1)
+    for row, column in zip(*linear_sum_assignment(cost)):
+        if contains[row, column]:
+            result[row] = column
+    return result
+
+
+class Track():
+    """A person followed across frames: its last box, the velocity of its box corners (per second),
+    the track ID given by the detector (-1 if none), and the amount of frames it has not been matched in."""
+
+    def __init__(self, track_id:int, box:np.ndarray, detector_id:int):
+        self.id = track_id
+        self.box = box
+        self.velocity = np.zeros(4)
+        self.detector_id = detector_id
+        self.misses = 0
+
+    def predict(self, dt:float)->np.ndarray:
+        """Box predicted dt seconds after the last update (constant velocity)"""
+        return self.box + self.velocity * dt
+
+
+class TargetAssociator():
+    """Associates the bounding boxes of each frame with the persons seen in the previous frames, and follows one of them: the target.
+    Every person is predicted with a constant-velocity model, then detections are assigned to persons:
+    - first by the track IDs of the detector, when they are available
+    - then by optimal assignment on a cost mixing IoU and center distance between predicted and detected boxes.
+    Following everybody (and not only the target) avoids switching to the nearest person when people overlap."""
+
+    def __init__(self, iou_weight:float=1.0, distance_weight:float=2.0, max_cost:float=1.5, max_misses:int=10, velocity_smoothing:float=0.5, history:int=10):
+        #Weights of the cost of assigning a detection to a person: iou_weight * (1 - IoU) + distance_weight * center distance
+        self.iou_weight = iou_weight
+        self.distance_weight = distance_weight
+
+        #Assignments costing more than max_cost are rejected
+        self.max_cost = max_cost
+
+        #Amount of frames after which a person who isn't matched anymore is forgotten
+        self.max_misses = max_misses
+
+        #Weight of the new measurement in the velocity estimation (exponential smoothing)
+        self.velocity_smoothing = velocity_smoothing
+
+        self.tracks = []
+        self.next_id = 0
+
+        #Track followed (None when there is no target)
+        self.target = None
+
+        #Track matched with each detection of the last frame
+        self.detection_tracks = []
+
+        #Tracks matched with the detections of the last 'history' frames, by frame ID,
+        #so that a detection of a frame older than the last one can still be made the target
+        self.history = history
+        self.frames = OrderedDict()
+
+        #Time (in seconds) of the last frame
+        self.last_time = None
+
+    def cost_matrix(self, predicted:np.ndarray, boxes:np.ndarray)->np.ndarray:
+        return self.iou_weight * (1 - iou_matrix(predicted, boxes)) + self.distance_weight * center_distance_matrix(predicted, boxes)
+
+    def update(self, boxes:np.ndarray, detector_ids:np.ndarray, time:float, frame_id=None)->None:
+        """Associates the normalized boxes (N,4) of a frame, with their detector track IDs (N,) (-1 if not tracked),
+        the time of the frame in seconds, and an optional ID of the frame (to lock a detection of this frame later)"""
+        dt = 0.0 if self.last_time is None else max(time - self.last_time, 0.0)
+        self.last_time = time
+
+        assigned = [None] * len(boxes)
+        free_tracks = list(self.tracks)
+
+        #Detector track IDs first
+        by_detector_id = {track.detector_id: track for track in self.tracks if track.detector_id >= 0}
+        for index, detector_id in enumerate(detector_ids.tolist()):
+            track = by_detector_id.get(detector_id)
+            if detector_id >= 0 and track is not None and track in free_tracks:
+                assigned[index] = track
+                free_tracks.remove(track)
+
+        #Optimal assignment of the remaining detections to the remaining persons
+        free_detections = [index for index in range(len(boxes)) if assigned[index] is None]
+        if free_tracks and free_detections:
+            predicted = np.array([track.predict(dt) for track in free_tracks])
+            cost = self.cost_matrix(predicted, boxes[free_detections])
+            for row, column in zip(*linear_sum_assignment(cost)):
+                if cost[row, column] <= self.max_cost:
+                    assigned[free_detections[column]] = free_tracks[row]
+
+        #Persons not matched: their box follows the prediction until they are forgotten
+        for track in free_tracks:
+            if track not in assigned:
+                track.misses += 1
+                track.box = track.predict(dt)
+
+        #Update of the persons matched, creation of the new ones
+        for index, track in enumerate(assigned):
+            if track is None:
+                track = Track(self.next_id, boxes[index].astype(np.float64), int(detector_ids[index]))
+                self.next_id += 1
+                self.tracks.append(track)
+                assigned[index] = track
+                continue
+            if dt > 0:
+                velocity = (boxes[index] - track.box) / dt
+                track.velocity = self.velocity_smoothing * velocity + (1 - self.velocity_smoothing) * track.velocity
+            track.box = boxes[index].astype(np.float64)
+            track.misses = 0
+            if detector_ids[index] >= 0:
+                track.detector_id = int(detector_ids[index])
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses or track is self.target]
+        self.detection_tracks = assigned
+        if frame_id is not None:
+            self.frames[frame_id] = assigned
+            while len(self.frames) > self.history:
+                self.frames.popitem(last=False)
+
+    def lock(self, index:int, frame_id=None)->bool:
+        """Makes the person of the detection 'index' of the last frame (or of the frame 'frame_id') the target.
+        Returns False if the frame is not known anymore"""
+        tracks = self.detection_tracks if frame_id is None else self.frames.get(frame_id)
+        if tracks is None or index >= len(tracks):
+            return False
+        self.target = tracks[index]
+        return True
+
+    def unlock(self)->None:
+        self.target = None
+
+    def target_index(self)->int|None:
+        """Index of the target's detection in the last frame, or None if the target wasn't detected in it"""
+        for index, track in enumerate(self.detection_tracks):
+            if track is self.target:
+                return index
+        return None
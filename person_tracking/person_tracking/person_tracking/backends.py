@@ -0,0 +1,169 @@
+#To handle the frames used for the warm-up
+from pathlib import Path
+
+import numpy as np
+
+#To share the loaded models between the nodes of a process, and time their loading
+from threading import Lock
+from time import perf_counter
+
+#NB: the YOLOv8 object detection framework (ultralytics) is only imported when a model is loaded, since importing it
+#(and PyTorch) takes several seconds. ultralytics runs .pt models with PyTorch, .onnx models with ONNX Runtime
+#and OpenVINO model directories with OpenVINO.
+
+
+class DetectorBackend():
+    """Object detection model running on CPU with PyTorch (eager mode).
+    The other backends export the YOLOv8 weights to another format and only change how the model is loaded and how many threads it uses,
+    so that DetectAll.detection() calls predict() the same way whatever the backend."""
+
+    name = "torch"
+
+    #Format given to YOLO.export() to create the model file of the backend. None when the weights are used directly
+    export_format = None
+
+    def __init__(self, weights:str, source_weights:str=None, threads:int=0, imgsz:int=640, warmup_runs:int=2, **kwargs):
+        self.weights = weights
+        self.source_weights = source_weights
+        self.threads = threads
+        self.imgsz = imgsz
+        self.warmup_runs = warmup_runs
+
+        #ultralytics YOLO model, and the file it was loaded from. Set by load()
+        self.model = None
+        self.model_path = None
+
+        #The same model can't run two inferences at the same time (the nodes of a process share it)
+        self.lock = Lock()
+
+        #Timings (in seconds) of the import of ultralytics, the loading of the model, and the first inference (during the warm-up)
+        self.import_time = None
+        self.load_time = None
+        self.first_inference_time = None
+        self.warmed_up = False
+
+    def load(self):
+        """Loads the model (exporting it first if the backend's model file doesn't exist yet) and returns it"""
+        start = perf_counter()
+        from ultralytics import YOLO
+        self.import_time = perf_counter() - start
+
+        start = perf_counter()
+        weights = self.weights
+        if self.export_format is not None and not Path(weights).exists():
+            #Dynamic shapes, so that the same file can run batches (multi-stream detector) and other input sizes (crops)
+            weights = YOLO(self.source_weights).export(format=self.export_format, imgsz=self.imgsz, dynamic=True)
+        self.model_path = str(weights)
+        self.model = YOLO(self.model_path, task="detect")
+        self.set_threads()
+        self.load_time = perf_counter() - start
+        return self.model
+
+    @property
+    def names(self)->dict:
+        """Class names of the model, by class id"""
+        return self.model.names
+
+    def set_threads(self)->None:
+        """Sets the amount of threads used by PyTorch for inference"""
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+
+    def set_runtime_threads(self)->None:
+        """Applies the amount of threads to the inference runtime, once ultralytics created it (during the first inference)"""
+
+    def warmup(self, classes:list=None)->None:
+        """Runs a few inferences on a blank frame, so that the first real frame isn't slowed down by lazy initializations
+        (predictor creation, memory allocation, runtime graph optimizations...).
+        The warm-up is only done once, even if several nodes share the backend."""
+        with self.lock:
+            if self.warmed_up:
+                return
+            frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+            for run in range(max(self.warmup_runs, 1)):
+                start = perf_counter()
+                self.model.predict(frame, classes=classes, imgsz=self.imgsz, verbose=False)
+                if run == 0:
+                    self.first_inference_time = perf_counter() - start
+                    self.set_runtime_threads()
+            self.warmed_up = True
+
+    def predict(self, frames, **kwargs):
+        with self.lock:
+            return self.model.predict(frames, imgsz=self.imgsz, **kwargs)
+
+
+class OnnxBackend(DetectorBackend):
+    """Object detection model exported to ONNX and run with ONNX Runtime"""
+
+    name = "onnx"
+    export_format = "onnx"
+
+    def set_threads(self)->None:
+        pass
+
+    def set_runtime_threads(self)->None:
+        """Recreates the ONNX Runtime session of ultralytics with the amount of intra-op threads wanted"""
+        if not self.threads:
+            return
+        import onnxruntime
+        runtime = self.model.predictor.model
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        runtime.session = onnxruntime.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class OpenVinoBackend(DetectorBackend):
+    """Object detection model exported to OpenVINO IR and run with OpenVINO"""
+
+    name = "openvino"
+    export_format = "openvino"
+
+    def set_threads(self)->None:
+        pass
+
+    def set_runtime_threads(self)->None:
+        """Recompiles the OpenVINO model of ultralytics for the CPU, with the amount of inference threads wanted"""
+        if not self.threads:
+            return
+        runtime = self.model.predictor.model
+        config = {"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": self.threads}
+        runtime.ov_compiled_model = runtime.core.compile_model(runtime.ov_model, device_name="CPU", config=config)
+
+
+#Available backends, by name (the 'backend' key of the detector section of config/config.yaml)
+backends = {backend.name: backend for backend in (DetectorBackend, OnnxBackend, OpenVinoBackend)}
+
+
+def make_backend(settings:dict)->DetectorBackend:
+    """Creates the backend described by the detector settings (see person_tracking.config.detector_config)"""
+    if settings["backend"] not in backends:
+        raise ValueError(f"Unknown detector backend '{settings['backend']}'. Available backends: {', '.join(backends)}")
+    return backends[settings["backend"]](**settings)
+
+
+#Backends already loaded in this process, by instance name and settings. They are shared by all the nodes of the process,
+#so that a node restarted in the same process gets its model back immediately.
+_loaded_backends = {}
+_loaded_backends_lock = Lock()
+
+
+def get_backend(settings:dict, logger=None, instance:str="default")->DetectorBackend:
+    """Returns the loaded backend described by the detector settings, loading it on the first call only.
+    Backends with different instance names are different models, that can run at the same time (each backend runs one inference at a time).
+    Backends only predict: the nodes track the detections with their own tracker (tello.model.Tracker), so that their track IDs never mix.
+    The import and loading times are logged with 'logger' when the backend is loaded."""
+    key = (instance,) + tuple(sorted(settings.items()))
+    with _loaded_backends_lock:
+        backend = _loaded_backends.get(key)
+        if backend is None:
+            backend = make_backend(settings)
+            backend.load()
+            _loaded_backends[key] = backend
+            if logger is not None:
+                logger.info(f"{backend.name} detector backend loaded: ultralytics imported in {backend.import_time:.2f}s, model {backend.model_path} loaded in {backend.load_time:.2f}s")
+        return backend
@@ -0,0 +1,112 @@
+#To group frames coming from several threads
+from threading import Condition
+from time import monotonic
+
+#Multi-object tracker of one stream
+from tello.model import Tracker
+
+
+class FrameBatcher():
+    """Groups the frames of several streams so that they can go through the object detection model in a single forward pass.
+    Each stream has its own latest-frame-wins slot: a frame replacing another one that was not batched yet is counted as dropped.
+    A batch is released as soon as max_batch_size streams have a frame waiting, or when the oldest waiting frame
+    has waited max_wait seconds."""
+
+    def __init__(self, max_batch_size:int, max_wait:float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._condition = Condition()
+
+        #Frames waiting to be batched, by stream id (insertion order = arrival order of the oldest waiting frames)
+        self._pending = {}
+
+        #Time at which the oldest waiting frame was received
+        self._oldest = None
+
+        self._closed = False
+
+        #Counters
+        self.received = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def put(self, stream_id, frame)->None:
+        """Adds the newest frame of a stream, replacing its previous waiting frame if any"""
+        with self._condition:
+            if stream_id in self._pending:
+                self.dropped += 1
+            elif not self._pending:
+                self._oldest = monotonic()
+            self._pending[stream_id] = frame
+            self.received += 1
+            self._condition.notify()
+
+    def next_batch(self, timeout:float=None)->list:
+        """Waits for the next batch and returns it as a list of (stream_id, frame) pairs.
+        Returns an empty list if no frame arrived before the timeout or if the batcher was closed."""
+        with self._condition:
+            end = None if timeout is None else monotonic() + timeout
+            while not self._closed:
+                if self._pending:
+                    if len(self._pending) >= self.max_batch_size:
+                        break
+                    remaining = self._oldest + self.max_wait - monotonic()
+                else:
+                    remaining = None if end is None else end - monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            #Streams are served in arrival order, the ones not fitting in the batch stay for the next one
+            batch = []
+            for stream_id in list(self._pending)[:self.max_batch_size]:
+                batch.append((stream_id, self._pending.pop(stream_id)))
+            self._oldest = monotonic() if self._pending else None
+            if batch:
+                self.batches += 1
+            return batch
+
+    def close(self)->None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self)->bool:
+        return self._closed
+
+
+class BatchDetector():
+    """Runs object detection on a batch of frames coming from different streams in one forward pass,
+    and tracks the objects of each stream with its own tracker, so that track IDs of different streams never mix.
+    This is the batched equivalent of model.track(frame, persist=True, ...) called separately on each stream."""
+
+    def __init__(self, backend, classes:list, minimum_prob:float, frame_rate:int=30):
+        #Detector backend (see person_tracking.backends)
+        self.backend = backend
+        self.classes = classes
+        self.minimum_prob = minimum_prob
+        self.frame_rate = frame_rate
+
+        #One tracker per stream id. They are created when a stream sends its first frame
+        self.trackers = {}
+
+    def tracker(self, stream_id)->Tracker:
+        """Multi-object tracker of a stream"""
+        if stream_id not in self.trackers:
+            self.trackers[stream_id] = Tracker(self.frame_rate)
+        return self.trackers[stream_id]
+
+    def reset(self, stream_id)->None:
+        """Forgets the tracks of a stream"""
+        self.trackers.pop(stream_id, None)
+
+    def detect(self, batch:list)->list:
+        """Performs object detection on a batch of (stream_id, frame) pairs.
+        Returns a list of (stream_id, results) pairs, where results are ultralytics Results with track IDs, in the batch order."""
+        if not batch:
+            return []
+        frames = [frame for _, frame in batch]
+        results = self.backend.predict(frames, classes=self.classes, conf=self.minimum_prob, verbose=False)
+        return [(stream_id, self.tracker(stream_id).update(result, frame)) for (stream_id, frame), result in zip(batch, results)]
@@ -0,0 +1,84 @@
+"""Benchmark of the detector backends (PyTorch, ONNX Runtime, OpenVINO) on the video clips of the media directory.
+For each backend, every clip is run through person detection frame by frame, and the FPS and p50/p99 latency are reported.
+Run it with: ros2 run person_tracking bench_backends [--frames N] [--threads N] [clip ...]"""
+
+#To read the arguments and the clips
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from person_tracking.config import detector_config, find_config_file
+from person_tracking.backends import backends
+
+
+def default_clips()->list:
+    """Video clips of the media directory of the repository"""
+    config_file = find_config_file()
+    if config_file is None:
+        return []
+    return sorted((config_file.parent.parent / "media").glob("*.mp4"))
+
+
+def backend_weights(name:str, source_weights:str)->str:
+    """Model file of a backend. The onnx and openvino files are the ones YOLO.export() creates from the PyTorch weights"""
+    stem = str(Path(source_weights).with_suffix(""))
+    return {"torch": source_weights, "onnx": stem + ".onnx", "openvino": stem + "_openvino_model"}[name]
+
+
+def run_clip(backend, path, classes:list, max_frames:int)->list:
+    """Runs person detection on the frames of a clip. Returns the latency of each frame in seconds."""
+    latencies = []
+    cap = cv2.VideoCapture(str(path))
+    while cap.isOpened() and len(latencies) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        start = perf_counter()
+        backend.predict(frame, classes=classes, verbose=False)
+        latencies.append(perf_counter() - start)
+    cap.release()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the FPS and latency of the detector backends")
+    parser.add_argument("clips", nargs="*", help="video clips (default: the clips of the media directory)")
+    parser.add_argument("--frames", type=int, default=200, help="maximum amount of frames per clip")
+    parser.add_argument("--threads", type=int, default=None, help="inference threads (default: the value of config/config.yaml)")
+    parser.add_argument("--backends", nargs="*", default=list(backends), help="backends to compare")
+    args = parser.parse_args()
+
+    clips = args.clips or default_clips()
+    if not clips:
+        print("No video clip found")
+        return
+
+    settings = detector_config()
+    if args.threads is not None:
+        settings["threads"] = args.threads
+
+    print(f"{'backend':>9} | {'clip':>32} | {'frames':>6} | {'FPS':>6} | {'p50 (ms)':>8} | {'p99 (ms)':>8}")
+    for name in args.backends:
+        backend_settings = dict(settings, backend=name, weights=backend_weights(name, settings["source_weights"]))
+        try:
+            backend = backends[name](**backend_settings)
+            backend.load()
+        except Exception as error: #a backend whose runtime isn't installed is skipped
+            print(f"{name:>9} | skipped: {error}")
+            continue
+        classes = [k for k,v in backend.names.items() if v == "person"]
+        backend.warmup(classes)
+
+        for clip in clips:
+            latencies = np.array(run_clip(backend, clip, classes, args.frames))
+            if latencies.size == 0:
+                continue
+            p50, p99 = np.percentile(latencies, (50, 99)) * 1000
+            print(f"{name:>9} | {Path(clip).name:>32} | {latencies.size:>6} | {latencies.size / latencies.sum():>6.1f} | {p50:>8.1f} | {p99:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Micro-benchmark of the construction of AllBoundingBoxes messages from detection arrays.
+Compares the previous per-box loop with person_tracking.boxes.boxes_msg for 1, 10 and 100 detections per frame.
+Run it with: ros2 run person_tracking bench_boxes"""
+
+#To time the message construction
+from timeit import Timer
+
+import numpy as np
+
+#Custom message to send bounding boxes
+from all_bounding_boxes_msg.msg import AllBoundingBoxes, Box
+
+from person_tracking.boxes import boxes_msg
+
+#Amounts of detections per frame to benchmark
+detection_counts = (1, 10, 100)
+
+
+def random_detections(count:int, rng)->(np.ndarray, np.ndarray, np.ndarray):
+    """Random normalized boxes, confidences and track IDs, with the dtypes returned by ultralytics"""
+    corners = rng.random((count, 2, 2), dtype=np.float32)
+    xyxyn = np.concatenate((corners.min(axis=1), corners.max(axis=1)), axis=1)
+    confidences = rng.random(count, dtype=np.float32)
+    track_ids = np.arange(count, dtype=np.int64)
+    return xyxyn, confidences, track_ids
+
+
+def loop_msg(xyxyn:np.ndarray, confidences:np.ndarray, track_ids:np.ndarray)->AllBoundingBoxes:
+    """Previous construction: one list conversion of the tensor and one append per box (with a new Box per row)"""
+    boxes = AllBoundingBoxes()
+    for box in xyxyn.tolist():
+        box_msg = Box()
+        box_msg.top_left.x = box[0]
+        box_msg.top_left.y = box[1]
+        box_msg.bottom_right.x = box[2]
+        box_msg.bottom_right.y = box[3]
+        boxes.bounding_boxes.append(box_msg)
+    return boxes
+
+
+def measure(build, arrays, repeat:int=5, number:int=1000)->float:
+    """Best time (in microseconds) to build one message"""
+    timer = Timer(lambda: build(*arrays))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'detections':>10} | {'loop (us/frame)':>16} | {'boxes_msg (us/frame)':>20}")
+    for count in detection_counts:
+        arrays = random_detections(count, rng)
+        print(f"{count:>10} | {measure(loop_msg, arrays):>16.1f} | {measure(boxes_msg, arrays):>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
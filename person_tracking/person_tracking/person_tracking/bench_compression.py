@@ -0,0 +1,69 @@
+"""Benchmark of the JPEG outputs of the camera and detector nodes.
+For each JPEG quality, frames of the clips of the media directory are encoded at full resolution and at preview size,
+and the bytes per frame, the bandwidth at the given frame rate and the encode time are reported, next to the raw rgb8 frames.
+Run it with: ros2 run person_tracking bench_compression [--frames N] [--qualities Q ...] [--preview-width W] [clip ...]"""
+
+#To read the arguments and the clips
+import argparse
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from tello.jpeg import encode_jpeg, downscale
+from person_tracking.bench_backends import default_clips
+
+
+def read_frames(clips:list, max_frames:int)->list:
+    """RGB frames of the clips, at most max_frames in total"""
+    frames = []
+    for clip in clips:
+        cap = cv2.VideoCapture(str(clip))
+        while cap.isOpened() and len(frames) < max_frames:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        cap.release()
+    return frames
+
+
+def measure(frames:list, quality:int)->(float, float):
+    """Mean size (in bytes) of the encoded frames and median encode time (in ms)"""
+    sizes, times = [], []
+    for frame in frames:
+        start = perf_counter()
+        sizes.append(len(encode_jpeg(frame, quality)))
+        times.append(perf_counter() - start)
+    return float(np.mean(sizes)), float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the size and encode time of the JPEG outputs per quality level")
+    parser.add_argument("clips", nargs="*", help="video clips (default: the clips of the media directory)")
+    parser.add_argument("--frames", type=int, default=100, help="amount of frames encoded")
+    parser.add_argument("--qualities", type=int, nargs="*", default=[50, 60, 70, 80, 90, 95], help="JPEG qualities to compare")
+    parser.add_argument("--preview-width", type=int, default=320, help="width of the preview frames in pixels")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate used to compute the bandwidth")
+    args = parser.parse_args()
+
+    frames = read_frames(args.clips or default_clips(), args.frames)
+    if not frames:
+        print("No video clip found")
+        return
+    previews = [downscale(frame, args.preview_width) for frame in frames]
+
+    height, width = frames[0].shape[:2]
+    preview_height, preview_width = previews[0].shape[:2]
+    print(f"{len(frames)} frames, full: {width}x{height}, preview: {preview_width}x{preview_height}")
+    print(f"{'output':>8} | {'quality':>7} | {'bytes/frame':>11} | {'Mbit/s':>7} | {'encode (ms)':>11}")
+    for name, images in (("full", frames), ("preview", previews)):
+        raw_size = images[0].nbytes
+        print(f"{name:>8} | {'raw':>7} | {raw_size:>11.0f} | {raw_size * 8 * args.fps / 1e6:>7.1f} | {0.0:>11.2f}")
+        for quality in args.qualities:
+            size, encode_time = measure(images, quality)
+            print(f"{name:>8} | {quality:>7} | {size:>11.0f} | {size * 8 * args.fps / 1e6:>7.1f} | {encode_time:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#To handle the detection tensors
+import numpy as np
+
+#To draw the bounding boxes
+import cv2
+
+#Custom message to send bounding boxes
+from all_bounding_boxes_msg.msg import AllBoundingBoxes, Box, PointMsg
+
+
+def result_arrays(result)->(np.ndarray, np.ndarray, np.ndarray):
+    """Extracts the detections of an ultralytics Results object as NumPy arrays:
+    normalized corners (N,4) as [top_left_x, top_left_y, bottom_right_x, bottom_right_y], confidences (N,) and track IDs (N,).
+    The track ID of a detection is -1 when the detection is not tracked."""
+    boxes = result.boxes
+    xyxyn = boxes.xyxyn.cpu().numpy()
+    confidences = boxes.conf.cpu().numpy()
+    if boxes.id is not None:
+        track_ids = boxes.id.cpu().numpy().astype(np.int64)
+    else:
+        track_ids = np.full(len(xyxyn), -1, dtype=np.int64)
+    return xyxyn, confidences, track_ids
+
+
+def boxes_msg(xyxyn:np.ndarray, confidences:np.ndarray, track_ids:np.ndarray, header=None, seq:int=0, embeddings:list=None)->AllBoundingBoxes:
+    """Builds an AllBoundingBoxes message with one Box per row of the detection arrays.
+    Boxes are sorted by decreasing confidence, so that the first box is the detection with the highest confidence score.
+    'header' is the header of the frame the boxes were detected in, and 'seq' the sequence number of that frame.
+    'embeddings' optionally gives the appearance embedding of each row (None when unknown)."""
+    order = np.argsort(-confidences, kind="stable")
+
+    #A single conversion of the whole table to Python numbers, instead of one per coordinate
+    rows = np.column_stack((xyxyn[order], confidences[order])).tolist()
+    ids = track_ids[order].tolist()
+
+    bounding_boxes = [None] * len(rows)
+    for i, (x1, y1, x2, y2, confidence) in enumerate(rows):
+        bounding_boxes[i] = Box(top_left=PointMsg(x=x1, y=y1), bottom_right=PointMsg(x=x2, y=y2), confidence=confidence, track_id=ids[i])
+    if embeddings is not None:
+        for box, row in zip(bounding_boxes, order.tolist()):
+            if embeddings[row] is not None:
+                box.embedding = embeddings[row].astype(np.float32).tolist()
+
+    msg = AllBoundingBoxes()
+    if header is not None:
+        msg.header = header
+    msg.seq = seq
+    msg.bounding_boxes = bounding_boxes
+    return msg
+
+
+def result_to_msg(result, header=None, seq:int=0)->AllBoundingBoxes:
+    """Builds the AllBoundingBoxes message of an ultralytics Results object"""
+    return boxes_msg(*result_arrays(result), header, seq)
+
+
+def draw_boxes(frame:np.ndarray, xyxyn:np.ndarray, track_ids:np.ndarray, color=(255, 0, 0), thickness:int=2)->np.ndarray:
+    """Draws the bounding boxes (and the track IDs of tracked persons) directly on the frame, without copying it.
+    Returns the frame."""
+    if not frame.flags.writeable:
+        frame = frame.copy()
+    height, width = frame.shape[:2]
+    corners = np.rint(xyxyn * (width, height, width, height)).astype(int).tolist()
+    for (x1, y1, x2, y2), track_id in zip(corners, track_ids.tolist()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        if track_id >= 0:
+            cv2.putText(frame, f"id:{track_id}", (x1, max(y1 - 5, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return frame
+
+
+def msg_arrays(msg:AllBoundingBoxes)->(np.ndarray, np.ndarray, np.ndarray):
+    """Inverse of boxes_msg: returns the normalized corners (N,4), confidences (N,) and track IDs (N,) of an AllBoundingBoxes message"""
+    boxes = msg.bounding_boxes
+    xyxyn = np.array([(b.top_left.x, b.top_left.y, b.bottom_right.x, b.bottom_right.y) for b in boxes], dtype=np.float64).reshape(-1, 4)
+    confidences = np.array([b.confidence for b in boxes], dtype=np.float64)
+    track_ids = np.array([b.track_id for b in boxes], dtype=np.int64)
+    return xyxyn, confidences, track_ids
+
+
+def msg_embeddings(msg:AllBoundingBoxes)->list:
+    """Appearance embeddings of the boxes of an AllBoundingBoxes message, None for the boxes sent without one"""
+    return [np.asarray(b.embedding, dtype=np.float32) if len(b.embedding) else None for b in msg.bounding_boxes]
+
+
+def stamp_seconds(stamp)->float:
+    """Converts a builtin_interfaces/Time stamp into seconds"""
+    return stamp.sec + stamp.nanosec * 1e-9
@@ -0,0 +1,56 @@
+#To encode the frames in JPEG: the helpers of the tello package, shared with its camera node
+import numpy as np
+from tello.jpeg import downscale, compressed_msg
+
+#ROS compressed image message
+from sensor_msgs.msg import CompressedImage
+
+#To encode the frames on a dedicated thread
+from person_tracking.inference_worker import LatestFrameSlot, InferenceWorker
+
+
+class CompressedPublisher():
+    """Publishes frames in JPEG on '<topic>/compressed', and downscaled to 'preview_width' pixels on '<topic>/preview/compressed'.
+    Encoding is done by a worker thread on the newest frame only: publish() just drops the frame in a slot, so the caller
+    (an executor thread, the inference worker...) never waits for the encoder, and a slow encoder skips frames instead of queuing them.
+    Nothing is encoded for an output nobody subscribes to."""
+
+    def __init__(self, node, topic:str, quality:int=80, preview_width:int=320, preview_quality:int=60, qos:int=5):
+        self.quality = quality
+        self.preview_width = preview_width
+        self.preview_quality = preview_quality
+
+        self.publisher_full = node.create_publisher(CompressedImage, topic + "/compressed", qos)
+        self.publisher_preview = node.create_publisher(CompressedImage, topic + "/preview/compressed", qos)
+
+        #Amount of bytes published, per output
+        self.bytes_full = 0
+        self.bytes_preview = 0
+
+        self.slot = LatestFrameSlot()
+        self.worker = InferenceWorker(self.slot, self.encode, node.get_logger(), name="compression_worker")
+        self.worker.start()
+
+    def subscribed(self)->bool:
+        """Whether someone subscribes to one of the compressed outputs"""
+        return self.publisher_full.get_subscription_count() > 0 or self.publisher_preview.get_subscription_count() > 0
+
+    def publish(self, image:np.ndarray, header)->None:
+        """Hands an RGB frame to the encoder. The frame must not be modified afterwards"""
+        if self.subscribed():
+            self.slot.put((image, header))
+
+    def encode(self, frame)->None:
+        """Function executed by the worker: encodes the frame for each output someone subscribes to, and publishes it"""
+        image, header = frame
+        if self.publisher_full.get_subscription_count() > 0:
+            msg = compressed_msg(image, header, self.quality)
+            self.publisher_full.publish(msg)
+            self.bytes_full += len(msg.data)
+        if self.publisher_preview.get_subscription_count() > 0:
+            msg = compressed_msg(downscale(image, self.preview_width), header, self.preview_quality)
+            self.publisher_preview.publish(msg)
+            self.bytes_preview += len(msg.data)
+
+    def stop(self, timeout=None)->None:
+        self.worker.stop(timeout)
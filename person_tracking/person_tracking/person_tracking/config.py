@@ -0,0 +1,48 @@
+#To read the configuration file
+import os
+from pathlib import Path
+
+import yaml
+
+#Environment variable that can hold the path of the configuration file
+config_env_variable = "PERSON_TRACKING_CONFIG"
+
+#Default settings of the object detection model, used for the keys missing from the 'detector' section of the configuration file
+detector_defaults = {
+    "backend": "torch",         #torch, onnx or openvino
+    "weights": "yolov8n.pt",    #weights file (.pt), exported model (.onnx) or OpenVINO model directory
+    "source_weights": "yolov8n.pt", #PyTorch weights the onnx/openvino model is exported from when it doesn't exist yet
+    "threads": 0,               #amount of CPU threads used for inference, 0 to keep the library's default
+    "imgsz": 640,               #input size of the model
+    "warmup_runs": 2,           #amount of inferences done at startup, before the first real frame
+}
+
+
+def find_config_file()->Path|None:
+    """Returns the path of the configuration file: the one given in the environment variable PERSON_TRACKING_CONFIG,
+    or else config/config.yaml in the repository this package is run from. Returns None when no file is found."""
+    if os.environ.get(config_env_variable):
+        return Path(os.environ[config_env_variable])
+    for parent in Path(__file__).resolve().parents:
+        candidate = parent / "config" / "config.yaml"
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def load_config(path=None)->dict:
+    """Loads the configuration file. Returns an empty dictionary if there is no configuration file."""
+    path = find_config_file() if path is None else Path(path)
+    if path is None or not path.is_file():
+        return {}
+    with open(path) as config_file:
+        return yaml.safe_load(config_file) or {}
+
+
+def detector_config(config:dict=None)->dict:
+    """Settings of the object detection model: the 'detector' section of the configuration file completed with the default settings"""
+    if config is None:
+        config = load_config()
+    settings = dict(detector_defaults)
+    settings.update(config.get("detector") or {})
+    return settings
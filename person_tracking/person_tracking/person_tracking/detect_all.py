@@ -1,14 +1,22 @@
 #To handle ROS node
 import rclpy
 from rclpy.node import Node
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup, ReentrantCallbackGroup
 
 #ROS image message
 from sensor_msgs.msg import Image
 
 from std_msgs.msg import String
 
+#Diagnostics messages, to expose the state of the frame scheduler
+from diagnostic_msgs.msg import DiagnosticArray
+
 #Custom message to send bounding boxes
-from all_bounding_boxes_msg.msg import AllBoundingBoxes, Box
+from all_bounding_boxes_msg.msg import AllBoundingBoxes
+
+#Custom message containing the midpoint of the bounding box surrounding the tracked person
+from person_tracked.msg import PersonTracked
+from person_tracking.boxes import result_arrays, boxes_msg, draw_boxes
 
 #To convert cv2 images to ROS Image messages
 from cv_bridge import CvBridge
@@ -19,116 +27,310 @@ from plugin_server_base.plugin_base import PluginBase, NodeState
 #Pygame interface
 from tello_control_station.interface import Interface, matching_keys
 
-#YOLOv8 object detection framework
-from ultralytics import YOLO
+#To run object detection on a dedicated thread
+from threading import Lock
+from person_tracking.inference_worker import LatestFrameSlot, InferenceWorker
+
+#To choose which frames object detection is performed on
+from time import monotonic
+from person_tracking.frame_scheduler import AdaptiveFrameScheduler
+from person_tracking.diagnostics import make_status, make_array
+
+#To receive frames from a camera node of the same process without conversion (composed mode)
+from person_tracking.frame_bus import LocalFrame
+
+#To publish the annotated frames in JPEG, encoded on a dedicated thread
+from person_tracking.compression import CompressedPublisher
+
+#To perform object detection around the tracked person only
+from person_tracking.roi import RoiSelector, crop_to_frame
+
+#To compute the appearance embeddings of the persons detected, sent with their bounding boxes for re-identification
+from person_tracking.reid import EmbeddingCache
+
+#YOLOv8 object detection model, run by the backend chosen in config/config.yaml.
+#It is loaded by the inference worker when the node starts, and shared by the nodes of the process.
+from person_tracking.config import detector_config
+from person_tracking.backends import get_backend
+
+#Tracker of the node: the backend is shared by the nodes of the process, so it only predicts, and each node tracks its own persons
+from tello.model import Tracker
+
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
 
-#load the object detection model
-model = YOLO('yolov8n.pt') 
+#To record the time each frame spends in the node
+from person_tracking.latency import LatencyRecorder
 
 #Defining claases of interest
 classes_needed = ["person"]  
 
-#Getting the ids of our classes of interest
-classes = model.names
-classes_ID = [k for k,v in classes.items() if v in classes_needed] 
-
 
 class DetectAll(PluginBase):
 
     #Minimum confidence probability for a detection to be accepted
     minimum_prob = 0.4  
 
+    #Maximum latency (in seconds) between the reception of a frame and its detection result.
+    #The frame scheduler skips frames so that this budget is met.
+    latency_budget = 0.3
+
+    #Period (in seconds) of the diagnostics messages
+    diagnostics_period = 1.0
+
+    #Region of interest (ROI) mode: while a person is tracked, object detection is performed on a padded crop around that person,
+    #with a smaller model input size. A full frame is processed every roi_full_frame_period frames, and whenever the person is lost.
+    #Opt-in (roi_enabled parameter): on the crop frames, the persons outside the crop are missing from /all_bounding_boxes,
+    #so the trigger node can't see a trigger gesture there, and the re-identification has fewer candidates.
+    roi_enabled = False
+    roi_padding = 0.5 #margin on each side of the person's box, relative to the box size
+    roi_min_size = 0.25 #minimal size of the crop, relative to the frame
+    roi_full_frame_period = 5
+    roi_imgsz = 320 #model input size used on crops
+    roi_target_timeout = 1.0 #time (in seconds) without /person_tracked messages after which the person is considered lost
+
+    #Re-identification: the appearance embedding of each person detected is sent in its Box (reid_embeddings parameter),
+    #and recomputed every reid_refresh_period frames for a person keeping the same track ID
+    reid_refresh_period = 5
+
     #Topic names
     image_raw_topic = "/camera/image_raw"
     all_detected_topic = "/all_detected"
     bounding_boxes_topic = "/all_bounding_boxes"
     key_pressed_topic = "/key_pressed"
+    person_tracked_topic = "/person_tracked"
+    diagnostics_topic = "/diagnostics"
     
-    def __init__(self,name):
+    def __init__(self,name,frame_bus=None):
+        """If a frame bus (person_tracking.frame_bus) is given, the node runs in composed mode: frames are received from the camera node
+        of the same process through the bus, as NumPy arrays, instead of sensor_msgs/Image messages."""
 
         #Creating the Node
         super().__init__(name)
         
+        #Callback groups: frames are received one at a time, in order, while the short callbacks (tracked person, diagnostics) may run concurrently
+        #when the node is executed by a multi-threaded executor. The node is run on the main thread (see main), because of the Pygame tick.
+        self.frames_group = MutuallyExclusiveCallbackGroup()
+        self.inputs_group = ReentrantCallbackGroup()
+
         #subscribers
-        self.sub_raw = self.create_subscription(Image,self.image_raw_topic, self.listener_callback,5)
+        self.frame_bus = frame_bus
+        if frame_bus is None:
+            self.sub_raw = self.create_subscription(Image,self.image_raw_topic, self.listener_callback,5, callback_group=self.frames_group)
+        else:
+            frame_bus.subscribe(self.image_raw_topic, self.local_frame_callback)
+        self.sub_person_tracked = self.create_subscription(PersonTracked,self.person_tracked_topic, self.person_tracked_callback,5, callback_group=self.inputs_group)
         
         #publishers
         self.publisher_all_detected = self.create_publisher(Image,self.all_detected_topic,5)
+
+        #JPEG outputs of the annotated frames, for ground stations on a limited link: /all_detected/compressed at full resolution,
+        #and /all_detected/preview/compressed downscaled to preview_width pixels
+        self.publisher_all_detected_compressed = CompressedPublisher(self, self.all_detected_topic,
+                                                                     quality=self.declare_parameter("jpeg_quality", 80).value,
+                                                                     preview_width=self.declare_parameter("preview_width", 320).value,
+                                                                     preview_quality=self.declare_parameter("preview_quality", 60).value)
         self.publisher_bounding_boxes = self.create_publisher(AllBoundingBoxes,self.bounding_boxes_topic,5)
         self.publisher_key_pressed = self.create_publisher(String,self.key_pressed_topic,5)
+        self.publisher_diagnostics = self.create_publisher(DiagnosticArray,self.diagnostics_topic,5)
+        self.timer_diagnostics = self.create_timer(self.diagnostics_period, self.diagnostics_callback, callback_group=self.inputs_group)
 
         #to convert cv2 images to Ros Image messages and vice versa
         self.cv_bridge = CvBridge()
 
+        #Timings of the stages of each frame: waiting in the frame slot ("queue"), and object detection up to the publication
+        #of the bounding boxes ("inference")
+        self.latency = LatencyRecorder(self)
+
         #Variable to contain the frame coming directly from the drone
         self.image_raw = None
 
-        #Variable to hold each frame after object detection. It contains all persons detected
+        #Variable to hold each frame after object detection. It contains all persons detected.
+        #It is only drawn when someone subscribes to /all_detected, and set back to None once published.
         self.image_all_detected = None
 
         #Variable containing all bounding boxes' coordinates for a single frame
         self.boxes = None
 
+        #Sequence number of the frames object detection is performed on. Each bounding boxes message carries the number of its frame.
+        self.boxes_seq = 0
+
         #Counter to track how many frames were received.
         self.frame_counter = 0 
 
-        #Pygame interface
+        #Pygame interface. It is only used by tick, on the thread that created it (SDL requires it).
+        #The frames callbacks (on the camera's thread in composed mode) leave the last frame in pending_bg_image, shown at the next tick.
         self.pg_interface = Interface()
+        self.pending_bg_image = None
+        self.interface_lock = Lock()
 
-        #Variable to perform object detection on only some frames
-        self.process = 0
+        #Object detection model and ids of our classes of interest, set when the inference worker starts (see load_model)
+        self.backend = None
+        self.classes_ID = None
 
+        #Multi-object tracker of this node, giving the track IDs. It is new each time the node starts, with no track from a previous run
+        self.tracker = Tracker()
+
+        #Second instance of the model, performing untracked object detection on the crops of the ROI mode
+        self.roi_backend = None
+
+        #Region of interest selection (ROI mode, off by default), and time at which the last midpoint of the tracked person was received
+        self.roi_enabled = self.declare_parameter("roi_enabled", self.roi_enabled).value
+        self.roi = RoiSelector(self.roi_padding, self.roi_min_size, self.roi_full_frame_period)
+        self.person_tracked_time = None
+
+        #Appearance embeddings of the persons detected, for the re-identification of the tracked person by the trigger node
+        self.embeddings = EmbeddingCache(self.reid_refresh_period) if self.declare_parameter("reid_embeddings", True).value else None
+
+        #Lock protecting the region of interest, set by the /person_tracked callbacks and used by the inference worker
+        self.roi_lock = Lock()
+
+        #Scheduler choosing the frames to perform object detection on, depending on the frame rate and the inference time
+        self.frame_scheduler = AdaptiveFrameScheduler(self.latency_budget)
+
+        #Lock to hand the detection results (self.image_all_detected and self.boxes) from the inference worker to the publishers
+        self.results_lock = Lock()
+
+        #Single-slot mailbox where the subscriber drops the newest frame, and worker running object detection on the freshest frame.
+        #Frames replaced in the slot before being processed are stale, they are dropped and counted.
+        self.frame_slot = LatestFrameSlot()
+        self.inference_worker = InferenceWorker(self.frame_slot, self.process_frame, self.get_logger(), setup=self.load_model)
+        self.inference_worker.start()
 
 
 
 ########################### Subscriber ###########################################################################################   
     def listener_callback(self, img):
         """Callback function for the subscriber node (to topic /camera/image_raw).
-        For each image received, it saves in the log that an image has been received.
-        Then converts that image into cv2 format before performing object detection on that image and saving 
-        the result in self.image_all_detected"""
-        if self.process % 4 == 0:
-            self.get_logger().info(f"Frame N°{self.frame_counter} received")
-            self.frame_counter += 1
+        The image received is only dropped in the frame slot, object detection is done by the inference worker.
+        This way, the executor thread (tick, key handling, publishers) never waits for the object detection model.
+        The frame is put in the slot with its reception time."""
+        if self.frame_scheduler.on_frame(monotonic()):
+            received = self.latency.now()
+            #Frames not stamped by the camera are stamped with their reception time
+            if img.header.stamp.sec == 0 and img.header.stamp.nanosec == 0:
+                img.header.stamp = received.to_msg()
+            self.frame_slot.put((img, received))
+            with self.interface_lock:
+                self.pending_bg_image = img
+
+    def local_frame_callback(self, frame:LocalFrame):
+        """Callback function for the frames received through the frame bus (composed mode). Same as listener_callback,
+        except that the frame is already a cv2 image: the frame slot holds the camera's buffer itself, which is never modified
+        (the bus hands the same buffer to the camera's other outputs and to the other subscribers).
+        Only the Pygame interface, which needs a ROS Image message, gets a converted copy."""
+        if self.frame_scheduler.on_frame(monotonic()):
+            received = self.latency.now()
+            #The interface gets a converted copy of the frame
+            image_msg = self.cv_bridge.cv2_to_imgmsg(frame.image, 'rgb8', frame.header)
+            with self.interface_lock:
+                self.pending_bg_image = image_msg
+            self.frame_slot.put((frame, received))
+
+    def load_model(self):
+        """Function executed by the inference worker when it starts. Gets the object detection model (loading it if no other node
+        of the process did) and warms it up, so that the first frame received isn't slowed down.
+        Since it doesn't run in the constructor, the node starts (and restarts) without waiting for the model."""
+        start = monotonic()
+        self.backend = get_backend(detector_config(), self.get_logger())
+        self.classes_ID = [k for k,v in self.backend.names.items() if v in classes_needed]
+        self.backend.warmup(self.classes_ID)
+        if self.roi_enabled:
+            self.roi_backend = get_backend(dict(detector_config(), imgsz=self.roi_imgsz), self.get_logger(), instance="roi")
+            self.roi_backend.warmup(self.classes_ID)
+        self.get_logger().info(f"Object detection model ready in {monotonic() - start:.2f}s (first inference: {self.backend.first_inference_time:.2f}s)")
+
+    def person_tracked_callback(self, msg):
+        """Callback function for the subscriber to /person_tracked. Keeps the midpoint of the tracked person for the ROI mode.
+        An empty midpoint (0,0) means that the person wasn't found in the last frame."""
+        point = msg.middle_point
+        with self.roi_lock:
+            if point.x == 0 and point.y == 0:
+                self.roi.set_target(None)
+            else:
+                self.roi.set_target((point.x, point.y))
+                self.person_tracked_time = monotonic()
+
+    def process_frame(self, frame):
+        """Function executed by the inference worker on the freshest frame of the slot (the frame and its reception time).
+        Converts the image into cv2 format before performing object detection on that image.
+        If someone subscribes to /all_detected, the bounding boxes are drawn on the frame and the result is saved in self.image_all_detected.
+        If someone subscribes to its compressed outputs, the result is handed to their encoder."""
+        self.get_logger().info(f"Frame N°{self.frame_counter} received ({self.frame_slot.dropped} stale frames dropped)")
+        self.frame_counter += 1
+        img, received = frame
+        start_time = self.latency.now()
+        self.latency.record("queue", img.header, received, start_time)
+        if isinstance(img, LocalFrame):
+            self.image_raw = img.image
+        else:
             self.image_raw = self.cv_bridge.imgmsg_to_cv2(img,"rgb8")
-            self.image_all_detected = self.detection(self.image_raw)
-            self.pg_interface.update_bg_image(img)
-        self.process += 1
+        start = monotonic()
+        xyxyn, _, track_ids = self.detection(self.image_raw, img.header)
+        self.frame_scheduler.on_inference(monotonic() - start)
+
+        #The bounding boxes are published once per frame object detection was performed on
+        self.bounding_boxes_callback()
+        self.latency.record("inference", img.header, start_time)
+
+        #Rendering is skipped when nobody watches the detections
+        raw_subscribed = self.publisher_all_detected.get_subscription_count() > 0
+        if raw_subscribed or self.publisher_all_detected_compressed.subscribed():
+            #Drawn on a copy: in composed mode, self.image_raw is the camera's buffer, still read by the camera and the other subscribers
+            image_all_detected = draw_boxes(self.image_raw.copy(), xyxyn, track_ids)
+            self.publisher_all_detected_compressed.publish(image_all_detected, img.header)
+            if raw_subscribed:
+                with self.results_lock:
+                    self.image_all_detected = image_all_detected
         
-    def detection(self,frame):
+    def detection(self,frame,header=None):
         """Function to perform person object detection on a single frame.
-        It saves the coordinates of all bounding boxes of persons detected on the frame in a variable named self.boxes"""
-
-        #detection of persons in the frame. Only detections with a certain confidence level (minimum_prob) are  considered.
-        results = model.track(frame, persist=True, classes=classes_ID, conf=self.minimum_prob)
-
-        #temporary variable to hold each bounding box's coordinates on the frame.
-        box_msg = Box()
-
-        #Saving all bounding boxes's coordinates in self.boxes
-        self.boxes = AllBoundingBoxes()
-        for box in results[0].boxes.xyxyn.tolist(): #normalized coordinates (within 0 and 1)
-            box_msg.top_left.x = box[0]
-            box_msg.top_left.y = box[1]
-            box_msg.bottom_right.x = box[2]
-            box_msg.bottom_right.y = box[3]
-            self.boxes.bounding_boxes.append(box_msg)
-        self.get_logger().info(f"self.boxes : {self.boxes.bounding_boxes}")
-        #returning the image where bounding boxes are displayed
-        frame_ = results[0].plot()
-        return frame_
+        It saves the coordinates of all bounding boxes of persons detected on the frame in a variable named self.boxes,
+        stamped with the header of the frame and a new sequence number, and returns the normalized coordinates, confidences and track IDs of the detections as NumPy arrays."""
+
+        with self.roi_lock:
+            #The tracked person is considered lost when no midpoint was received for a while
+            if self.person_tracked_time is not None and monotonic() - self.person_tracked_time > self.roi_target_timeout:
+                self.roi.set_target(None)
+                self.person_tracked_time = None
+
+            #detection of persons in the frame, or in the crop around the tracked person in ROI mode.
+            #Only detections with a certain confidence level (minimum_prob) are  considered.
+            window = self.roi.window(frame.shape) if self.roi_backend is not None else None
+        if window is None:
+            results = self.tracker.track(self.backend, frame, classes=self.classes_ID, conf=self.minimum_prob)
+            xyxyn, confidences, track_ids = result_arrays(results[0])
+        else:
+            x1, y1, x2, y2 = window
+            results = self.roi_backend.predict(frame[y1:y2, x1:x2], classes=self.classes_ID, conf=self.minimum_prob, verbose=False)
+            xyxyn, confidences, track_ids = result_arrays(results[0])
+            xyxyn = crop_to_frame(xyxyn, window, frame.shape)
+        with self.roi_lock:
+            track_ids = self.roi.update(xyxyn, track_ids, window is None)
+
+        #Saving all bounding boxes (normalized coordinates within 0 and 1, confidence, track ID and appearance embedding) in self.boxes.
+        #Boxes are sorted by decreasing confidence.
+        embeddings = self.embeddings.embeddings(frame, xyxyn, track_ids) if self.embeddings is not None else None
+        self.boxes_seq += 1
+        boxes = boxes_msg(xyxyn, confidences, track_ids, header, self.boxes_seq, embeddings)
+        with self.results_lock:
+            self.boxes = boxes
+        self.get_logger().info(f"self.boxes : {len(boxes.bounding_boxes)} persons, track IDs {track_ids.tolist()}")
+        return xyxyn, confidences, track_ids
 
 
 ######################## Publisher #####################################################################################  
     def all_detected_callback(self):
         """
         callback funtion for the publisher node (to topic /camera/image_detected).
-        The image on which object detection has been performed (self.image_all_detected) is published on the topic '/all_detected'
+        The image on which object detection has been performed (self.image_all_detected) is published on the topic '/all_detected'.
+        Each image is published only once: nothing is published until a new detection has been drawn.
         """
-        if(self.image_all_detected is None):
-            self.get_logger().info("Can't publish frames on which object detection was performed.\n No image has been received from the drone yet")    
-        else:
-            self.publisher_all_detected.publish(self.cv_bridge.cv2_to_imgmsg(self.image_all_detected, 'rgb8')) 
+        with self.results_lock:
+            image_all_detected = self.image_all_detected
+            self.image_all_detected = None
+        if(image_all_detected is not None):
+            self.publisher_all_detected.publish(self.cv_bridge.cv2_to_imgmsg(image_all_detected, 'rgb8')) 
             self.get_logger().info("Publishing a frame on all detected topic")
             
     
@@ -136,13 +338,36 @@ class DetectAll(PluginBase):
         """
         callback funtion for the publisher node (to topic /all_bounding_boxes).
         A list of the coordinates of bounding boxes detected on the frame is published.
+        It is called by the inference worker after each detection, so that each frame's boxes are published exactly once.
         """
-        if(self.boxes is None):
+        with self.results_lock:
+            boxes = self.boxes
+        if(boxes is None):
             self.get_logger().info("Can't publish bounding boxes. No information received yet")    
         else:
-            self.publisher_bounding_boxes.publish(self.boxes)
+            self.publisher_bounding_boxes.publish(boxes)
             self.get_logger().info("Publishing a bounding boxes")
 
+    def diagnostics_callback(self):
+        """Callback function for the diagnostics publisher (to topic /diagnostics).
+        Publishes the stride chosen by the frame scheduler, the measured rates and the amount of skipped and dropped frames."""
+        scheduler = self.frame_scheduler
+        frame_period = scheduler.frame_period
+        values = {
+            "stride": scheduler.stride,
+            "latency_budget": self.latency_budget,
+            "expected_latency": scheduler.expected_latency(),
+            "inference_time": scheduler.inference_time,
+            "frame_rate": None if not frame_period else 1 / frame_period,
+            "detection_rate": scheduler.detection_rate(),
+            "frames_received": scheduler.received,
+            "frames_skipped": scheduler.skipped,
+            "frames_dropped": self.frame_slot.dropped,
+            "frames_processed": self.inference_worker.processed,
+        }
+        status = make_status(f"{self.get_name()}: frame scheduler", values)
+        self.publisher_diagnostics.publish(make_array(self, [status]))
+
     def key_pressed_callback(self):
         keys = self.pg_interface.get_key_pressed()
         msg = String()
@@ -159,15 +384,27 @@ class DetectAll(PluginBase):
     def tick(self) -> NodeState:
         """This method is a mandatory for PluginBase node. It defines what we want our node to do.
         It gets called 20 times a second if state=RUNNING
-        Here we call callback functions to publish a detection frame and the list of bounding boxes.
+        Here we call callback functions to publish a detection frame.
+        The list of bounding boxes is published by the inference worker, as soon as a detection is done.
         """
+        with self.interface_lock:
+            image, self.pending_bg_image = self.pending_bg_image, None
+        if image is not None:
+            self.pg_interface.update_bg_image(image)
         self.pg_interface.tick()
         self.key_pressed_callback()
         self.all_detected_callback()
-        self.bounding_boxes_callback()
         
         return NodeState.RUNNING
 
+    def destroy_node(self):
+        """Stops the inference worker and the JPEG encoder before destroying the node"""
+        if self.frame_bus is not None:
+            self.frame_bus.unsubscribe(self.image_raw_topic, self.local_frame_callback)
+        self.inference_worker.stop(timeout=1.0)
+        self.publisher_all_detected_compressed.stop(timeout=1.0)
+        super().destroy_node()
+
 
 def main(args=None):
     #Initialization of ROS communication  
@@ -176,10 +413,9 @@ def main(args=None):
     #Node instantiation
     detector = DetectAll('all_person_detector')
 
-    #execute the callback function until the global executor is shutdown
-    rclpy.spin(detector)
-
-    #destroy the node. It is not mandatory, since the garbage collection can do it
-    detector.destroy_node()
-    
-    rclpy.shutdown()        
+    #execute the callback functions until the executor is shutdown. The node (Pygame window, 20 Hz tick) stays on the main thread,
+    #object detection and the JPEG encoding run on their own threads
+    try:
+        spin([detector], main_thread_nodes=[detector])
+    finally:
+        rclpy.shutdown()        
@@ -0,0 +1,29 @@
+#ROS diagnostics messages
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+
+
+def make_status(name:str, values:dict, level=DiagnosticStatus.OK, message:str="")->DiagnosticStatus:
+    """Builds a DiagnosticStatus message named 'name', with one key/value pair for each item of 'values'"""
+    status = DiagnosticStatus()
+    status.level = level
+    status.name = name
+    status.message = message
+    status.values = [KeyValue(key=str(key), value=format_value(value)) for key, value in values.items()]
+    return status
+
+
+def make_array(node, statuses:list)->DiagnosticArray:
+    """Wraps diagnostic statuses in a DiagnosticArray message stamped with the node's clock"""
+    array = DiagnosticArray()
+    array.header.stamp = node.get_clock().now().to_msg()
+    array.status = statuses
+    return array
+
+
+def format_value(value)->str:
+    """Formats a diagnostic value. Floats are rounded to keep the messages readable"""
+    if value is None:
+        return "n/a"
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
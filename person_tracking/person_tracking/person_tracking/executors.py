@@ -0,0 +1,43 @@
+#To run the callbacks of the nodes on several threads
+from rclpy.executors import MultiThreadedExecutor, SingleThreadedExecutor
+from threading import Thread
+
+#Amount of executor threads when the num_threads parameter isn't set
+default_num_threads = 4
+
+
+def spin(nodes:list, main_thread_nodes:list=())->None:
+    """Executes the callbacks of the nodes with a MultiThreadedExecutor until it is shutdown, then destroys the nodes.
+    The amount of threads is given by the 'num_threads' parameter of the first node (set in the launch file).
+    Callbacks of different callback groups run in parallel, so that a slow callback doesn't delay the timers of the node.
+    The nodes also listed in 'main_thread_nodes' are executed by a SingleThreadedExecutor on the calling thread instead, while the
+    MultiThreadedExecutor runs on a background thread: Pygame (SDL) windows must be ticked by the thread that created them."""
+    num_threads = nodes[0].declare_parameter("num_threads", default_num_threads).value
+    executor = MultiThreadedExecutor(num_threads=num_threads)
+    for node in nodes:
+        if node not in main_thread_nodes:
+            executor.add_node(node)
+    nodes[0].get_logger().info(f"Executing the callbacks on {num_threads} threads")
+
+    main_executor = None
+    thread = None
+    try:
+        if not main_thread_nodes:
+            executor.spin()
+        else:
+            main_executor = SingleThreadedExecutor()
+            for node in main_thread_nodes:
+                main_executor.add_node(node)
+            if len(main_thread_nodes) < len(nodes):
+                thread = Thread(target=executor.spin, name="executor", daemon=True)
+                thread.start()
+            main_executor.spin()
+    finally:
+        if main_executor is not None:
+            main_executor.shutdown()
+        executor.shutdown()
+        if thread is not None:
+            thread.join(timeout=1.0)
+        #destroy the nodes. It is not mandatory, since the garbage collection can do it
+        for node in nodes:
+            node.destroy_node()
@@ -0,0 +1,146 @@
+#States of the drone
+from enum import Enum
+
+#Commands computed at each step
+from collections import namedtuple
+
+from math import pi
+
+#Controllers computing the tracking commands
+from person_tracking.pid import PID, PIDRange
+
+
+#Command to send to the drone: forward speed, lateral speed (positive to the left), vertical speed (positive upwards),
+#rotation speed (positive to the left), and whether the drone must land
+Command = namedtuple("Command", ["linear_x", "linear_y", "linear_z", "angular_z", "land"])
+
+NO_COMMAND = Command(0.0, 0.0, 0.0, 0.0, False)
+
+#Default settings of the controllers of the TrackPerson node, tuned with the simulator (person_tracking.simulator).
+#Gains of the tracking controller per axis (lateral speed, rotation speed, vertical speed), errors (in normalized coordinates)
+#below which the drone doesn't move, and maximal speed of the commands
+tracking_kp = (0.6, 1.0, 0.5)
+tracking_ki = (0.05, 0.0, 0.0)
+tracking_kd = (0.1, 0.1, 0.0)
+tracking_dead_zone = 0.05
+max_speed = 0.3
+#Range of the normalized height of the tracked person's box kept by moving forward or backward, and gains of that controller
+box_height_range = (0.3, 0.6)
+distance_kp = 1.0
+distance_ki = 0.1
+
+
+class FlightState(Enum):
+    IDLE = "idle" #the drone isn't flying
+    TRACKING = "tracking" #the drone follows the tracked person
+    SEARCHING = "searching" #the tracked person is lost: the drone rotates to find them
+    LANDING = "landing" #nobody was found after a complete rotation: the drone lands
+
+
+class FlightController():
+    """State machine deciding the commands of the drone (IDLE, TRACKING, SEARCHING, LANDING).
+    It doesn't block and has no thread: step() is called at each tick of the control timer, with the time of the tick,
+    and returns the command of that tick. The rotation angle of the search is integrated from the real time elapsed between ticks.
+    It doesn't depend on ROS, so it can be driven by a simulation as well as by the TrackPerson node.
+
+    NB : all directions : left, right... are from the drone's perspective"""
+
+    def __init__(self, tracking_pid:PID=None, distance_pid:PIDRange=None, search_speed:float=pi/7, search_angle:float=2*pi):
+        #Controller keeping the tracked person at the center of the camera's field. It works on 3 axes, measured by the normalized
+        #midpoint (x, x, y) of the person: lateral speed, rotation speed and vertical speed. By default, only the lateral speed is used.
+        self.tracking_pid = tracking_pid if tracking_pid is not None else PID(kp=(0.6, 0.0, 0.0), ki=(0.05, 0.0, 0.0), kd=(0.1, 0.0, 0.0),
+                                                                              setpoint=0.5, output_limits=(-0.3, 0.3), integral_limits=(-1.0, 1.0),
+                                                                              dead_zone=0.05)
+
+        #Controller keeping the distance to the tracked person within a range, measured by the normalized height of the person's box
+        #(forward speed). None to never move forward or backward.
+        self.distance_pid = distance_pid
+
+        #Rotation speed (rad/s) and angle (rad) of the search of a lost person
+        self.search_speed = search_speed
+        self.search_angle = search_angle
+
+        self.state = FlightState.IDLE
+
+        #Angle (rad) rotated since the beginning of the search, and time of the last step
+        self.angle = 0.0
+        self.last_time = None
+
+        #Rotation speed of the current search (positive to the left)
+        self.angular_speed = 0.0
+
+    def step(self, now:float, flying:bool, person_lost:bool, target:tuple|None, direction:str|None)->Command:
+        """Updates the state and returns the command to send to the drone.
+        now: time of the tick in seconds
+        flying: whether the drone is flying
+        person_lost: whether the tracked person is lost
+        target: normalized midpoint and box size (x, y, width, height) of the tracked person, or None if unknown
+        direction: direction ("left" or "right") the lost person went to, or None if unknown"""
+        dt = 0.0 if self.last_time is None else max(now - self.last_time, 0.0)
+        self.last_time = now
+
+        if not flying:
+            self.state = FlightState.IDLE
+            return NO_COMMAND
+
+        if self.state == FlightState.IDLE:
+            self.state = FlightState.TRACKING
+
+        if self.state == FlightState.LANDING:
+            #The land command was sent at the previous step, but the drone is still considered flying
+            return NO_COMMAND
+
+        if self.state == FlightState.SEARCHING:
+            if not person_lost:
+                self.state = FlightState.TRACKING
+            else:
+                self.angle += self.angular_speed * dt
+                if abs(self.angle) >= self.search_angle:
+                    #land if we found no one after a complete rotation
+                    self.state = FlightState.LANDING
+                    return NO_COMMAND._replace(land=True)
+                return NO_COMMAND._replace(angular_z=self.angular_speed)
+
+        #TRACKING
+        if person_lost:
+            self.reset_controllers()
+            if direction is None:
+                return NO_COMMAND
+            self.start_search(direction)
+            return NO_COMMAND._replace(angular_z=self.angular_speed)
+
+        if target is None:
+            self.reset_controllers()
+            return NO_COMMAND
+        x, y, _, height = target
+
+        #Commands proportional to the position of the person in the camera's field
+        linear_y, angular_z, linear_z = self.tracking_pid.compute((x, x, y), now).tolist()
+        linear_x = 0.0
+        if self.distance_pid is not None and height > 0:
+            linear_x = self.distance_pid.compute(height, now)
+        return Command(linear_x, linear_y, linear_z, angular_z, False)
+
+    def reset_controllers(self)->None:
+        """Resets the controllers, so that a new tracking doesn't start with the integral and derivative of the previous one"""
+        self.tracking_pid.reset()
+        if self.distance_pid is not None:
+            self.distance_pid.pid.reset()
+
+    def start_search(self, direction:str)->None:
+        """Starts rotating towards the direction the lost person went to"""
+        self.state = FlightState.SEARCHING
+        self.angle = 0.0
+        self.angular_speed = self.search_speed if direction == "left" else -self.search_speed
+
+
+def make_flight_controller(kp=tracking_kp, ki=tracking_ki, kd=tracking_kd, dead_zone:float=tracking_dead_zone, speed:float=max_speed,
+                           height_range=box_height_range, forward_kp:float=distance_kp, forward_ki:float=distance_ki)->FlightController:
+    """Flight state machine with its controllers: the tracking controller keeps the person at the middle of the screen (0.5, 0.5),
+    and the distance controller keeps the height of their box within height_range (none if forward_kp is null).
+    The commands are limited to 'speed'."""
+    tracking_pid = PID(kp, ki, kd, setpoint=0.5, output_limits=(-speed, speed), integral_limits=(-1.0, 1.0), dead_zone=dead_zone)
+    distance_pid = None
+    if forward_kp:
+        distance_pid = PIDRange(*height_range, kp=forward_kp, ki=forward_ki, output_limits=(-speed, speed))
+    return FlightController(tracking_pid, distance_pid)
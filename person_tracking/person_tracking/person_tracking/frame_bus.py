@@ -0,0 +1,44 @@
+#To register the callbacks of the nodes of the process
+from collections import defaultdict, namedtuple
+from threading import Lock
+
+#Frame handed from one node to another without conversion: the cv2 image (NumPy array) and its std_msgs/Header
+LocalFrame = namedtuple("LocalFrame", ["image", "header"])
+
+
+class FrameBus():
+    """In-process image transport between nodes running in the same process (composed mode).
+    rclpy has no intra-process communication: a sensor_msgs/Image published by a node is converted, serialized and deserialized
+    even when the subscriber lives in the same process. With the bus, the publisher hands the NumPy array itself to the subscribers'
+    callbacks, so a frame stays a single buffer from the camera to the detector.
+    Ownership is handed over with the frame: a publisher must not modify a frame after publishing it."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._callbacks = defaultdict(list)
+
+    def subscribe(self, topic:str, callback)->None:
+        """Registers a callback receiving the LocalFrame published on a topic"""
+        with self._lock:
+            self._callbacks[topic].append(callback)
+
+    def unsubscribe(self, topic:str, callback)->None:
+        with self._lock:
+            if callback in self._callbacks[topic]:
+                self._callbacks[topic].remove(callback)
+
+    def subscription_count(self, topic:str)->int:
+        with self._lock:
+            return len(self._callbacks[topic])
+
+    def publish(self, topic:str, image, header)->None:
+        """Hands a frame (cv2 image and its header) to the callbacks subscribed to the topic"""
+        with self._lock:
+            callbacks = list(self._callbacks[topic])
+        frame = LocalFrame(image, header)
+        for callback in callbacks:
+            callback(frame)
+
+
+#Bus shared by all the nodes of the process
+frame_bus = FrameBus()
@@ -0,0 +1,118 @@
+#To compute the stride
+from math import ceil
+
+#Rolling windows of measurements
+from collections import deque
+
+#The measurements are written by the subscriber and the inference worker, and read by the diagnostics, on different threads
+from threading import RLock
+
+
+class AdaptiveFrameScheduler():
+    """Chooses which incoming frames are sent to the object detection model.
+    It measures the rolling inference time and incoming frame period, and picks the smallest stride (1 = every frame)
+    for which the expected latency between the reception of a frame and its detection result stays within a latency budget.
+
+    With a latest-frame-wins slot, a frame submitted while the model is still busy waits for the end of the previous inference.
+    With a stride s, a frame period T and an inference time I, the expected latency is I + max(0, I - s*T).
+    When the budget cannot be met even without waiting (I > budget), the stride that avoids waiting is used.
+    All the methods can be called from different threads."""
+
+    def __init__(self, latency_budget:float, max_stride:int=30, window:int=30):
+        #Maximum latency (in seconds) allowed between the reception of a frame and the end of its detection
+        self.latency_budget = latency_budget
+
+        #Maximum amount of frames between two detections
+        self.max_stride = max_stride
+
+        #Lock protecting the measurements and counters. Reentrant, since the properties are also read by compute_stride
+        self._lock = RLock()
+
+        #Rolling measurements (in seconds)
+        self.frame_periods = deque(maxlen=window)
+        self.inference_times = deque(maxlen=window)
+
+        #Time at which the previous frame was received
+        self.last_frame_time = None
+
+        #Current stride, and frames received since the last frame submitted to the model
+        self.stride = 1
+        self.frames_since_submit = 0
+
+        #Counters
+        self.received = 0
+        self.submitted = 0
+        self.skipped = 0
+
+    def on_frame(self, now:float)->bool:
+        """Function to call when a frame is received, with the reception time in seconds.
+        Returns True if the frame must be sent to the object detection model and False if it is skipped."""
+        with self._lock:
+            if self.last_frame_time is not None:
+                self.frame_periods.append(now - self.last_frame_time)
+            self.last_frame_time = now
+            self.received += 1
+
+            self.frames_since_submit += 1
+            if self.submitted == 0 or self.frames_since_submit >= self.stride:
+                self.frames_since_submit = 0
+                self.submitted += 1
+                return True
+
+            self.skipped += 1
+            return False
+
+    def on_inference(self, duration:float)->None:
+        """Function to call after each inference, with its duration in seconds. Updates the stride."""
+        with self._lock:
+            self.inference_times.append(duration)
+            self.stride = self.compute_stride()
+
+    @property
+    def frame_period(self)->float|None:
+        with self._lock:
+            if not self.frame_periods:
+                return None
+            return sum(self.frame_periods) / len(self.frame_periods)
+
+    @property
+    def inference_time(self)->float|None:
+        with self._lock:
+            if not self.inference_times:
+                return None
+            return sum(self.inference_times) / len(self.inference_times)
+
+    def compute_stride(self)->int:
+        """Smallest stride meeting the latency budget given the current measurements"""
+        with self._lock:
+            frame_period = self.frame_period
+            inference_time = self.inference_time
+        if frame_period is None or inference_time is None or frame_period <= 0:
+            return 1
+
+        if inference_time > self.latency_budget:
+            #Budget out of reach: at least avoid frames waiting behind a running inference
+            stride = ceil(inference_time / frame_period)
+        else:
+            stride = ceil((2 * inference_time - self.latency_budget) / frame_period)
+
+        return min(max(stride, 1), self.max_stride)
+
+    def expected_latency(self)->float|None:
+        """Expected latency (in seconds) between the reception of a frame and its detection result, for the current stride"""
+        with self._lock:
+            frame_period = self.frame_period
+            inference_time = self.inference_time
+            stride = self.stride
+        if frame_period is None or inference_time is None:
+            return None
+        return inference_time + max(0.0, inference_time - stride * frame_period)
+
+    def detection_rate(self)->float|None:
+        """Expected amount of detections per second for the current stride"""
+        with self._lock:
+            frame_period = self.frame_period
+            stride = self.stride
+        if frame_period is None or frame_period <= 0:
+            return None
+        return 1 / (stride * frame_period)
@@ -0,0 +1,96 @@
+#To run object detection outside of the rclpy executor thread
+from threading import Condition, Thread
+
+
+class LatestFrameSlot():
+    """Single-slot mailbox holding only the most recent frame (latest frame wins).
+    Putting a frame while the previous one has not been taken yet replaces it, and the replaced frame is counted as dropped."""
+
+    def __init__(self):
+        self._condition = Condition()
+
+        #Frame waiting to be processed. None when the slot is empty
+        self._frame = None
+
+        #Set to True when the slot is closed, to wake up and release the consumer
+        self._closed = False
+
+        #Amount of frames put in the slot, and amount of frames replaced before being taken (stale frames)
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame)->None:
+        """Puts a frame in the slot, replacing (and counting as dropped) the frame that was waiting, if any."""
+        with self._condition:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.received += 1
+            self._condition.notify()
+
+    def take(self, timeout=None):
+        """Waits for a frame and removes it from the slot.
+        Returns None if no frame arrived before the timeout or if the slot was closed."""
+        with self._condition:
+            if self._frame is None and not self._closed:
+                self._condition.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self)->None:
+        """Closes the slot and wakes up the consumer waiting on it"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self)->bool:
+        return self._closed
+
+
+class InferenceWorker(Thread):
+    """Thread taking the freshest frame of a LatestFrameSlot and passing it to a processing function.
+    The subscriber callback only has to put frames in the slot, so it never blocks on the object detection model."""
+
+    #Period (in seconds) at which the worker checks whether it has been stopped when no frame is received
+    poll_period = 0.1
+
+    def __init__(self, slot:LatestFrameSlot, process, logger=None, name="inference_worker", setup=None):
+        super().__init__(name=name, daemon=True)
+        self.slot = slot
+
+        #Function called on each frame taken from the slot
+        self.process = process
+
+        #Function called once when the worker starts, before processing frames (for example to load the model).
+        #Frames received in the meantime replace each other in the slot.
+        self.setup = setup
+
+        self.logger = logger
+
+        #Amount of frames processed by the worker
+        self.processed = 0
+
+    def run(self)->None:
+        if self.setup is not None:
+            try:
+                self.setup()
+            except Exception as error:
+                if self.logger is not None:
+                    self.logger.error(f"Inference worker setup failed: {error}")
+                return
+        while not self.slot.closed:
+            frame = self.slot.take(self.poll_period)
+            if frame is None:
+                continue
+            try:
+                self.process(frame)
+            except Exception as error: #an error on one frame must not kill the worker
+                if self.logger is not None:
+                    self.logger.error(f"Inference failed on a frame: {error}")
+            self.processed += 1
+
+    def stop(self, timeout=None)->None:
+        """Stops the worker once the frame being processed (if any) is done"""
+        self.slot.close()
+        self.join(timeout)
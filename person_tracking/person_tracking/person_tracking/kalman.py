@@ -0,0 +1,86 @@
+#To handle the matrices of the filter
+import numpy as np
+
+
+class TargetKalmanFilter():
+    """Constant-velocity Kalman filter on the tracked person's normalized midpoint (x, y) and box size (width, height).
+    The state is [x, y, width, height, vx, vy, vwidth, vheight] (velocities per second).
+    predict() is called at every control tick and update() whenever a detection arrives, so the target's position is
+    estimated between detections, even when the control loop runs faster than the detector or inference time varies."""
+
+    def __init__(self, acceleration_noise:float=0.5, measurement_noise:float=0.02, initial_velocity_std:float=0.5):
+        #Standard deviation of the (unknown) acceleration of the target, in normalized units per second squared
+        self.acceleration_noise = acceleration_noise
+
+        #Standard deviation of the error of the detector on the midpoint and box size, in normalized units
+        self.measurement_noise = measurement_noise
+
+        #Standard deviation of the velocity when the filter starts (the velocity is unknown)
+        self.initial_velocity_std = initial_velocity_std
+
+        #Measurement model: only the midpoint and the box size are measured
+        self.H = np.hstack((np.eye(4), np.zeros((4, 4))))
+        self.R = np.eye(4) * measurement_noise ** 2
+
+        self.reset()
+
+    def reset(self)->None:
+        """Forgets the target: the next update() starts the filter again"""
+        self.state = np.zeros(8)
+        self.P = np.eye(8)
+        self.initialized = False
+
+    def predict(self, dt:float)->None:
+        """Moves the estimation of the target dt seconds forward"""
+        if not self.initialized or dt <= 0:
+            return
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+
+        #Process noise of a constant-velocity model driven by a random acceleration (discrete white noise acceleration)
+        q = self.acceleration_noise ** 2
+        Q = np.zeros((8, 8))
+        Q[:4, :4] = np.eye(4) * q * dt ** 4 / 4
+        Q[:4, 4:] = Q[4:, :4] = np.eye(4) * q * dt ** 3 / 2
+        Q[4:, 4:] = np.eye(4) * q * dt ** 2
+
+        self.state = F @ self.state
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, measurement)->None:
+        """Corrects the estimation with a detection: [x, y, width, height], normalized"""
+        z = np.asarray(measurement, dtype=np.float64)
+        if not self.initialized:
+            self.state = np.concatenate((z, np.zeros(4)))
+            self.P = np.diag(np.concatenate((np.full(4, self.measurement_noise ** 2), np.full(4, self.initial_velocity_std ** 2))))
+            self.initialized = True
+            return
+        innovation = z - self.H @ self.state
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    @property
+    def position(self)->np.ndarray:
+        """Estimated midpoint (x, y)"""
+        return self.state[:2]
+
+    @property
+    def size(self)->np.ndarray:
+        """Estimated box size (width, height)"""
+        return self.state[2:4]
+
+    @property
+    def velocity(self)->np.ndarray:
+        """Estimated velocity of the midpoint (vx, vy), per second"""
+        return self.state[4:6]
+
+    @property
+    def covariance(self)->np.ndarray:
+        """Covariance of the state (8,8)"""
+        return self.P
+
+    def position_std(self)->float:
+        """Largest standard deviation of the estimated midpoint"""
+        return float(np.sqrt(np.max(np.diag(self.P)[:2])))
@@ -0,0 +1,68 @@
+#Custom message carrying the timing of a stage of the pipeline on one frame
+from person_tracked.msg import StageTiming
+
+#To compute the percentiles of the latencies
+import numpy as np
+from collections import deque
+
+
+def time_seconds(time_msg)->float:
+    """Time in seconds of a builtin_interfaces/Time message"""
+    return time_msg.sec + time_msg.nanosec * 1e-9
+
+
+class LatencyRecorder():
+    """Records the timings of the stages of a node: for each frame a stage works on, a StageTiming message is published on /latency,
+    with the stamp of the frame (its capture time) and the times the stage started and ended.
+    Only three timestamps are taken per stage and frame, so recording is cheap enough to stay on in flight.
+    The LatencyMonitor node (person_tracking.latency_monitor) collects them."""
+
+    def __init__(self, node, topic:str="/latency", qos:int=50):
+        self.node = node
+        self.publisher = node.create_publisher(StageTiming, topic, qos)
+
+    def now(self):
+        """Current time of the node's clock, to give as the start of a stage"""
+        return self.node.get_clock().now()
+
+    def record(self, stage:str, header, start, end=None)->None:
+        """Publishes the timing of a stage on a frame.
+        header: header of the frame (or of a message carrying the frame's stamp)
+        start, end: rclpy Time of the start and end of the stage (end defaults to now)"""
+        msg = StageTiming()
+        msg.header = header
+        msg.node = self.node.get_name()
+        msg.stage = stage
+        msg.start = start.to_msg()
+        msg.end = (self.now() if end is None else end).to_msg()
+        self.publisher.publish(msg)
+
+
+class StageStats():
+    """Latencies of a stage over the last 'window' frames: the duration of the stage, and the time elapsed between the capture
+    of the frame and the end of the stage (for the last stage of the pipeline, the end-to-end latency)"""
+
+    #Percentiles reported
+    percentiles = (50, 95, 99)
+
+    def __init__(self, window:int=1000):
+        self.durations = deque(maxlen=window)
+        self.since_capture = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, timing)->None:
+        """Adds the timing (StageTiming message) of the stage on a frame"""
+        end = time_seconds(timing.end)
+        self.durations.append(end - time_seconds(timing.start))
+        self.since_capture.append(end - time_seconds(timing.header.stamp))
+        self.count += 1
+
+    def summary(self)->dict:
+        """p50, p95 and p99 (in milliseconds) of the durations and of the times since capture"""
+        values = {"frames": self.count}
+        for name, latencies in (("duration", self.durations), ("since_capture", self.since_capture)):
+            if not latencies:
+                continue
+            for percentile, value in zip(self.percentiles, np.percentile(np.array(latencies), self.percentiles) * 1000):
+                values[f"{name}_p{percentile}_ms"] = float(value)
+        return values
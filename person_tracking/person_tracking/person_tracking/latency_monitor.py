@@ -0,0 +1,140 @@
+#To handle ROS node
+import rclpy
+from rclpy.node import Node
+
+#Custom message carrying the timing of a stage of the pipeline on one frame
+from person_tracked.msg import StageTiming
+
+#Diagnostics messages, to publish the percentiles of the latencies
+from diagnostic_msgs.msg import DiagnosticArray
+from person_tracking.diagnostics import make_status, make_array
+
+#Service to dump the trace file on demand
+from std_srvs.srv import Trigger
+
+#To write the trace file
+import json
+from pathlib import Path
+from collections import deque
+
+from person_tracking.latency import StageStats, time_seconds
+
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
+
+
+class LatencyMonitor(Node):
+    """Collects the timings recorded by the nodes of the pipeline (StageTiming messages on /latency, see person_tracking.latency)
+    and publishes, for each stage, the p50/p95/p99 of its duration and of the time elapsed since the capture of the frame.
+    The time since capture of the last stage (the tracker's command) is the end-to-end latency of the pipeline.
+    The timings can be dumped to a trace file in the Chrome trace event format (chrome://tracing, https://ui.perfetto.dev):
+    on request with the ~/dump_trace service, and when the node is destroyed, if the trace_file parameter is set.
+    NB: the latencies since capture assume that the camera stamps the frames with the clock of the nodes (not the replay node's
+    backpressure mode, whose stamps follow the clip)."""
+
+    #Topic names
+    latency_topic = "/latency"
+    diagnostics_topic = "/diagnostics"
+
+    def __init__(self, name):
+        #Creating the Node
+        super().__init__(name)
+
+        #Parameters: amount of frames the percentiles are computed on, period (in seconds) of the reports,
+        #trace file (empty to dump nothing at exit) and amount of timings kept for it
+        self.window = self.declare_parameter("window", 1000).value
+        self.report_period = self.declare_parameter("report_period", 1.0).value
+        self.trace_file = self.declare_parameter("trace_file", "").value
+        self.max_trace_events = self.declare_parameter("max_trace_events", 200000).value
+
+        #subscribers
+        self.sub_latency = self.create_subscription(StageTiming, self.latency_topic, self.latency_callback, 100)
+
+        #publishers
+        self.publisher_diagnostics = self.create_publisher(DiagnosticArray, self.diagnostics_topic, 5)
+        self.timer_report = self.create_timer(self.report_period, self.report_callback)
+
+        #service
+        self.srv_dump = self.create_service(Trigger, "~/dump_trace", self.dump_trace_callback)
+
+        #Statistics of each stage, by "node/stage" name, in the order the stages were first seen
+        self.stages = {}
+
+        #Last timings received, for the trace file
+        self.timings = deque(maxlen=self.max_trace_events)
+
+    def latency_callback(self, timing):
+        """Callback function for the subscriber to /latency: adds the timing to the statistics of its stage"""
+        name = f"{timing.node}/{timing.stage}"
+        if name not in self.stages:
+            self.stages[name] = StageStats(self.window)
+        self.stages[name].add(timing)
+        self.timings.append(timing)
+
+    def report_callback(self):
+        """Callback function for the diagnostics publisher (to topic /diagnostics): one status per stage"""
+        if not self.stages:
+            return
+        statuses = [make_status(f"{self.get_name()}: {name}", stats.summary()) for name, stats in self.stages.items()]
+        self.publisher_diagnostics.publish(make_array(self, statuses))
+
+    def trace_events(self)->list:
+        """Timings received, as Chrome trace events: one process per node, one thread per stage, one complete event per stage and frame.
+        Times are in microseconds, and the stamp of the frame is given in the arguments, to follow a frame through the pipeline."""
+        events = []
+        processes = {}
+        threads = {}
+        for timing in self.timings:
+            if timing.node not in processes:
+                processes[timing.node] = len(processes) + 1
+                events.append({"name": "process_name", "ph": "M", "pid": processes[timing.node], "args": {"name": timing.node}})
+            name = f"{timing.node}/{timing.stage}"
+            if name not in threads:
+                threads[name] = len(threads) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": processes[timing.node], "tid": threads[name], "args": {"name": timing.stage}})
+            start = time_seconds(timing.start)
+            events.append({"name": timing.stage, "cat": timing.node, "ph": "X", "pid": processes[timing.node], "tid": threads[name],
+                           "ts": start * 1e6, "dur": (time_seconds(timing.end) - start) * 1e6,
+                           "args": {"frame_stamp": time_seconds(timing.header.stamp), "frame_id": timing.header.frame_id}})
+        return events
+
+    def dump_trace(self, path)->int:
+        """Writes the trace file. Returns the amount of stage timings written"""
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, trace_file)
+        return len(self.timings)
+
+    def dump_trace_callback(self, request, response):
+        """Callback function of the ~/dump_trace service: writes the trace file (trace_file parameter, or latency_trace.json)"""
+        path = self.trace_file or "latency_trace.json"
+        try:
+            count = self.dump_trace(path)
+            response.success = True
+            response.message = f"{count} stage timings written to {path}"
+        except OSError as error:
+            response.success = False
+            response.message = str(error)
+        return response
+
+    def destroy_node(self):
+        """Dumps the trace file (if the trace_file parameter is set) before destroying the node"""
+        if self.trace_file:
+            count = self.dump_trace(self.trace_file)
+            self.get_logger().info(f"{count} stage timings written to {self.trace_file}")
+        super().destroy_node()
+
+
+def main(args=None):
+    #Initialization of ROS communication
+    rclpy.init(args=args)
+
+    #Node instantiation
+    monitor = LatencyMonitor('latency_monitor')
+
+    #execute the callback functions on several threads until the executor is shutdown
+    try:
+        spin([monitor])
+    finally:
+        rclpy.shutdown()
@@ -0,0 +1,134 @@
+#To handle ROS node
+import rclpy
+from rclpy.node import Node
+
+#ROS image message
+from sensor_msgs.msg import Image
+
+#Custom message to send bounding boxes
+from all_bounding_boxes_msg.msg import AllBoundingBoxes
+from person_tracking.boxes import result_to_msg
+
+#To convert ROS Image messages to cv2 images
+from cv_bridge import CvBridge
+
+#To run the batches on a dedicated thread
+from threading import Thread
+
+#Batching stage
+from person_tracking.batch_inference import FrameBatcher, BatchDetector
+
+#YOLOv8 object detection model, run by the backend chosen in config/config.yaml.
+#It is loaded by the batching thread when the node starts, and shared by the nodes of the process.
+from person_tracking.config import detector_config
+from person_tracking.backends import get_backend
+
+#Defining claases of interest
+classes_needed = ["person"]
+
+
+class MultiStreamDetector(Node):
+    """Person detector for several image streams (several drones, replayed recordings...).
+    The newest frame of each stream is batched with the frames of the other streams, and the batch goes through the model in one forward pass.
+    The bounding boxes of each stream are published on their own topic, and each stream keeps its own tracker."""
+
+    #Minimum confidence probability for a detection to be accepted
+    minimum_prob = 0.4
+
+    #Period (in seconds) at which the batching thread checks whether the node is being destroyed
+    poll_period = 0.1
+
+    def __init__(self,name):
+        #Creating the Node
+        super().__init__(name)
+
+        #Parameters: the image topics to detect persons in, the maximum amount of frames in a batch,
+        #and the maximum time (in seconds) a frame waits for the batch to be full
+        self.image_topics = self.declare_parameter("image_topics", ["/camera/image_raw"]).value
+        self.max_batch_size = self.declare_parameter("max_batch_size", len(self.image_topics)).value
+        self.max_wait = self.declare_parameter("max_wait", 0.03).value
+
+        self.cv_bridge = CvBridge()
+
+        self.batcher = FrameBatcher(self.max_batch_size, self.max_wait)
+        #Batched object detection, created by the batching thread once the model is loaded
+        self.detector = None
+
+        #Sequence number of the frames detected, for each stream
+        self.seqs = [0] * len(self.image_topics)
+
+        #One subscriber and one bounding boxes publisher per stream. The stream id is the index of its image topic.
+        self.subscribers = []
+        self.publishers_bounding_boxes = []
+        for stream_id, topic in enumerate(self.image_topics):
+            self.subscribers.append(self.create_subscription(Image, topic, lambda img, stream_id=stream_id: self.listener_callback(stream_id, img), 5))
+            self.publishers_bounding_boxes.append(self.create_publisher(AllBoundingBoxes, self.bounding_boxes_topic(topic), 5))
+            self.get_logger().info(f"Stream {stream_id}: {topic} -> {self.bounding_boxes_topic(topic)}")
+
+        self.batch_thread = Thread(target=self.batch_loop, name="batch_inference", daemon=True)
+        self.batch_thread.start()
+
+    def listener_callback(self, stream_id:int, img)->None:
+        """Callback function of the image subscribers. Stamps the frame with its reception time if the camera did not stamp it,
+        and adds it to the batcher"""
+        if img.header.stamp.sec == 0 and img.header.stamp.nanosec == 0:
+            img.header.stamp = self.get_clock().now().to_msg()
+        self.batcher.put(stream_id, img)
+
+    def bounding_boxes_topic(self, image_topic:str)->str:
+        """Topic on which the bounding boxes of a stream are published, next to its image topic.
+        For example, the boxes of /drone1/camera/image_raw are published on /drone1/camera/all_bounding_boxes"""
+        return image_topic.rsplit("/", 1)[0] + "/all_bounding_boxes"
+
+    def batch_loop(self)->None:
+        """Loop of the batching thread: loads the model, then gets a batch of frames, performs object detection on it, and publishes the boxes of each stream"""
+        try:
+            self.load_model()
+        except Exception as error:
+            self.get_logger().error(f"Could not load the object detection model: {error}")
+            return
+        while not self.batcher.closed:
+            batch = self.batcher.next_batch(self.poll_period)
+            if not batch:
+                continue
+            try:
+                frames = [(stream_id, self.cv_bridge.imgmsg_to_cv2(img, "rgb8")) for stream_id, img in batch]
+                headers = dict((stream_id, img.header) for stream_id, img in batch)
+                for stream_id, result in self.detector.detect(frames):
+                    #The boxes of each frame are published exactly once, with the header of the frame
+                    self.seqs[stream_id] += 1
+                    self.publishers_bounding_boxes[stream_id].publish(result_to_msg(result, headers[stream_id], self.seqs[stream_id]))
+            except Exception as error: #an error on one batch must not kill the thread
+                self.get_logger().error(f"Batch inference failed: {error}")
+                continue
+            self.get_logger().info(f"Batch of {len(batch)} frames processed ({self.batcher.dropped} stale frames dropped)")
+
+    def load_model(self)->None:
+        """Gets the object detection model (loading it if no other node of the process did), warms it up and creates the batched detector"""
+        backend = get_backend(detector_config(), self.get_logger(), instance="batch")
+        classes_ID = [k for k,v in backend.names.items() if v in classes_needed]
+        backend.warmup(classes_ID)
+        self.detector = BatchDetector(backend, classes_ID, self.minimum_prob)
+        self.get_logger().info(f"Object detection model ready (first inference: {backend.first_inference_time:.2f}s)")
+
+    def destroy_node(self):
+        """Stops the batching thread before destroying the node"""
+        self.batcher.close()
+        self.batch_thread.join(1.0)
+        super().destroy_node()
+
+
+def main(args=None):
+    #Initialization of ROS communication
+    rclpy.init(args=args)
+
+    #Node instantiation
+    detector = MultiStreamDetector('multi_stream_person_detector')
+
+    #execute the callback function until the global executor is shutdown
+    rclpy.spin(detector)
+
+    #destroy the node. It is not mandatory, since the garbage collection can do it
+    detector.destroy_node()
+
+    rclpy.shutdown()
@@ -1,63 +1,110 @@
+#PID controllers working on one or several axes at once
+import numpy as np
+
+#Default clock of the controllers
+from time import monotonic
+
+
+class PID():
+    """PID controller on one or several axes (the gains, setpoints and measurements can be scalars or arrays, one value per axis).
+    - dt is the real time elapsed between two calls to compute(), in seconds (given with 'now', or measured with time.monotonic)
+    - the integral is clamped to integral_limits, and isn't increased while the output is saturated in the direction of the error (anti-windup)
+    - the derivative is low-pass filtered: derivative_smoothing is the weight of the new measurement (1 = no filtering)
+    - the output is saturated to output_limits
+    - errors smaller than dead_zone (in absolute value) are considered null, to avoid having the drone always moving"""
+
+    def __init__(self, kp, ki=0.0, kd=0.0, setpoint=0.0, output_limits=(None, None), integral_limits=(None, None),
+                 derivative_smoothing:float=0.5, dead_zone=0.0):
+        self.kp = np.asarray(kp, dtype=np.float64)
+        self.ki = np.asarray(ki, dtype=np.float64)
+        self.kd = np.asarray(kd, dtype=np.float64)
+        self.setpoint = np.asarray(setpoint, dtype=np.float64)
+        self.output_limits = output_limits
+        self.integral_limits = integral_limits
+        self.derivative_smoothing = derivative_smoothing
+        self.dead_zone = np.asarray(dead_zone, dtype=np.float64)
+        self.reset()
+
+    def reset(self)->None:
+        """Forgets the integral, the derivative and the time of the last call"""
+        self.integral = np.zeros(np.broadcast(self.kp, self.setpoint).shape)
+        self.derivative = np.zeros_like(self.integral)
+        self.prev_error = None
+        self.last_time = None
+        self.output = np.zeros_like(self.integral)
+
+    def compute(self, measurement, now:float=None)->np.ndarray:
+        """Output of the controller for the current measurement, at time 'now' (in seconds)"""
+        return self.compute_error(self.setpoint - np.asarray(measurement, dtype=np.float64), now)
+
+    def compute_error(self, error, now:float=None)->np.ndarray:
+        """Output of the controller for the current error (setpoint - measurement), at time 'now' (in seconds)"""
+        now = monotonic() if now is None else now
+        error = np.asarray(error, dtype=np.float64)
+        error = np.where(np.abs(error) < self.dead_zone, 0.0, error)
+        dt = 0.0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+
+        if dt > 0:
+            #Anti-windup: no integration while the output is saturated in the direction of the error
+            lower, upper = self.output_limits
+            saturated = np.zeros(error.shape, dtype=bool)
+            if upper is not None:
+                saturated |= (self.output >= upper) & (error > 0)
+            if lower is not None:
+                saturated |= (self.output <= lower) & (error < 0)
+            self.integral = np.where(saturated, self.integral, self.clamp(self.integral + error * dt, self.integral_limits))
+
+            derivative = (error - self.prev_error) / dt
+            self.derivative = self.derivative_smoothing * derivative + (1 - self.derivative_smoothing) * self.derivative
+        self.prev_error = error
+
+        self.output = self.clamp(self.kp * error + self.ki * self.integral + self.kd * self.derivative, self.output_limits)
+        return self.output
+
+    @staticmethod
+    def clamp(value, limits:tuple)->np.ndarray:
+        lower, upper = limits
+        return np.clip(value, -np.inf if lower is None else lower, np.inf if upper is None else upper)
 
 
 """Simple PID controller to keep the person tracked within the camera's field"""
 class PIDPoint():
-    def __init__(self,setpoint):
+    def __init__(self, setpoint, kp=1.0, ki=0.01, kd=0.0, output_limits=(None, None), integral_limits=(-3.0, 3.0)):
         self.setpoint = setpoint #(x,y)
-        self.prev_error_x = 0
-        self.integral_error_x = 0
-        self.derivative_error_x = 0
-        self.error_x = 0
-
-        self.prev_error_y = 0
-        self.integral_error_y = 0
-        self.derivative_error_y = 0
-        self.error_y = 0
-        
-        self.kp = 1
-        self.ki = 0.01 #0 is the best
-        self.kd = 0
-        self.time_step = 1 #frame
-        self.output = 0 #correction to apply in the form (output_x, output_y)
-
-    def compute(self,pos)->(float,float):
+        self.pid = PID(kp, ki, kd, setpoint, output_limits, integral_limits)
+        self.output = (0.0, 0.0) #correction to apply in the form (output_x, output_y)
+
+    def compute(self, pos, now:float=None)->(float,float):
         """Funtion to compute the output of the PID controller, given the current
         position 'pos'. In our case pos represent the current coordinates of the middlepoint of tracked person"""
-        #if self.integral_error_x > 3 :
-        #    self.integral_error_x = 0
-        #if self.integral_error_y > 3:
-        #    self.integral_error_y = 0
-        setpoint_x, setpoint_y = self.setpoint
-        pos_x = pos.x
-        pos_y = pos.y
-        self.error_x = setpoint_x - pos_x
-        self.error_y = setpoint_y - pos_y
-
-        self.integral_error_x = self.integral_error_x + self.error_x * self.time_step
-        self.derivative_error_x = (self.error_x - self.prev_error_x) * self.time_step
-        self.prev_error_x = self.error_x
-
-        self.integral_error_y = self.integral_error_y + self.error_y * self.time_step
-        self.derivative_error_y = (self.error_y - self.prev_error_y) * self.time_step
-        self.prev_error_y = self.error_y
-
-        self.output = (self.kp * self.error_x + self.ki * self.integral_error_x + self.kd * self.derivative_error_x, self.kp * self.error_y + self.ki * self.integral_error_y + self.kd * self.derivative_error_y)
-        
-        #self.output = (self.kp * self.error_x + self.ki * self.integral_error_x, self.kp * self.error_y + self.ki * self.integral_error_y)
-
+        output_x, output_y = self.pid.compute((pos.x, pos.y), now).tolist()
+        self.output = (output_x, output_y)
         return self.output
 
 
 """PID controller to ensure that the drone's distance to the tracked person is within a certain field"""
 class PIDRange():
-    def __init__(self,set_range_min, set_range_max):
+    def __init__(self, set_range_min, set_range_max, kp=0.1, ki=0.1, kd=0.0, output_limits=(None, None), integral_limits=(-1.0, 1.0)):
         self.setrange = (set_range_min,set_range_max)
-        self.error = 0
-        self.prev_error = 0
-        self.kp = 0.1#1
-        self.ki = 0.1#1
-        self.kd = 0#1
-        self.time = 1 #frame
+        self.pid = PID(kp, ki, kd, 0.0, output_limits, integral_limits)
+        self.error = 0.0
+        self.output = 0.0
+
+    def compute(self, value, now:float=None)->float:
+        """Output of the controller for the current value (e.g. the height of the tracked person's box):
+        null while the value is within the range, and driving it back to the nearest bound of the range else"""
+        range_min, range_max = self.setrange
+        if value < range_min:
+            self.error = range_min - value
+        elif value > range_max:
+            self.error = range_max - value
+        else:
+            #Within the range: nothing to correct, and nothing to remember
+            self.error = 0.0
+            self.pid.reset()
+        self.output = float(self.pid.compute_error(self.error, now))
+        return self.output
 
 
 class Point():
@@ -70,15 +117,15 @@ def main():
     #test_input = [Point(0.3,0.3),Point(0.5,0.5),Point(0.7,0.7),Point(0.5,0.5),Point(1,1),Point(0,0)]
 
     input_test = Point(0.3,0.2)
-    test_pid = PIDPoint((0.5,0.5))
+    test_pid = PIDPoint((0.5,0.5), kp=0.5)
     #test_correction = map(test_pid.compute, test_input)
     #print(list(test_correction))
 
     for i in range(50):
         print(f"( {input_test.x} , {input_test.y} )")
-        new_error_x, new_error_y = test_pid.compute(input_test)
+        new_error_x, new_error_y = test_pid.compute(input_test, now=i*0.1)
         input_test = Point(input_test.x+new_error_x, input_test.y+new_error_y)
-        
 
-main()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#To handle ROS nodes
+import rclpy
+
+#Nodes of the pipeline
+from person_tracking.detect_all import DetectAll
+from person_tracking.tracking_trigger import TriggerTracking
+
+#In-process frame transport between the camera and the detector
+from person_tracking.frame_bus import frame_bus
+
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
+
+
+def main(args=None):
+    """Runs the camera, detector and trigger nodes in a single process (composed mode).
+    The camera hands its frames to the detector through the frame bus, as NumPy arrays: there is no conversion to sensor_msgs/Image,
+    no serialization and no conversion back, so a frame stays a single buffer from the camera to the detector.
+    The other topics (bounding boxes, person tracked...) still go through ROS."""
+    #Initialization of ROS communication
+    rclpy.init(args=args)
+
+    nodes = []
+
+    #The camera node of the tello package needs the drone's SDK (djitellopy). Without it (e.g. when replaying clips),
+    #the detector subscribes to /camera/image_raw as in distributed mode.
+    try:
+        from tello.camera_publisher import ImagePublisher
+    except ImportError:
+        ImagePublisher = None
+
+    if ImagePublisher is not None:
+        nodes.append(ImagePublisher('camera_1_pub', frame_bus=frame_bus, frame_topic=DetectAll.image_raw_topic))
+        detector = DetectAll('all_person_detector', frame_bus=frame_bus)
+    else:
+        detector = DetectAll('all_person_detector')
+        detector.get_logger().warning(f"Camera node unavailable: frames are received from {DetectAll.image_raw_topic}")
+    nodes.append(detector)
+    nodes.append(TriggerTracking('trigger_tracking_node'))
+
+    #execute the callback functions on several threads until the executor is shutdown.
+    #The amount of threads is the num_threads parameter of the first node.
+    #The detector (Pygame window, 20 Hz tick) is executed on the main thread, the camera and trigger nodes on the executor threads.
+    try:
+        spin(nodes, main_thread_nodes=[detector])
+    finally:
+        rclpy.shutdown()
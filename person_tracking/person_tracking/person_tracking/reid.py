@@ -0,0 +1,102 @@
+#To compute the color histograms
+import cv2
+import numpy as np
+
+#Bounded gallery and cache
+from collections import deque, OrderedDict
+
+
+def crop_box(image:np.ndarray, box)->np.ndarray|None:
+    """Crop of a normalized box [x1, y1, x2, y2] in an image, or None if it is empty"""
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = box
+    x1, x2 = int(max(x1, 0) * width), int(min(x2, 1) * width)
+    y1, y2 = int(max(y1, 0) * height), int(min(y2, 1) * height)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return None
+    return image[y1:y2, x1:x2]
+
+
+def color_embedding(crop:np.ndarray, bins:tuple=(8, 8, 4))->np.ndarray:
+    """Appearance embedding of a person's crop (RGB): the HSV color histograms of the upper and lower halves of the crop
+    (clothes of the torso and of the legs), concatenated and L2-normalized. Cheap to compute on the CPU and robust to small pose changes."""
+    hsv = cv2.cvtColor(crop, cv2.COLOR_RGB2HSV)
+    middle = hsv.shape[0] // 2
+    histograms = [cv2.calcHist([half], [0, 1, 2], None, list(bins), [0, 180, 0, 256, 0, 256]).ravel()
+                  for half in (hsv[:middle], hsv[middle:])]
+    embedding = np.sqrt(np.concatenate(histograms)) #square root: less weight to the dominant color
+    return embedding / max(np.linalg.norm(embedding), 1e-9)
+
+
+class EmbeddingCache():
+    """Computes the appearance embeddings of the detected persons. It runs in the detector, which has the frames, and the embeddings
+    are sent with the bounding boxes: no other node needs the frames to recognize a person.
+    Embeddings are cached per track ID (the detector's tracker gives the same ID to a person across frames) and recomputed every
+    'refresh_period' frames, so that the cost per frame stays small while the gallery of the tracked person still gets new views.
+    Untracked persons (track ID -1) are computed on every frame."""
+
+    def __init__(self, refresh_period:int=5, cache_size:int=64):
+        self.refresh_period = refresh_period
+
+        #(embedding, number of the frame it was computed on) of the last persons seen, by track ID
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+        #Number of the current frame
+        self.frame_index = 0
+
+    def embeddings(self, image:np.ndarray, boxes:np.ndarray, track_ids:np.ndarray)->list:
+        """Embeddings of the persons in the normalized boxes (N,4) of an image, None for the empty boxes"""
+        self.frame_index += 1
+        embeddings = []
+        for box, track_id in zip(boxes, track_ids.tolist()):
+            cached = self.cache.get(track_id) if track_id >= 0 else None
+            if cached is not None and self.frame_index - cached[1] < self.refresh_period:
+                self.cache.move_to_end(track_id)
+                embeddings.append(cached[0])
+                continue
+            crop = crop_box(image, box)
+            embedding = None if crop is None else color_embedding(crop)
+            if embedding is not None and track_id >= 0:
+                self.cache[track_id] = (embedding, self.frame_index)
+                self.cache.move_to_end(track_id)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            embeddings.append(embedding)
+        return embeddings
+
+
+class ReIdentifier():
+    """Remembers the appearance of the tracked person, to find them again among the persons detected after losing them.
+    The gallery keeps the last 'gallery_size' embeddings of the tracked person (computed by the detector, see EmbeddingCache),
+    and a candidate matches it when its highest cosine similarity with the gallery reaches 'threshold'."""
+
+    def __init__(self, gallery_size:int=20, threshold:float=0.8):
+        self.gallery = deque(maxlen=gallery_size)
+        self.threshold = threshold
+
+    def reset(self)->None:
+        """Forgets the tracked person"""
+        self.gallery.clear()
+
+    def remember(self, embedding:np.ndarray|None)->None:
+        """Adds an embedding of the tracked person to the gallery"""
+        if embedding is not None:
+            self.gallery.append(embedding)
+
+    def similarity(self, embedding:np.ndarray|None)->float:
+        """Highest cosine similarity between an embedding and the gallery (embeddings are normalized)"""
+        if embedding is None or not self.gallery:
+            return 0.0
+        return float(np.max(np.stack(self.gallery) @ embedding))
+
+    def best_match(self, embeddings:list)->(int|None, float):
+        """Index of the candidate (list of embeddings, None when unknown) most similar to the tracked person,
+        if it reaches the threshold, and its similarity"""
+        if not self.gallery or len(embeddings) == 0:
+            return None, 0.0
+        similarities = [self.similarity(embedding) for embedding in embeddings]
+        index = int(np.argmax(similarities))
+        if similarities[index] < self.threshold:
+            return None, similarities[index]
+        return index, similarities[index]
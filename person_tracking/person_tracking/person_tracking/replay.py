@@ -0,0 +1,275 @@
+#To handle ROS node
+import rclpy
+from rclpy.node import Node
+from rclpy.time import Time
+from rclpy.duration import Duration
+
+#ROS image message
+from sensor_msgs.msg import Image
+
+#Custom message to send bounding boxes, received to know when the detector is done with a frame (backpressure mode)
+from all_bounding_boxes_msg.msg import AllBoundingBoxes
+
+#To read the video clips
+import cv2
+from pathlib import Path
+
+#To convert cv2 images to ROS Image messages
+from cv_bridge import CvBridge
+
+#To decode and publish the frames on dedicated threads
+import time
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from collections import namedtuple
+
+#To find the media directory of the repository
+from person_tracking.config import find_config_file
+
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
+
+#Extensions of the video files replayed from a directory
+video_extensions = (".mp4", ".avi", ".mkv", ".mov")
+
+#Frame decoded from a clip: the RGB image, its time in the replay (in seconds, PTS of the clip plus the duration of the clips before it),
+#its number in the replay and the clip it comes from
+ReplayFrame = namedtuple("ReplayFrame", ["image", "media_time", "index", "clip"])
+
+
+def media_directory()->Path|None:
+    """media directory of the repository this package is run from"""
+    config_file = find_config_file()
+    return None if config_file is None else config_file.parent.parent / "media"
+
+
+def find_clips(source)->list:
+    """Video clips to replay: the file given, or the video files of the directory given (sorted by name)"""
+    path = Path(source).expanduser()
+    if path.is_dir():
+        return sorted(clip for clip in path.iterdir() if clip.suffix.lower() in video_extensions)
+    return [path] if path.is_file() else []
+
+
+class ClipPrefetcher(Thread):
+    """Thread decoding the clips one after the other (and again when looping) into a bounded queue of ReplayFrame.
+    When the queue is full, decoding waits for the replay to take a frame, so decoding never runs far ahead of publishing.
+    Frames are converted to RGB, and timed with their presentation timestamp (PTS) in the clip."""
+
+    def __init__(self, clips:list, size:int=32, loop:bool=True, logger=None):
+        super().__init__(name="replay_prefetch", daemon=True)
+        self.clips = clips
+        self.loop = loop
+        self.logger = logger
+        self.frames = Queue(maxsize=size)
+        self.stopped = Event()
+
+        #Set once the last clip was decoded (never set when looping)
+        self.finished = Event()
+
+    def run(self)->None:
+        offset = 0.0 #duration of the clips replayed before the current one
+        index = 0
+        while not self.stopped.is_set():
+            for clip in self.clips:
+                cap = cv2.VideoCapture(str(clip))
+                if not cap.isOpened():
+                    if self.logger is not None:
+                        self.logger.error(f"Can't open {clip}")
+                    continue
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                pts = 0.0
+                count = 0
+                while not self.stopped.is_set():
+                    success, frame = cap.read()
+                    if not success:
+                        break
+                    #PTS of the frame. Some containers don't give it: the frame number is used instead
+                    position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                    pts = position if position > 0 or count == 0 else count / fps
+                    count += 1
+                    if not self.put(ReplayFrame(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), offset + pts, index, clip.name)):
+                        break
+                    index += 1
+                cap.release()
+                offset += pts + 1 / fps
+                if self.stopped.is_set():
+                    break
+            if not self.loop or not self.clips:
+                break
+        self.finished.set()
+
+    def put(self, frame:ReplayFrame)->bool:
+        """Waits for room in the queue. Returns False if the prefetcher was stopped in the meantime"""
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(frame, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def take(self, timeout:float=0.1)->ReplayFrame|None:
+        try:
+            return self.frames.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def stop(self, timeout=None)->None:
+        self.stopped.set()
+        self.join(timeout)
+
+
+class ReplayPublisher(Node):
+    """Replays video clips on /camera/image_raw in place of the drone's camera, to run the detect -> trigger -> track chain on recordings.
+    Parameters:
+    - source: a video file, or a directory whose clips are replayed one after the other (default: the media directory of the repository)
+    - mode: "native" (frames published at the rate of the clip), "speed" (at 'speed' times the rate of the clip),
+      or "backpressure" (as fast as the detector consumes them: the next frame is published when the bounding boxes of the previous
+      one are received on /all_bounding_boxes, or after ack_timeout)
+    - loop: whether to start again when the last clip is over
+    - stamp_epoch: time (in seconds) the stamps start from, or a negative value (default) to start from the start time of the replay
+    Each frame is stamped with the start of the stamps plus its time in the replay (its PTS). By default, the stamps keep the timing
+    of the clip and, in native mode, follow the clock, but they change from one run to another. With a fixed stamp_epoch
+    (e.g. 0.0), the stamps are the same at every run, to compare the outputs of two runs, but they are unrelated to the clock
+    (the latencies since capture of the latency monitor are then meaningless).
+    Decoding is done ahead by a ClipPrefetcher thread, and frames are published by a replay thread."""
+
+    #Topic names
+    image_raw_topic = "/camera/image_raw"
+    bounding_boxes_topic = "/all_bounding_boxes"
+
+    #Frame of reference of the images
+    camera_frame_id = "replay_camera"
+
+    #Amount of frames decoded ahead
+    prefetch_size = 32
+
+    #Period (in seconds) of the log of the replay rate
+    report_period = 5.0
+
+    def __init__(self, name):
+        #Creating the Node
+        super().__init__(name)
+
+        default_source = media_directory()
+        self.source = self.declare_parameter("source", "" if default_source is None else str(default_source)).value
+        self.mode = self.declare_parameter("mode", "native").value
+        self.speed = self.declare_parameter("speed", 1.0).value
+        self.loop = self.declare_parameter("loop", True).value
+        self.ack_timeout = self.declare_parameter("ack_timeout", 1.0).value
+        self.stamp_epoch = self.declare_parameter("stamp_epoch", -1.0).value
+        if self.mode not in ("native", "speed", "backpressure"):
+            raise ValueError(f"Unknown replay mode {self.mode}: use native, speed or backpressure")
+        if self.mode == "speed" and not self.speed > 0:
+            raise ValueError(f"Invalid replay speed {self.speed}: it must be positive")
+        if self.mode == "native":
+            self.speed = 1.0
+
+        #publishers
+        self.publisher_ = self.create_publisher(Image, self.image_raw_topic, 10)
+
+        #Bounding boxes of the frames published, to know when the detector is ready for the next one
+        if self.mode == "backpressure":
+            self.sub_boxes = self.create_subscription(AllBoundingBoxes, self.bounding_boxes_topic, self.boxes_callback, 10)
+        self.consumed = Event()
+        self.last_stamp = None
+
+        self.cv_bridge = CvBridge()
+
+        #Amount of frames published, frames published late (timed modes), and frames not acknowledged in time (backpressure mode)
+        self.published = 0
+        self.late = 0
+        self.timeouts = 0
+
+        clips = find_clips(self.source)
+        if not clips:
+            raise FileNotFoundError(f"No video clip found in '{self.source}'")
+        self.get_logger().info(f"Replaying {len(clips)} clip(s) from {self.source} in {self.mode} mode"
+                               + (f" at {self.speed}x" if self.mode == "speed" else ""))
+
+        #Time of the first frame, on the clock (or stamp_epoch, for the stamps) and on the monotonic clock (pacing)
+        if self.stamp_epoch >= 0:
+            self.start_time = Time(nanoseconds=int(self.stamp_epoch * 1e9), clock_type=self.get_clock().clock_type)
+        else:
+            self.start_time = self.get_clock().now()
+        self.start_monotonic = time.monotonic()
+
+        self.prefetcher = ClipPrefetcher(clips, self.prefetch_size, self.loop, self.get_logger())
+        self.prefetcher.start()
+        self.stopped = Event()
+        self.replay_thread = Thread(target=self.replay_loop, name="replay", daemon=True)
+        self.replay_thread.start()
+
+    def replay_loop(self):
+        """Loop of the replay thread: takes the decoded frames in order and publishes them at the pace of the mode"""
+        last_report = time.monotonic()
+        while not self.stopped.is_set():
+            frame = self.prefetcher.take()
+            if frame is None:
+                if self.prefetcher.finished.is_set() and self.prefetcher.frames.empty():
+                    self.get_logger().info(f"Replay finished: {self.published} frames published")
+                    return
+                continue
+
+            if self.mode == "backpressure":
+                self.wait_consumed()
+            else:
+                delay = self.start_monotonic + frame.media_time / self.speed - time.monotonic()
+                if delay > 0:
+                    self.stopped.wait(delay)
+                elif delay < -0.5 / self.speed:
+                    self.late += 1
+            self.publish_frame(frame)
+
+            now = time.monotonic()
+            if now - last_report >= self.report_period:
+                self.get_logger().info(f"Frame {frame.index} of {frame.clip} ({frame.media_time:.2f}s): {self.published} published, "
+                                       f"{self.late} late, {self.timeouts} not acknowledged")
+                last_report = now
+
+    def publish_frame(self, frame:ReplayFrame):
+        """Publishes a frame stamped with the start of the stamps plus its time in the replay"""
+        msg = self.cv_bridge.cv2_to_imgmsg(frame.image, 'rgb8')
+        stamp = self.start_time + Duration(nanoseconds=int(frame.media_time * 1e9))
+        msg.header.stamp = stamp.to_msg()
+        msg.header.frame_id = self.camera_frame_id
+        self.last_stamp = stamp.nanoseconds
+        self.consumed.clear()
+        self.publisher_.publish(msg)
+        self.published += 1
+
+    def wait_consumed(self):
+        """Waits until the bounding boxes of the last frame published are received (backpressure mode)"""
+        if self.last_stamp is None:
+            return
+        if not self.consumed.wait(self.ack_timeout):
+            self.timeouts += 1
+
+    def boxes_callback(self, msg):
+        """Callback function for the subscriber to /all_bounding_boxes: the detector is done with a frame.
+        Boxes of an older frame (the detector skipped the last ones) don't release the replay."""
+        if self.last_stamp is not None and Time.from_msg(msg.header.stamp).nanoseconds >= self.last_stamp:
+            self.consumed.set()
+
+    def destroy_node(self):
+        """Stops the replay and decoding threads before destroying the node"""
+        self.stopped.set()
+        self.consumed.set()
+        self.prefetcher.stop(timeout=1.0)
+        self.replay_thread.join(timeout=1.0)
+        super().destroy_node()
+
+
+def main(args=None):
+    #Initialization of ROS communication
+    rclpy.init(args=args)
+
+    #Node instantiation
+    replay = ReplayPublisher('replay_publisher')
+
+    #execute the callback functions on several threads until the executor is shutdown
+    try:
+        spin([replay])
+    finally:
+        rclpy.shutdown()
@@ -0,0 +1,99 @@
+#To handle the bounding boxes
+import numpy as np
+
+
+def box_iou(box:np.ndarray, boxes:np.ndarray)->np.ndarray:
+    """Intersection over union between one box (4,) and each of the boxes (N,4). Boxes are given as [x1, y1, x2, y2]"""
+    top_left = np.maximum(box[:2], boxes[:, :2])
+    bottom_right = np.minimum(box[2:], boxes[:, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    area = np.prod(box[2:] - box[:2])
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def crop_to_frame(xyxyn:np.ndarray, window:tuple, frame_shape:tuple)->np.ndarray:
+    """Maps boxes normalized in a crop back to coordinates normalized in the full frame.
+    'window' is the crop in pixels (x1, y1, x2, y2) and 'frame_shape' the shape of the full frame."""
+    height, width = frame_shape[:2]
+    x1, y1, x2, y2 = window
+    scale = np.array((x2 - x1, y2 - y1, x2 - x1, y2 - y1), dtype=np.float64)
+    offset = np.array((x1, y1, x1, y1), dtype=np.float64)
+    return (xyxyn * scale + offset) / (width, height, width, height)
+
+
+class RoiSelector():
+    """Chooses the region of interest (ROI) object detection is performed on.
+    When a person is tracked, the ROI is the box of that person in the last detection, padded by a margin, so that the model works on
+    a small crop instead of the full frame. The full frame is used every 'full_frame_period' frames, and whenever the target is lost,
+    so that the tracker sees everybody regularly and the target can be found again."""
+
+    def __init__(self, padding:float=0.5, min_size:float=0.25, full_frame_period:int=5):
+        #Margin added on each side of the target's box, relative to the size of the box
+        self.padding = padding
+
+        #Minimal width and height of the crop, relative to the frame
+        self.min_size = min_size
+
+        self.full_frame_period = full_frame_period
+
+        #Normalized midpoint of the tracked person (None when nobody is tracked)
+        self.target_point = None
+
+        #Normalized box [x1, y1, x2, y2] and track ID of the tracked person in the last detection
+        self.target_box = None
+        self.target_id = -1
+
+        #Frames processed since the last full frame
+        self.frames_since_full_frame = 0
+
+    def set_target(self, point)->None:
+        """Sets the normalized midpoint (x, y) of the tracked person, or None when nobody is tracked or the person is lost"""
+        self.target_point = point
+        if point is None:
+            self.target_box = None
+            self.target_id = -1
+
+    def window(self, frame_shape:tuple)->tuple|None:
+        """Crop (x1, y1, x2, y2) in pixels to perform object detection on, or None to use the full frame"""
+        if self.target_point is None or self.target_box is None or self.frames_since_full_frame + 1 >= self.full_frame_period:
+            return None
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = self.target_box
+        margin_x = max((x2 - x1) * (1 + 2 * self.padding), self.min_size) / 2
+        margin_y = max((y2 - y1) * (1 + 2 * self.padding), self.min_size) / 2
+        center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
+        window = (int(max(center_x - margin_x, 0) * width), int(max(center_y - margin_y, 0) * height),
+                  int(np.ceil(min(center_x + margin_x, 1) * width)), int(np.ceil(min(center_y + margin_y, 1) * height)))
+        if window[2] - window[0] < 2 or window[3] - window[1] < 2:
+            return None
+        return window
+
+    def update(self, xyxyn:np.ndarray, track_ids:np.ndarray, full_frame:bool)->np.ndarray:
+        """Updates the target's box with the detections of the last frame (normalized in the full frame).
+        On crops, detections are not tracked: the target's track ID is given to the detection overlapping the most with the target's previous box.
+        Returns the track IDs of the detections."""
+        self.frames_since_full_frame = 0 if full_frame else self.frames_since_full_frame + 1
+        if self.target_point is None or len(xyxyn) == 0:
+            self.target_box = None
+            return track_ids
+
+        if full_frame or self.target_box is None:
+            #The target is the box containing its midpoint whose center is the closest to it (or the closest box if none contains it)
+            point = np.asarray(self.target_point, dtype=np.float64)
+            centers = (xyxyn[:, :2] + xyxyn[:, 2:]) / 2
+            distances = np.sum((centers - point) ** 2, axis=1)
+            contains = np.all((xyxyn[:, :2] <= point) & (point <= xyxyn[:, 2:]), axis=1)
+            index = int(np.argmin(np.where(contains, distances, distances + 1)))
+            self.target_id = int(track_ids[index])
+        else:
+            overlaps = box_iou(self.target_box, xyxyn)
+            index = int(np.argmax(overlaps))
+            if overlaps[index] == 0:
+                self.target_box = None
+                return track_ids
+            track_ids = track_ids.copy()
+            track_ids[index] = self.target_id
+
+        self.target_box = xyxyn[index].astype(np.float64)
+        return track_ids
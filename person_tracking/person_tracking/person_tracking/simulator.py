@@ -0,0 +1,293 @@
+"""Headless closed-loop simulator of the tracking pipeline, to tune the controller and catch regressions without a drone.
+A person walks along a scripted path (with a bystander walking nearby), a camera on the drone projects them into normalized boxes,
+delivered with a detection latency, noise and dropouts, and the drone moves with simple yaw, lateral, forward and vertical kinematics.
+The boxes go through the decisions of TriggerTracking (association of the detections with the target, re-identification) and TrackPerson
+(Kalman filter, flight state machine and PID controllers), the same code the nodes run (person_tracking.tracking_logic), faster than real time.
+For each path, the tracking errors, the fraction of the time the person is at the right distance, the time to reacquire the person after losing them, the command rate and the CPU time
+per simulated second are reported.
+Run it with: ros2 run person_tracking tracking_simulator [--duration S] [--latency S] [--dropout P] [--kp KP KP KP] [--distance-kp KP] [path ...]"""
+
+#To read the arguments
+import argparse
+from time import process_time, perf_counter
+from math import atan2, cos, sin, tan, pi, radians
+
+import numpy as np
+
+#Decisions of TriggerTracking and TrackPerson
+from person_tracking.tracking_logic import TargetSelector, TargetFollower
+from person_tracking import flight_control
+from person_tracking.flight_control import FlightController, FlightState, make_flight_controller
+
+
+#Scripted paths of the tracked person: position (x, y) in meters at time t, in the world frame.
+#The drone starts at (0, 0) looking along x, so the person starts 4 m in front of it.
+paths = {
+    #walks to the left and back at 1 m/s
+    "walk": lambda t: (4.0, 3.0 - abs((t % 12.0) - 6.0)),
+    #zigzags in front of the drone
+    "zigzag": lambda t: (4.0 + 0.5 * sin(0.3 * t), 2.0 * sin(0.8 * t)),
+    #walks in a circle around the drone's starting point
+    "circle": lambda t: (4.0 * cos(0.15 * t), 4.0 * sin(0.15 * t)),
+    #stands still, then runs out of the field of view and stops
+    "sprint": lambda t: (4.0, 0.0 if t < 5.0 else -min(4.0 * (t - 5.0), 8.0)),
+}
+
+
+class Camera():
+    """Pinhole camera on the drone, projecting a person (a standing box, on the ground) into normalized image coordinates"""
+
+    def __init__(self, horizontal_fov:float=radians(82.6), vertical_fov:float=radians(52.0), person_height:float=1.7, person_width:float=0.5):
+        self.horizontal_fov = horizontal_fov
+        self.vertical_fov = vertical_fov
+        self.person_height = person_height
+        self.person_width = person_width
+
+    def bearing(self, drone:"Drone", position:tuple)->tuple:
+        """Angle of the person relative to the camera's axis (positive to the left) and distance to the person"""
+        dx, dy = position[0] - drone.x, position[1] - drone.y
+        angle = (atan2(dy, dx) - drone.yaw + pi) % (2 * pi) - pi
+        return angle, float(np.hypot(dx, dy))
+
+    def project(self, drone:"Drone", position:tuple)->np.ndarray|None:
+        """Normalized box [x1, y1, x2, y2] of the person, or None if they are out of the field of view.
+        The person's middle is at the center of the image when the drone flies at half their height."""
+        angle, distance = self.bearing(drone, position)
+        if abs(angle) >= self.horizontal_fov / 2 or distance < 0.5:
+            return None
+        center_x = 0.5 - tan(angle) / (2 * tan(self.horizontal_fov / 2))
+        center_y = 0.5 + (drone.z - self.person_height / 2) / (2 * distance * tan(self.vertical_fov / 2))
+        width = self.person_width / (2 * distance * tan(self.horizontal_fov / 2))
+        height = self.person_height / (2 * distance * tan(self.vertical_fov / 2))
+        box = np.array((center_x - width / 2, center_y - height / 2, center_x + width / 2, center_y + height / 2))
+        return np.clip(box, 0.0, 1.0)
+
+
+class Drone():
+    """Drone with first-order yaw, lateral, forward and vertical dynamics: its speeds follow the commands with a time constant.
+    Linear commands (positive to the left, forward and upwards) are converted to m/s with speed_scale. It doesn't fly below min_altitude."""
+
+    min_altitude = 0.3
+
+    def __init__(self, time_constant:float=0.3, speed_scale:float=3.0, altitude:float=1.5):
+        self.x = self.y = self.yaw = 0.0
+        self.z = altitude
+        self.lateral_speed = 0.0
+        self.forward_speed = 0.0
+        self.vertical_speed = 0.0
+        self.yaw_rate = 0.0
+        self.time_constant = time_constant
+        self.speed_scale = speed_scale
+
+    def move(self, command, dt:float)->None:
+        alpha = min(dt / self.time_constant, 1.0)
+        self.lateral_speed += alpha * (command.linear_y * self.speed_scale - self.lateral_speed)
+        self.forward_speed += alpha * (command.linear_x * self.speed_scale - self.forward_speed)
+        self.vertical_speed += alpha * (command.linear_z * self.speed_scale - self.vertical_speed)
+        self.yaw_rate += alpha * (command.angular_z - self.yaw_rate)
+        self.yaw += self.yaw_rate * dt
+        self.x += (self.forward_speed * cos(self.yaw) - self.lateral_speed * sin(self.yaw)) * dt
+        self.y += (self.forward_speed * sin(self.yaw) + self.lateral_speed * cos(self.yaw)) * dt
+        self.z = max(self.z + self.vertical_speed * dt, self.min_altitude)
+
+
+class Simulation():
+    """One run of the closed loop on a path.
+    Each person has an appearance embedding (a random unit vector), observed with noise in each detection: the tracked person
+    is re-identified after being lost as the TriggerTracking node does with the embeddings computed by the detector."""
+
+    #Same values as the nodes
+    control_period = 0.09
+    max_empty_midpoint_before_lost = 10
+
+    #Size of the appearance embeddings, and standard deviation of their noise
+    embedding_size = 64
+    embedding_noise = 0.02
+
+    def __init__(self, path, duration:float=30.0, frame_rate:float=15.0, latency:float=0.15, dropout:float=0.05,
+                 noise:float=0.005, bystander:bool=True, step:float=0.01, seed:int=0, controller:FlightController=None):
+        self.path = path
+        self.duration = duration
+        self.frame_period = 1 / frame_rate
+        self.latency = latency
+        self.dropout = dropout
+        self.noise = noise
+        self.bystander = bystander
+        self.step = step
+        self.rng = np.random.default_rng(seed)
+
+        self.camera = Camera()
+        self.drone = Drone()
+
+        #TriggerTracking
+        self.selector = TargetSelector(self.max_empty_midpoint_before_lost)
+
+        #TrackPerson
+        self.controller = controller if controller is not None else make_flight_controller()
+        self.follower = TargetFollower(self.controller, self.max_empty_midpoint_before_lost)
+
+        #Appearance of the tracked person and of the bystander
+        appearances = self.rng.normal(size=(2, self.embedding_size))
+        self.appearances = appearances / np.linalg.norm(appearances, axis=1, keepdims=True)
+
+        #Detections in flight: (delivery time, capture time, boxes, embeddings, is_target)
+        self.pending = []
+
+        #Measurements
+        self.errors = []
+        self.vertical_errors = []
+        self.in_range = []
+        self.commands = 0
+        self.reacquire_times = []
+        self.lost_since = None
+
+    def person_positions(self, t:float)->list:
+        """Positions of the tracked person and of the bystander (walking the tracked person's path mirrored, 1 m behind)"""
+        x, y = self.path(t)
+        positions = [(x, y)]
+        if self.bystander:
+            bx, by = self.path(t + 3.0)
+            positions.append((bx + 1.0, -by))
+        return positions
+
+    def capture(self, t:float)->None:
+        """Detection of the persons of the frame captured at time t, delivered after the detection latency"""
+        boxes, embeddings, is_target = [], [], []
+        for index, position in enumerate(self.person_positions(t)):
+            box = self.camera.project(self.drone, position)
+            if box is None or self.rng.random() < self.dropout:
+                continue
+            boxes.append(np.clip(box + self.rng.normal(0, self.noise, 4), 0.0, 1.0))
+            embedding = self.appearances[index] + self.rng.normal(0, self.embedding_noise, self.embedding_size)
+            embeddings.append(embedding / np.linalg.norm(embedding))
+            is_target.append(index == 0)
+        boxes = np.array(boxes).reshape(-1, 4)
+        self.pending.append((t + self.latency, t, boxes, embeddings, is_target))
+
+    def deliver(self, capture_time:float, boxes:np.ndarray, embeddings:list, is_target:list, now:float)->None:
+        """TriggerTracking then TrackPerson receiving the boxes of a frame"""
+        #Boxes are sorted by decreasing confidence by the detector: here, the largest box first
+        order = np.argsort(-(boxes[:, 3] - boxes[:, 1])) if len(boxes) else np.array([], dtype=int)
+        boxes = boxes[order]
+        embeddings = [embeddings[index] for index in order]
+        is_target = [is_target[index] for index in order]
+        self.selector.update(boxes, np.full(len(boxes), -1), capture_time)
+
+        #The trigger gesture is done by the tracked person when they are first seen
+        if not self.selector.tracking:
+            if True in is_target:
+                index = is_target.index(True)
+                self.selector.start(index, embedding=embeddings[index])
+            return
+
+        if self.selector.person_lost():
+            #Only a person matching the tracked person's appearance is tracked again. Nothing is published until then.
+            index = self.selector.reacquire(embeddings)
+            if index is None:
+                return
+        else:
+            index = self.selector.follow(embeddings)
+            if index is None:
+                self.follower.on_target(now, None)
+                return
+        x1, y1, x2, y2 = boxes[index].tolist()
+        self.follower.on_target(now, ((x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1))
+
+    def person_lost(self)->bool:
+        """Whether TrackPerson considers the tracked person lost"""
+        return self.follower.person_lost()
+
+    def control(self, now:float):
+        """TrackPerson's control tick"""
+        self.commands += 1
+        return self.follower.command(now, True)
+
+    def measure(self, t:float)->None:
+        """Tracking errors (normalized horizontal and vertical distances of the tracked person to the center of the image),
+        whether the height of their box is within the range of the distance controller, and reacquisition time"""
+        box = self.camera.project(self.drone, self.person_positions(t)[0])
+        if box is None:
+            if self.lost_since is None:
+                self.lost_since = t
+            return
+        self.errors.append(abs((box[0] + box[2]) / 2 - 0.5))
+        self.vertical_errors.append(abs((box[1] + box[3]) / 2 - 0.5))
+        if self.controller.distance_pid is not None:
+            range_min, range_max = self.controller.distance_pid.setrange
+            self.in_range.append(range_min <= box[3] - box[1] <= range_max)
+        if self.lost_since is not None and not self.person_lost():
+            self.reacquire_times.append(t - self.lost_since)
+            self.lost_since = None
+
+    def run(self)->dict:
+        cpu_start, wall_start = process_time(), perf_counter()
+        next_frame = next_control = 0.0
+        command = None
+        t = 0.0
+        while t < self.duration:
+            if t >= next_frame:
+                self.capture(t)
+                next_frame += self.frame_period
+            while self.pending and self.pending[0][0] <= t:
+                _, capture_time, boxes, embeddings, is_target = self.pending.pop(0)
+                self.deliver(capture_time, boxes, embeddings, is_target, t)
+            if t >= next_control:
+                command = self.control(t)
+                next_control += self.control_period
+            if command is not None:
+                self.drone.move(command, self.step)
+            self.measure(t)
+            t += self.step
+        cpu, wall = process_time() - cpu_start, perf_counter() - wall_start
+
+        errors = np.array(self.errors) if self.errors else np.array([np.nan])
+        return {
+            "error_mean": float(np.mean(errors)),
+            "error_p95": float(np.percentile(errors, 95)),
+            "vertical_error_mean": float(np.mean(self.vertical_errors)) if self.vertical_errors else float("nan"),
+            "in_range": float(np.mean(self.in_range)) if self.in_range else float("nan"),
+            "visible": len(self.errors) * self.step / self.duration,
+            "losses": len(self.reacquire_times) + (self.lost_since is not None),
+            "reacquire_mean": float(np.mean(self.reacquire_times)) if self.reacquire_times else float("nan"),
+            "command_rate": self.commands / self.duration,
+            "cpu_per_second": cpu / self.duration,
+            "speedup": self.duration / wall if wall > 0 else float("inf"),
+            "landed": self.controller.state == FlightState.LANDING,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop simulation of the tracking controller")
+    parser.add_argument("paths", nargs="*", default=list(paths), help=f"paths of the tracked person ({', '.join(paths)})")
+    parser.add_argument("--duration", type=float, default=30.0, help="simulated time per path, in seconds")
+    parser.add_argument("--frame-rate", type=float, default=15.0, help="frame rate of the detector")
+    parser.add_argument("--latency", type=float, default=0.15, help="detection latency, in seconds")
+    parser.add_argument("--dropout", type=float, default=0.05, help="probability of missing the person in a frame")
+    parser.add_argument("--no-bystander", action="store_true", help="simulate the tracked person only")
+    parser.add_argument("--kp", type=float, nargs=3, default=flight_control.tracking_kp, help="proportional gains (lateral, yaw, altitude)")
+    parser.add_argument("--ki", type=float, nargs=3, default=flight_control.tracking_ki, help="integral gains (lateral, yaw, altitude)")
+    parser.add_argument("--kd", type=float, nargs=3, default=flight_control.tracking_kd, help="derivative gains (lateral, yaw, altitude)")
+    parser.add_argument("--dead-zone", type=float, default=flight_control.tracking_dead_zone, help="errors ignored by the tracking controller")
+    parser.add_argument("--max-speed", type=float, default=flight_control.max_speed, help="limit of the commands")
+    parser.add_argument("--box-height-range", type=float, nargs=2, default=flight_control.box_height_range,
+                        help="range of the height of the person's box kept by the distance controller")
+    parser.add_argument("--distance-kp", type=float, default=flight_control.distance_kp, help="proportional gain of the distance controller (0 to disable it)")
+    parser.add_argument("--distance-ki", type=float, default=flight_control.distance_ki, help="integral gain of the distance controller")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'path':>8} | {'error':>6} | {'p95':>6} | {'v. error':>8} | {'in range':>8} | {'visible':>7} | {'losses':>6} | {'reacquire (s)':>13} | {'cmd/s':>6} | {'CPU ms/s':>8} | {'speedup':>7}")
+    for name in args.paths:
+        controller = make_flight_controller(args.kp, args.ki, args.kd, args.dead_zone, args.max_speed,
+                                            args.box_height_range, args.distance_kp, args.distance_ki)
+        simulation = Simulation(paths[name], args.duration, args.frame_rate, args.latency, args.dropout,
+                                bystander=not args.no_bystander, seed=args.seed, controller=controller)
+        stats = simulation.run()
+        landed = " (landed)" if stats["landed"] else ""
+        print(f"{name:>8} | {stats['error_mean']:>6.3f} | {stats['error_p95']:>6.3f} | {stats['vertical_error_mean']:>8.3f} | "
+              f"{stats['in_range']:>8.0%} | {stats['visible']:>7.0%} | {stats['losses']:>6} | "
+              f"{stats['reacquire_mean']:>13.2f} | {stats['command_rate']:>6.1f} | {stats['cpu_per_second'] * 1000:>8.2f} | {stats['speedup']:>6.0f}x{landed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#Buffers of the messages waiting to be matched, and of the last skews measured
+from collections import deque
+
+
+class ApproximateTimeSynchronizer():
+    """Matches messages of several topics coming from the same moment, using their stamps (in seconds).
+    Each topic has a bounded buffer. When a message arrives, the message of each other topic whose stamp is the closest to it
+    is looked for: if all of them are within 'slop' seconds, they form a matched set, and the matched messages and the older ones
+    are removed from the buffers. Messages that are never matched are dropped (older than a match, or pushed out of a full buffer).
+    The match rate and skew of the matched sets are kept for tuning 'slop' and 'queue_size'."""
+
+    def __init__(self, topics:list, slop:float=0.1, queue_size:int=10, skew_window:int=100):
+        self.topics = list(topics)
+
+        #Largest difference of stamps (in seconds) between the messages of a matched set
+        self.slop = slop
+
+        #Buffers of (stamp, message) per topic, ordered by reception
+        self.buffers = {topic: deque(maxlen=queue_size) for topic in self.topics}
+
+        #Statistics
+        self.received = {topic: 0 for topic in self.topics}
+        self.matched = {topic: 0 for topic in self.topics}
+        self.matches = 0
+        self.skews = deque(maxlen=skew_window)
+
+    def add(self, topic:str, msg, stamp:float)->dict|None:
+        """Adds a message received on a topic with its stamp (in seconds).
+        Returns the matched set, as a dictionary {topic: message}, if this message completes one, and None else."""
+        self.received[topic] += 1
+        self.buffers[topic].append((stamp, msg))
+
+        matched = {topic: (stamp, msg)}
+        for other in self.topics:
+            if other == topic:
+                continue
+            if not self.buffers[other]:
+                return None
+            closest = min(self.buffers[other], key=lambda item: abs(item[0] - stamp))
+            if abs(closest[0] - stamp) > self.slop:
+                return None
+            matched[other] = closest
+
+        #Removing the matched messages and the ones older than them, which can't be matched anymore with newer messages
+        for other, (matched_stamp, _) in matched.items():
+            buffer = self.buffers[other]
+            while buffer and buffer[0][0] <= matched_stamp:
+                buffer.popleft()
+            self.matched[other] += 1
+
+        stamps = [matched_stamp for matched_stamp, _ in matched.values()]
+        self.skews.append(max(stamps) - min(stamps))
+        self.matches += 1
+        return {other: matched_msg for other, (_, matched_msg) in matched.items()}
+
+    def match_rate(self, topic:str)->float|None:
+        """Proportion of the messages received on a topic that were part of a matched set"""
+        if not self.received[topic]:
+            return None
+        return self.matched[topic] / self.received[topic]
+
+    def stats(self)->dict:
+        """Match rate per topic, and mean and max skew (in seconds) of the last matched sets"""
+        values = {"matches": self.matches}
+        for topic in self.topics:
+            values[f"{topic}_received"] = self.received[topic]
+            values[f"{topic}_match_rate"] = self.match_rate(topic)
+        values["skew_mean"] = sum(self.skews) / len(self.skews) if self.skews else None
+        values["skew_max"] = max(self.skews) if self.skews else None
+        return values
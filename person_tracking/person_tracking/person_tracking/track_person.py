@@ -1,6 +1,10 @@
 #To handle ROS node
 import rclpy
 from rclpy.node import Node
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup, ReentrantCallbackGroup
+
+#To protect the state shared by the callback groups
+from threading import Lock
 
 from std_msgs.msg import Empty, String
 
@@ -18,13 +22,16 @@ import cv2
 #To convert cv2 images to ROS Image messages
 from cv_bridge import CvBridge
 
-from person_tracking.pid import PIDPoint
-
-from collections import deque
+#State machine deciding the commands of the drone and its controllers, and estimation of the position of the tracked person between detections
+from person_tracking import flight_control
+from person_tracking.flight_control import make_flight_controller
+from person_tracking.tracking_logic import TargetFollower
 
-from math import pi
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
 
-from threading import Thread
+#To record the time each frame spends in the node
+from person_tracking.latency import LatencyRecorder
 
 
 ##NB : all directions : left, right... are from the drone's perspective
@@ -42,23 +49,42 @@ class TrackPerson(Node):
     #image_height = 480
     #image_width = 640
 
-    max_length_midpoint_queue = 2
-
     max_empty_midpoint_before_lost = 10
 
+    #Default gains of the tracking controller, per axis: lateral speed, rotation speed and vertical speed (see person_tracking.flight_control),
+    #the errors (in normalized coordinates) below which the drone doesn't move, and the maximal speed of the commands.
+    #They are tuned with the simulator (person_tracking.simulator), and can be changed with the node parameters of the same names.
+    tracking_kp = flight_control.tracking_kp
+    tracking_ki = flight_control.tracking_ki
+    tracking_kd = flight_control.tracking_kd
+    tracking_dead_zone = flight_control.tracking_dead_zone
+    max_speed = flight_control.max_speed
+
+    #Default range of the normalized height of the tracked person's box kept by moving forward or backward, and gains of that controller.
+    #A null distance_kp disables forward and backward moves.
+    box_height_range = flight_control.box_height_range
+    distance_kp = flight_control.distance_kp
+    distance_ki = flight_control.distance_ki
+
     
     def __init__(self,name):
         #Creating the Node
         super().__init__(name)
         
+        #Callback groups. The control timer has its own group, so that it keeps its period whatever the subscribers do.
+        #The subscribers are in a reentrant group; the state they share with the control timer is protected by self.state_lock.
+        self.control_group = MutuallyExclusiveCallbackGroup()
+        self.inputs_group = ReentrantCallbackGroup()
+        self.state_lock = Lock()
+
         #subscribers
-        self.sub_person_tracked = self.create_subscription(PersonTracked,self.person_tracked_topic, self.listener_callback,5)
+        self.sub_person_tracked = self.create_subscription(PersonTracked,self.person_tracked_topic, self.listener_callback,5, callback_group=self.inputs_group)
 
-        self.sub_key_pressed = self.create_subscription(String,self.key_pressed_topic, self.key_pressed_subscriber_callback,5)
+        self.sub_key_pressed = self.create_subscription(String,self.key_pressed_topic, self.key_pressed_subscriber_callback,5, callback_group=self.inputs_group)
 
         #publishers
         self.publisher_commands = self.create_publisher(Twist,self.commands_topic,10)
-        self.timer = self.create_timer(0.09, self.commands_callback)
+        self.timer = self.create_timer(0.09, self.commands_callback, callback_group=self.control_group)
         #self.timer_1 = self.create_timer(10, self.commands_callback)
 
         self.publisher_takeoff = self.create_publisher(Empty,self.takeoff_topic,1)
@@ -66,234 +92,138 @@ class TrackPerson(Node):
         self.publisher_land = self.create_publisher(Empty,self.land_topic,1)
         
 
-        self.pid = PIDPoint((0.5, 0.5)) #middle of the screen for normalized midpoint coordinates
        
         self.person_tracked_midpoint = None
 
-        self.prev_midpoint = None 
-
         self.commands_msg = None
 
-        self.correction = None
-        
-        #Queue to keep the last nonempty midpoints. Help to calculate the trajectory of the person before he got lost
-        self.midpoint_queue = deque(maxlen=self.max_length_midpoint_queue)
-        
-        self.empty_midpoint_count = 0 #variable to count the amount of empty messages received. If this number is higher than a certain number, the person is considered lost.
-        
-        #Counter for self.persont_tracked_midpoint in the update message function.
-        #If the midpoint is the same after a certain number of calls to the function, the connection might be broken. so we send empty command messages
-        self.connection_lost_midpoint_unchanged_counter = 0  
-        
-        self.update_midpoint = False #is true when we receive a new midpoint that is different than (0,0)
-
         self.key_pressed = None #variable to contain key pressed on the Pygame GUI, either to land or takeoff
 
         self.flying = True#variable is True when the dron is flying and False if it landed
 
-        self.rotating = False #variable to check if the drone is rotating
+        #Settings of the controllers (floating-point parameters, the lists having one value per axis)
+        self.tracking_kp = self.declare_float_parameter("tracking_kp", self.tracking_kp)
+        self.tracking_ki = self.declare_float_parameter("tracking_ki", self.tracking_ki)
+        self.tracking_kd = self.declare_float_parameter("tracking_kd", self.tracking_kd)
+        self.tracking_dead_zone = self.declare_float_parameter("tracking_dead_zone", self.tracking_dead_zone)
+        self.max_speed = self.declare_float_parameter("max_speed", self.max_speed)
+        self.box_height_range = self.declare_float_parameter("box_height_range", self.box_height_range)
+        self.distance_kp = self.declare_float_parameter("distance_kp", self.distance_kp)
+        self.distance_ki = self.declare_float_parameter("distance_ki", self.distance_ki)
+
+        #State machine deciding the commands (IDLE/TRACKING/SEARCHING/LANDING), stepped by the control timer.
+        #The tracked person is kept at the middle of the screen (0.5, 0.5) by commands proportional to its position,
+        #and at the distance where the height of their box is within box_height_range.
+        self.flight_controller = make_flight_controller(self.tracking_kp, self.tracking_ki, self.tracking_kd, self.tracking_dead_zone,
+                                                        self.max_speed, self.box_height_range, self.distance_kp, self.distance_ki)
+
+        #Estimation of the tracked person's midpoint, box size and velocity, predicted at every control tick and corrected when a midpoint
+        #is received, and decision of the commands (see person_tracking.tracking_logic): the node only adds the messages and the logs
+        self.follower = TargetFollower(self.flight_controller, self.max_empty_midpoint_before_lost)
+
+        #Timing of each midpoint, from its reception to the first command computed with it ("control" stage). The end of that stage
+        #is the end of the pipeline: its time since the capture of the frame is the end-to-end latency.
+        #Header and reception time of the last midpoint no command was published for yet
+        self.latency = LatencyRecorder(self)
+        self.pending_timing = None
 
         
 
         
         
+    def declare_float_parameter(self, name:str, default):
+        """Declares a parameter of floating-point values (a number, or a tuple of numbers given as a list) and returns its value.
+        The default is converted to floats, so that the parameter accepts floats even where the default is a whole number.
+        A list must have as many values as the default."""
+        if isinstance(default, (tuple, list)):
+            value = tuple(self.declare_parameter(name, [float(value) for value in default]).value)
+            if len(value) != len(default):
+                raise ValueError(f"Invalid {name} {list(value)}: it must have {len(default)} values")
+            return value
+        return float(self.declare_parameter(name, float(default)).value)
+
 ###########################first subscriber###########################################################################################   
     def listener_callback(self, msg):
         """Callback function for the subscriber node (to topic /person_tracked).
         Receives the midpoint of the bounding box surrounding the person tracked"""
+        received = self.latency.now()
         self.get_logger().info('Midpoint received')
+        with self.state_lock:
+            self.update_target(msg)
+            if not self.empty_midpoint(msg.middle_point):
+                self.pending_timing = (msg.header, received)
+
+    def update_target(self, msg)->None:
+        """Updates the tracked person's state with a message received on /person_tracked
+        Precondition: self.state_lock is held"""
         tmp = msg.middle_point
 
         if self.empty_midpoint(tmp):
-            self.empty_midpoint_count += 1
+            self.follower.on_target(self.now(), None)
             self.get_logger().info("Empty midpoint")
-            self.update_midpoint = False
         else:
-            self.update_midpoint = True
             self.person_tracked_midpoint = tmp
-            self.midpoint_queue.append(self.person_tracked_midpoint)
-            self.empty_midpoint_count = 0
+            self.follower.on_target(self.now(), (tmp.x, tmp.y, msg.box_width, msg.box_height))
             self.get_logger().info(f'midpoint {self.person_tracked_midpoint}')
-            self.correction = self.pid.compute(self.person_tracked_midpoint)
-
-    def direction_person_lost(self)->str|None:
-        """Function to determine whether the drone should rotate left, right, up or down to find the lost person"""
-        if len(self.midpoint_queue) == self.max_length_midpoint_queue:
-            point_1 = self.midpoint_queue[1] #most recent midpoint
-            point_2 = self.midpoint_queue[0] #previous midpoint
-            slope = ( point_2.y - point_1.y ) / ( point_2.x - point_1.x )
-            if slope >= 0 :
-                if point_1.x >= point_2.x:
-                    return "right"
-                else:
-                    return "left"
-
-            else:
-                if point_1.x >= point_2.x:
-                    return "right"
-                else:
-                    return "left"
-
-            """
-            if slope >= 1:
-                if point_1.y <= point_2.y:
-                    return "down"
-
-                else:
-                    return "up"
-
-            elif slope < 1 and slope > -1:
-
-                if point_1.x <= point_2.x:
-                    return "left"
-
-                else:
-                    return "right"
 
-            else: #slope <-1
-                if point_1.y <= point_2.y:
-                    return "down"
-
-                else:
-                    return "up"
-            """
-
-        else:
-            self.get_logger().info(f"\nNot enough midpoints received yet to predict the person's position\n")
-        
-        return None
+    def now(self)->float:
+        """Time of the node's clock, in seconds"""
+        return self.get_clock().now().nanoseconds / 1e9
 
 
 ############################Second subscriber#######################################################################3333
             
     def key_pressed_subscriber_callback(self,msg):
-        self.key_pressed = msg.data
+        with self.state_lock:
+            self.key_pressed = msg.data
                       
 ######################### Publisher #####################################################################################################
     def commands_callback(self):
-        self.land_takeoff()
-        if self.flying and not self.rotating:
-            #command_thread = Thread(target=self.update_commands).start()
+        """Callback function of the control timer. Steps the flight state machine and publishes one command per tick"""
+        with self.state_lock:
+            self.land_takeoff()
             self.update_commands()
             
 
     def update_commands(self)->None:
-        """This function makes appropriate commands messages in order to keep the tracked person within the camera's field while ensuring safety"""
-        self.commands_msg = Twist()
-        self.commands_msg.linear.x = 0.0
-        self.commands_msg.linear.y = 0.0
-        self.commands_msg.linear.z = 0.0
-        self.commands_msg.angular.x = 0.0
-        self.commands_msg.angular.y = 0.0
-        self.commands_msg.angular.z = 0.0
-
+        """This function makes appropriate commands messages in order to keep the tracked person within the camera's field while ensuring safety.
+        The commands are decided by the flight state machine (see person_tracking.flight_control): it follows the person while they are tracked,
+        rotates towards the direction they went to when they are lost, and lands if nobody was found after a complete rotation."""
         self.get_logger().info(f"\nself.person_lost :{self.person_lost()}\n")
-        self.get_logger().info(f"\nself.empty_midpoint_count :{self.empty_midpoint_count}\n")
-
-        
-        if self.person_lost():
-
-            #self.get_logger().info("\nWalaheiiiiiiiiiii\nWalaheiiiiiiiiiii\nWalaheiiiiiiiiiii\n")
-            direction : str = self.direction_person_lost()
-
-            if direction == "left":
-                print("Rotate left") 
-                #self.rotation(pi/5,2*pi)
-                rotation_thread_left = Thread(target=self.rotation,args=(pi/7,2*pi))
-                rotation_thread_left.start()
-                #rotation_thread_left.join()
-            
-            elif direction == "right":
-                print("Rotate right")
-                #self.rotation(-pi/5,2*pi)
-                rotation_thread_right = Thread(target=self.rotation,args=(-pi/7,2*pi))
-                rotation_thread_right.start()  
-                #rotation_thread_right.join()
-
-            else:
-                self.get_logger().info(f'No trajectory can be found')
-
-        else:
-            #check if the connection is still passing (meaning self.person_tracked_midpoint and hence self.empty_midpoint_count are updated in the listener callback)
-            if not self.check_midpoint_changed():
-                self.publisher_commands.publish(self.commands_msg) 
-                return None
+        self.get_logger().info(f"\nself.empty_midpoint_count :{self.follower.misses}\n")
+        if self.person_lost() and self.follower.direction() is None:
+            self.get_logger().info(f"\nNot enough midpoints received yet to predict the person's position\n")
 
-            
-            if self.person_tracked_midpoint is not None and self.correction is not None :
-                correction_x, correction_y = self.correction
-                self.get_logger().info(f'Correction x:{correction_x}, y:{correction_y}')
-                #self.get_logger().info(f'midpoint {self.person_tracked_midpoint}')
-
-                if self.person_tracked_midpoint.x < 0.3:#correction_x < -0.6 : #Here I don't put 0 to avoid having the drone always moving
-                    self.get_logger().info("move left") #(a in keyboard mode control station) 
-                    self.commands_msg.linear.y = 0.22
-                     
-                elif self.person_tracked_midpoint.x > 0.7:#correction_x > 0.6 :
-                    self.get_logger().info("move right") #(d in keyboard mode control station )             
-                    self.commands_msg.linear.y = -0.22
+        #The tracked person's state is predicted at every tick, whether a detection arrived or not, and the drone steers on that prediction
+        previous_state = self.flight_controller.state
+        command = self.follower.command(self.now(), self.flying)
+        self.get_logger().info(f'Command: {command}')
+        if self.flight_controller.state != previous_state:
+            self.get_logger().info(f"Flight state: {previous_state.value} -> {self.flight_controller.state.value}")
 
-            self.publisher_commands.publish(self.commands_msg) 
+        if command.land:
+            self.publisher_land.publish(Empty()) #land if we found no one after a complete rotation
+            self.flying = False
+            return None
+
+        if self.flying:
+            self.commands_msg = Twist()
+            self.commands_msg.linear.x = command.linear_x
+            self.commands_msg.linear.y = command.linear_y
+            self.commands_msg.linear.z = command.linear_z
+            self.commands_msg.angular.z = command.angular_z
+            self.publisher_commands.publish(self.commands_msg)
+            if self.pending_timing is not None:
+                self.latency.record("control", *self.pending_timing)
+                self.pending_timing = None
         
         return None
-            #if correction_y < -0.6 :
-            #    print("move down")
-                #print("move up")
-                #if self.move_down > 0:
-            #    self.commands_msg.linear.z -= 0.3
-                #    self.move_down -= 1
-                #else:
-                #    self.commands_msg.linear.z += 0.0
-
-            #elif correction_y > 0.6 :
-            #    print("move up")
-                #print("move down")
-                #if self.move_up > 0:
-            #    self.commands_msg.linear.z += 0.3
-                 #   self.move_up -= 1
-                #else:
-                #    self.commands_msg.linear.z += 0.0
 
 
     def person_lost(self):
         """Function to call when someone is lost.
         Returns true when the person is lost and False else."""  
-        if self.empty_midpoint_count >= self.max_empty_midpoint_before_lost:
-            return True
-        else: 
-            return False    
- 
-    def rotation(self, angular_speed, target_angle)->None:
-        """Function to send rotation commands to the drone. 
-        Returns True if the drone did a complete rotation (no one was found) and False else"""
-        if self.commands_msg is not None:
-            self.rotating = True
-            current_angle = 0
-            #target_angle = 2*pi
-            self.commands_msg.angular.z = angular_speed#pi
-
-
-            self.get_logger().info(f"Before rotating,  angular.z is {self.commands_msg.angular.z} and current_angle is {current_angle}")
-
-            t0 = self.get_clock().now()
-
-            while abs(current_angle) <= abs(target_angle): 
-                #self.get_logger().info(f"Found a person? {self.update_midpoint}")
-                if self.update_midpoint:
-                    self.rotating = False
-                    self.empty_midpoint_count = 0
-                    self.get_logger().info(f"While rotating, found a person to track")
-                    return 
-                self.publisher_commands.publish(self.commands_msg) 
-                t1 = self.get_clock().now()
-
-                current_angle = self.commands_msg.angular.z * ((t1-t0).to_msg().sec)
-
-            self.get_logger().info(f"After rotating ,angular.z is {self.commands_msg.angular.z} and current_angle is {current_angle}")
-            self.rotating = False
-            self.publisher_land.publish(Empty()) #land if we found no one after a complete rotation
-            self.flying = False
-            
+        return self.follower.person_lost()
 
     def empty_midpoint(self, midpoint):
         """Function to test if the current midpoint is empty (x==0 and y==0). 
@@ -307,11 +237,13 @@ class TrackPerson(Node):
     def land_takeoff(self)->None:
         """Prompts the drone to land or takeoff, depending on the messages received"""
         if self.key_pressed is not None:
-            if self.key_pressed == "t":
+            #A key is handled once, so that a landing decided by the flight state machine isn't undone by an old takeoff key
+            key_pressed, self.key_pressed = self.key_pressed, None
+            if key_pressed == "t":
                 self.publisher_takeoff.publish(Empty())
                 self.flying = True
                 return None
-            if self.key_pressed == "l":
+            if key_pressed == "l":
                 self.publisher_land.publish(Empty())
                 self.flying = False
                 return None
@@ -324,30 +256,6 @@ class TrackPerson(Node):
         else:
             raise TypeError("Error in function equal_point_msg, tried to compare two objects that are not of type PointMsg")
 
-    def check_midpoint_changed(self)->bool:
-        """Function to check if the self.person_tracked_midpoint changed. Returns True if it stayed the same for less than max_empty_midpoint_before_lost, and False if it stayed the same for more.
-        """
-        if self.prev_midpoint is None and self.person_tracked_midpoint is not None:
-            self.prev_midpoint = self.person_tracked_midpoint
-            return True
-
-        elif self.prev_midpoint is not None :
-            if self.equal_point_msg(self.prev_midpoint, self.person_tracked_midpoint):
-                self.connection_lost_midpoint_unchanged_counter += 1
-            else:
-                self.connection_lost_midpoint_unchanged_counter = 0
-        
-        self.prev_midpoint = self.person_tracked_midpoint
-
-        if self.connection_lost_midpoint_unchanged_counter <= self.max_empty_midpoint_before_lost :
-            return True
-        else: 
-            return False
-        
-
-
-
-
             
 ###################################################################################################################################       
   
@@ -358,15 +266,11 @@ def main(args=None):
     rclpy.init(args=args)
     track_person = TrackPerson('Track_Person_node')
 
-    #execute the callback function until the global executor is shutdown
-    rclpy.spin(track_person)
-    
-    track_person.video.release()
-
-    #destroy the node. It is not mandatory, since the garbage collection can do it
-    track_person.destroy_node()
-    
-    rclpy.shutdown()      
+    #execute the callback functions on several threads until the executor is shutdown
+    try:
+        spin([track_person])
+    finally:
+        rclpy.shutdown()      
 
 """####################TEST#######################
         #if (self.test % 10) == 0:
@@ -0,0 +1,184 @@
+#To associate the bounding boxes of each frame with the persons of the previous frames
+from person_tracking.association import TargetAssociator
+
+#To recognize the tracked person by their appearance after losing them
+from person_tracking.reid import ReIdentifier
+
+#To estimate the position of the tracked person between detections
+from person_tracking.kalman import TargetKalmanFilter
+
+#State machine deciding the commands of the drone
+from person_tracking.flight_control import FlightController, Command
+
+
+class TargetSelector():
+    """Decisions of the TriggerTracking node: which detected person is the tracked person (the target), frame after frame.
+    - start() locks the person who did the trigger gesture, and stop() forgets them
+    - follow() gives the box of the target in each new frame, and counts the frames they are missing from
+    - after max_misses frames without the target, they are lost, and reacquire() only tracks a person whose appearance matches theirs
+    (the person detected with the highest confidence, the first box, when no appearance of the target is known).
+    The boxes are given as NumPy arrays and the embeddings as lists (one per box, None when unknown): the node and the simulator
+    (person_tracking.simulator) both drive it, the node only adds the messages and the logs."""
+
+    def __init__(self, max_misses:int=10, reid_gallery_size:int=20, reid_period:int=5, reid_threshold:float=0.8):
+        #Association of the bounding boxes of each frame with the persons seen before, among which the target
+        self.associator = TargetAssociator(max_misses=max_misses)
+
+        #Appearance of the target: an embedding is added to the gallery every reid_period frames the target is found in
+        self.reid = ReIdentifier(reid_gallery_size, reid_threshold)
+        self.reid_period = reid_period
+        self.frames_since_remember = 0
+
+        #Similarity with the gallery of the last person considered by reacquire()
+        self.similarity = None
+
+        #Whether someone did the trigger gesture, and amount of frames (or watchdog periods) without the target
+        self.tracking = False
+        self.misses = 0
+        self.max_misses = max_misses
+
+    def update(self, boxes, track_ids, stamp:float, frame_id=None)->None:
+        """Associates the boxes (N,4) and track IDs (N,) of a new frame with the persons of the previous frames"""
+        self.associator.update(boxes, track_ids, stamp, frame_id=frame_id)
+
+    def person_lost(self)->bool:
+        """Returns True when the target was missing for max_misses frames"""
+        return self.misses >= self.max_misses
+
+    def start(self, index:int|None, frame_id=None, embedding=None)->None:
+        """Starts tracking the person of the box number 'index' (of the frame 'frame_id', the last one by default).
+        With no index (the box of the person who did the gesture wasn't found), the target is missing until reacquired."""
+        self.tracking = True
+        self.reid.reset()
+        if index is None:
+            self.associator.unlock()
+            return
+        self.associator.lock(index, frame_id)
+        self.remember(embedding)
+
+    def stop(self)->None:
+        """Stops tracking the target"""
+        self.tracking = False
+        self.associator.unlock()
+        self.reid.reset()
+
+    def remember(self, embedding)->None:
+        """Adds an appearance embedding of the target to the gallery (nothing if it is None)"""
+        if embedding is not None:
+            self.reid.remember(embedding)
+            self.frames_since_remember = 0
+
+    def miss(self)->None:
+        """Counts a frame (or watchdog period) without the target"""
+        self.misses += 1
+
+    def follow(self, embeddings:list=None)->int|None:
+        """Index of the box of the target in the last frame given to update(), or None if they aren't in it (a miss).
+        New views of the target are added to the gallery regularly"""
+        index = self.associator.target_index()
+        if index is None:
+            self.miss()
+            return None
+        self.misses = 0
+        self.frames_since_remember += 1
+        if embeddings is not None and self.frames_since_remember >= self.reid_period:
+            self.remember(embeddings[index])
+        return index
+
+    def reacquire(self, embeddings:list)->int|None:
+        """After losing the target, index of the box (of the last frame given to update()) of the person to track instead,
+        or None if nobody matches the target's appearance. That person becomes the target."""
+        if len(embeddings) == 0:
+            return None
+        if not self.reid.gallery:
+            index = 0
+        else:
+            index, self.similarity = self.reid.best_match(embeddings)
+        if index is not None:
+            self.associator.lock(index)
+            self.misses = 0
+        return index
+
+
+class TargetFollower():
+    """Decisions of the TrackPerson node: estimation of the tracked person from the midpoints received, and command of each control tick.
+    The midpoints (x, y, width, height of the box, normalized) correct a Kalman filter, predicted at every tick, so that the commands
+    follow the person between detections; the flight state machine (person_tracking.flight_control) turns the estimate into commands.
+    Times are in seconds. The node and the simulator (person_tracking.simulator) both drive it."""
+
+    def __init__(self, flight_controller:FlightController=None, max_misses:int=10):
+        self.flight_controller = flight_controller if flight_controller is not None else FlightController()
+
+        #Estimation of the tracked person's midpoint, box size and velocity, and time of its last prediction
+        self.target_filter = TargetKalmanFilter()
+        self.filter_time = None
+
+        #Amount of empty midpoints received in a row. If this number reaches max_misses, the person is considered lost.
+        self.misses = 0
+        self.max_misses = max_misses
+
+        #Last midpoint (x, y) received, the one seen at the previous tick, and amount of ticks it stayed the same.
+        #If it stays the same for too long, the connection might be broken, and the drone stops following it.
+        self.midpoint = None
+        self.prev_midpoint = None
+        self.unchanged_ticks = 0
+
+    def person_lost(self)->bool:
+        """Returns True when the person is lost"""
+        return self.misses >= self.max_misses
+
+    def on_target(self, now:float, target:tuple|None)->None:
+        """Updates the estimation with a midpoint received at time 'now': the person's (x, y, width, height), or None for an empty midpoint"""
+        if target is None:
+            self.misses += 1
+            return
+        #A person found after being lost may not be the same person, or be far from the prediction: the filter starts again
+        if self.person_lost():
+            self.target_filter.reset()
+        self.midpoint = (target[0], target[1])
+        self.advance(now)
+        self.target_filter.update(target)
+        self.misses = 0
+
+    def advance(self, now:float)->None:
+        """Predicts the tracked person's state up to 'now'"""
+        if self.filter_time is not None:
+            self.target_filter.predict(now - self.filter_time)
+        self.filter_time = now
+
+    def predicted_target(self)->tuple|None:
+        """Midpoint and box size (x, y, width, height) of the tracked person estimated by the filter at the last prediction,
+        or None if no midpoint was received yet"""
+        if not self.target_filter.initialized:
+            return None
+        return tuple(self.target_filter.state[:4].tolist())
+
+    def direction(self)->str|None:
+        """Direction ("left" or "right") to rotate to find the lost person: the direction of their horizontal velocity estimated
+        by the filter before they got lost. None if no midpoint was received yet."""
+        if not self.target_filter.initialized:
+            return None
+        return "right" if self.target_filter.velocity[0] >= 0 else "left"
+
+    def midpoint_changed(self)->bool:
+        """Returns True if the last midpoint received stayed the same for at most max_misses ticks, and False if it stayed the same for more"""
+        if self.prev_midpoint is not None and self.midpoint == self.prev_midpoint:
+            self.unchanged_ticks += 1
+        elif self.prev_midpoint is not None:
+            self.unchanged_ticks = 0
+        self.prev_midpoint = self.midpoint
+        return self.unchanged_ticks <= self.max_misses
+
+    def command(self, now:float, flying:bool)->Command:
+        """Command of the control tick at time 'now': follows the predicted person while they are tracked, rotates towards the direction
+        they went to when they are lost, and lands if nobody was found after a complete rotation (see FlightController)"""
+        self.advance(now)
+        person_lost = self.person_lost()
+        direction = self.direction() if person_lost else None
+
+        #Steering on the midpoint predicted by the filter. If the midpoint received didn't change for too long, no midpoint is given,
+        #so that the drone doesn't move
+        target = None
+        if not person_lost and self.midpoint_changed():
+            target = self.predicted_target()
+        return self.flight_controller.step(now, flying, person_lost, target, direction)
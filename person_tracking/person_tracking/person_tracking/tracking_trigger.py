@@ -1,6 +1,10 @@
 #To handle ROS node
 import rclpy
 from rclpy.node import Node
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
+
+#To protect the state shared by the callback groups
+from threading import Lock
 
 #ROS image message
 #from sensor_msgs.msg import Image
@@ -13,6 +17,30 @@ from person_tracked.msg import PersonTracked, PointMsg
 
 #bounding boxes messages
 from all_bounding_boxes_msg.msg import AllBoundingBoxes
+from person_tracking.boxes import msg_arrays, msg_embeddings, stamp_seconds
+
+#To find the box of the person who did the trigger gesture
+from person_tracking.association import enclosing_boxes
+
+#To search the boxes containing the hands
+import numpy as np
+
+#Association of the boxes with the tracked person, and recognition of the tracked person by their appearance after losing them
+#(embeddings computed by the detector, sent with the boxes)
+from person_tracking.tracking_logic import TargetSelector
+
+#To match the hand landmarks and bounding boxes of the same frame
+from person_tracking.sync import ApproximateTimeSynchronizer
+
+#ROS diagnostics messages, to report the synchronization statistics
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus
+from person_tracking.diagnostics import make_status, make_array
+
+#Multi-threaded execution of the callbacks
+from person_tracking.executors import spin
+
+#To record the time each frame spends in the node
+from person_tracking.latency import LatencyRecorder
 
 #To handle images
 #import cv2
@@ -29,6 +57,7 @@ class TriggerTracking(Node):
     hand_landmarks_topic = "/hand/landmarks"
     person_tracked_topic = "/person_tracked"
     bounding_boxes_topic = "/all_bounding_boxes"
+    diagnostics_topic = "/diagnostics"
 
     #Trigger gestures 
     right_hand_gesture_trigger = "Open_Palm"
@@ -39,31 +68,107 @@ class TriggerTracking(Node):
 
     #amount of midpoints to receive before concluding that the person is lost. 
     max_empty_midpoint_before_lost = 10
+
+    #Largest difference (in seconds) between the stamps of hand landmarks and bounding boxes considered to come from the same frame,
+    #and amount of messages of each topic kept while waiting for a match
+    sync_slop = 0.1
+    sync_queue_size = 10
+
+    #Period (in seconds) of the diagnostics messages
+    diagnostics_period = 1.0
+
+    #Period (in seconds) of the processing timer in polling mode (event_driven parameter set to False)
+    polling_period = 0.09
+
+    #In event-driven mode, period (in seconds) of the watchdog, and time (in seconds) without bounding boxes
+    #after which the tracked person is considered not detected
+    watchdog_period = 0.2
+    boxes_timeout = 0.5
+
+    #Re-identification: appearance embeddings of the tracked person are kept (gallery_size at most, one every reid_period frames),
+    #and after losing them, a person is only tracked if their similarity with the gallery reaches reid_threshold.
+    #The embeddings are computed by the detector and sent in the boxes (its reid_embeddings parameter).
+    reid_gallery_size = 20
+    reid_period = 5
+    reid_threshold = 0.8
     
     def __init__(self,name):
 
         #Creating the Node
         super().__init__(name)
         
+        #Callback groups. The bounding boxes, landmarks and timer callbacks all update the tracking state: they are mutually exclusive,
+        #so they run one at a time and in order. The diagnostics run in their own group, so they neither wait for nor delay them.
+        self.inputs_group = MutuallyExclusiveCallbackGroup()
+        self.diagnostics_group = MutuallyExclusiveCallbackGroup()
+
         #subscribers
-        self.sub_bounding_boxes = self.create_subscription(AllBoundingBoxes,self.bounding_boxes_topic, self.bounding_boxes_listener_callback,5)
-        self.sub_landmark = self.create_subscription(Landmarks,self.hand_landmarks_topic, self.landmarks_listener_callback,5)
+        self.sub_bounding_boxes = self.create_subscription(AllBoundingBoxes,self.bounding_boxes_topic, self.bounding_boxes_listener_callback,5, callback_group=self.inputs_group)
+        self.sub_landmark = self.create_subscription(Landmarks,self.hand_landmarks_topic, self.landmarks_listener_callback,5, callback_group=self.inputs_group)
         
         """self.test_sub = self.create_subscription(Image,"/all_detected",self.test_listener,10)"""
 
         #publishers
         self.publisher_to_track= self.create_publisher(PersonTracked,self.person_tracked_topic,10)
-        self.timer_1 = self.create_timer(0.09, self.person_tracked_callback)
+
+        #In event-driven mode (default), the inputs are processed as soon as new bounding boxes or landmarks arrive,
+        #and a watchdog timer only handles the absence of bounding boxes. Else, they are processed on a timer.
+        self.event_driven = self.declare_parameter("event_driven", True).value
+        if self.event_driven:
+            self.timer_watchdog = self.create_timer(self.watchdog_period, self.watchdog_callback, callback_group=self.inputs_group)
+        else:
+            self.timer_1 = self.create_timer(self.polling_period, self.person_tracked_callback, callback_group=self.inputs_group)
+
+        self.publisher_diagnostics = self.create_publisher(DiagnosticArray,self.diagnostics_topic,5)
+        self.timer_diagnostics = self.create_timer(self.diagnostics_period, self.diagnostics_callback, callback_group=self.diagnostics_group)
         
         #Used to convert cv2 frames into ROS Image messages and vice versa
         self.cv_bridge = CvBridge()
 
+        #Timing of the processing of each frame's bounding boxes, up to the publication of the midpoint ("trigger" stage),
+        #and time at which the processing of the current inputs started (reception of the message, or tick of the polling timer)
+        self.latency = LatencyRecorder(self)
+        self.processing_start = None
+
         #Variable to receive bounding boxes containing all persons detected
         self.boxes = None
 
+        #Sequence number of the last bounding boxes message processed. The same boxes are never processed twice,
+        #so that a detector slower than this node's timer isn't mistaken for a person who doesn't move or is lost.
+        self.last_boxes_seq = None
+
+        #Normalized coordinates [x1, y1, x2, y2] of the bounding boxes of self.boxes, as a (N,4) array, and their track IDs (N,)
+        self.boxes_xyxyn = None
+        self.boxes_track_ids = None
+
+        #Choice of the tracked person (the target) in each frame: association of the bounding boxes with the persons seen before,
+        #count of the frames without the target, and re-identification after losing them (see person_tracking.tracking_logic).
+        #The node only adds the messages and the logs.
+        self.selector = TargetSelector(self.max_empty_midpoint_before_lost, self.reid_gallery_size, self.reid_period, self.reid_threshold)
+
+        #Time (in nanoseconds) of the reception of the last bounding boxes message
+        self.last_boxes_time = None
+
         #Variable to contain received landmarks messages
         self.landmarks = None
 
+        #Hand landmarks and bounding boxes are matched by their stamps. The trigger gesture is only looked for in matched pairs,
+        #so that the hands are never compared with the boxes of another moment.
+        #Both stamps must be in the same clock domain: stamped landmarks are matched with the capture stamps of the boxes' frames.
+        #Landmarks without a stamp can only be timed by their reception, so they are matched with the reception times of the boxes
+        #instead (a fallback, less precise: the gesture recognition and the object detection don't take the same time).
+        self.synchronizer = ApproximateTimeSynchronizer(["landmarks", "boxes"], self.sync_slop, self.sync_queue_size)
+        self.reception_synchronizer = ApproximateTimeSynchronizer(["landmarks", "boxes"], self.sync_slop, self.sync_queue_size)
+
+        #Amount of landmarks received without a stamp (matched by reception time)
+        self.unstamped_landmarks = 0
+
+        #Lock protecting the synchronizers, read by the diagnostics
+        self.sync_lock = Lock()
+
+        #Last matched pair (landmarks message, bounding boxes message) not processed yet
+        self.synced_pair = None
+
         #variable to contain the midpoint of the bounding box around the person we want to track
         self.person_tracked_midpoint = None
 
@@ -75,15 +180,6 @@ class TriggerTracking(Node):
         #Variable to contain the custom message to send to 
         self.person_tracked_msg = PersonTracked()
 
-        #Boolean variable to know whether to start or stop the tracking when spotting the trigger gesture.
-        self.tracking = False 
-         
-        #Variable to count empty midpoints. We send an empty midpoint when the midpoint of the tracked person doesn't change.
-        #When the person gets out of the field of view, the midpoint will stay the same for a long period. 
-        #Hence, if for a certain amount of time, the midpoint doesn't change, 
-        #we can conclude that the person went out of the firld of view of the camera, and we can rotate.
-        self.empty_midpoint_count = 0 #variable to count the amount of empty messages received. If this number is higher than a certain number, the person is considered lost.
-        
          
         """self.image_height = None
 
@@ -104,23 +200,98 @@ class TriggerTracking(Node):
     def bounding_boxes_listener_callback(self, boxes_msg):
         """Callback function for the subscriber node (to topic /all_bounding_boxes).
         For each bounding box received, save it in a variable for processing"""
+        self.processing_start = self.latency.now()
         self.get_logger().info('Bounding boxes message received')
         self.boxes = boxes_msg
+        self.last_boxes_time = self.get_clock().now().nanoseconds
+
+        #Every frame is associated, so that a matched pair can refer to a frame older than the last one
+        self.associate_boxes()
+        self.add_to_synchronizer("boxes", boxes_msg, stamp_seconds(boxes_msg.header.stamp))
+        self.add_to_synchronizer("boxes", boxes_msg, self.last_boxes_time / 1e9, self.reception_synchronizer)
+
+        if self.event_driven:
+            self.person_tracked_callback()
         
         
 ########################### Second Subscriber #########################################################################################
     def landmarks_listener_callback(self, lndmrk):
         """Callback function for the subscriber node (to topic /hand/landmarks).
         Receives a landmark from the hand gesture plugin and saves that landmark in a variable for further processing."""
+        self.processing_start = self.latency.now()
         self.get_logger().info('Landmark received')
         self.landmarks = lndmrk
+
+        #Landmarks carrying the stamp of their frame are matched with the boxes of the same frame.
+        #Landmarks without a stamp are matched, by their reception time, with the boxes received at the same time.
+        header = getattr(lndmrk, "header", None)
+        stamp = stamp_seconds(header.stamp) if header is not None else 0.0
+        if stamp != 0.0:
+            self.add_to_synchronizer("landmarks", lndmrk, stamp)
+        else:
+            self.unstamped_landmarks += 1
+            self.add_to_synchronizer("landmarks", lndmrk, self.get_clock().now().nanoseconds / 1e9, self.reception_synchronizer)
+
+        if self.event_driven:
+            self.person_tracked_callback()
+
+    def add_to_synchronizer(self, topic:str, msg, stamp:float, synchronizer=None)->None:
+        """Adds a message to a synchronizer (by default, the one of the capture stamps), and keeps the pair (landmarks, bounding boxes)
+        it completes if any"""
+        if synchronizer is None:
+            synchronizer = self.synchronizer
+        with self.sync_lock:
+            matched = synchronizer.add(topic, msg, stamp)
+        if matched is not None:
+            self.synced_pair = (matched["landmarks"], matched["boxes"])
+
+    def watchdog_callback(self):
+        """Callback function for the watchdog timer (event-driven mode).
+        While a person is tracked, if no bounding boxes arrived for boxes_timeout seconds (the detector stopped or lags),
+        an empty midpoint is published at each period, so that the person is considered lost after max_empty_midpoint_before_lost periods."""
+        if not self.selector.tracking or self.last_boxes_time is None or self.person_lost():
+            return
+        if self.get_clock().now().nanoseconds - self.last_boxes_time < self.boxes_timeout * 1e9:
+            return
+        self.get_logger().warning(f"No bounding boxes received for more than {self.boxes_timeout}s")
+        self.person_tracked_msg.middle_point = PointMsg()
+        self.set_box_size(0.0, 0.0)
+        self.selector.miss()
+        self.publish_person_tracked()
+
+    def diagnostics_callback(self):
+        """Callback function for the diagnostics publisher (to topic /diagnostics).
+        Publishes the match rate of the landmarks and bounding boxes, and the skew between the stamps of the matched pairs.
+        The statistics of the reception time fallback (landmarks without a stamp) are prefixed with 'reception_'."""
+        with self.sync_lock:
+            values = dict(self.synchronizer.stats(), slop=self.sync_slop, unstamped_landmarks=self.unstamped_landmarks)
+            values.update((f"reception_{key}", value) for key, value in self.reception_synchronizer.stats().items())
+        if self.unstamped_landmarks:
+            status = make_status(f"{self.get_name()}: landmarks/boxes synchronization", values, DiagnosticStatus.WARN,
+                                 "landmarks without a stamp: matched with the boxes by reception time")
+        else:
+            status = make_status(f"{self.get_name()}: landmarks/boxes synchronization", values)
+
+        #Re-identification: without any appearance of the tracked person, a lost person can't be recognized
+        reid_values = {"gallery": len(self.selector.reid.gallery), "tracking": self.selector.tracking}
+        if self.selector.similarity is not None:
+            reid_values["last_similarity"] = self.selector.similarity
+        if self.selector.tracking and not self.selector.reid.gallery:
+            reid_status = make_status(f"{self.get_name()}: re-identification", reid_values, DiagnosticStatus.WARN,
+                                      "empty gallery: the detector sends no embeddings (reid_embeddings parameter)")
+        else:
+            reid_status = make_status(f"{self.get_name()}: re-identification", reid_values)
+        self.publisher_diagnostics.publish(make_array(self, [status, reid_status]))
         
 
 ######################### Publisher #####################################################################################################
     def person_tracked_callback(self):
         """This function listens to the /hand/landmarks topic, and waits to spot the person who did the triggering move. 
         In case a person did the trigger move, the midpoint of the bounding box around that person is published on a the topic named /person_tracked. 
-        The last node (track_person.py) will subscribe to /person_tracked and send commands to the drone to follow the tracked person."""
+        The last node (track_person.py) will subscribe to /person_tracked and send commands to the drone to follow the tracked person.
+        It is called when new bounding boxes or landmarks arrive (event-driven mode), or by a timer (polling mode)."""
+        if not self.event_driven:
+            self.processing_start = self.latency.now()
 
         if self.boxes is None:
             self.get_logger().info("No bounding box received")
@@ -129,26 +300,28 @@ class TriggerTracking(Node):
             if not self.boxes.bounding_boxes:#empty lists in Python can be evaluated as a boolean False. Hence this test is to make sure that boxes are received
                 self.get_logger().info(f"The list of bounding boxes is empty. Hence, maybe no detection were made.")
 
-            if self.tracking == False: #if no one has done the trigger move yet
-                if self.check_gesture(True):
+            if self.selector.tracking == False: #if no one has done the trigger move yet
+                #Only landmarks matched with the bounding boxes of the same frame are used
+                synced_pair, self.synced_pair = self.synced_pair, None
+                if synced_pair is not None and self.check_gesture(True, synced_pair[0]):
+                    landmarks, boxes = synced_pair
                     self.get_logger().info("\n Tracking Started!!")
-                    self.tracking = True
 
                     #Saving the location of the hands of the person who did the move so that we can map him/her to a bounding box.
                     #Only the points at the center if ther person's wrists are kept.
-                    self.person_tracked_left_hand_point = self.landmarks.left_hand.normalized_landmarks[0]
-                    self.person_tracked_right_hand_point = self.landmarks.right_hand.normalized_landmarks[0]
-                    self.get_logger().info(f"{self.landmarks.right_hand.gesture} {self.landmarks.left_hand.gesture}")
+                    self.person_tracked_left_hand_point = landmarks.left_hand.normalized_landmarks[0]
+                    self.person_tracked_right_hand_point = landmarks.right_hand.normalized_landmarks[0]
+                    self.get_logger().info(f"{landmarks.right_hand.gesture} {landmarks.left_hand.gesture}")
                     
                     #Instantiating the midpoint ROS message
                     self.person_tracked_midpoint = PointMsg()
                     #self.video.write(cv2.line(self.image_all_detected,(int(middle_left.x*self.width),int(middle_left.y*self.height)),(int(middle_right.x*self.width),int(middle_right.y*self.height)),(255,0,0),4))
                     
                     #Find the bounding box around the person who did the trigger gesture, so that the midpoint of the box can be calculated
-                    self.find_bounding_box_of_tracked_person()
+                    self.find_bounding_box_of_tracked_person(boxes)
                                         
                     if self.person_tracked_midpoint is not None:
-                        self.publisher_to_track.publish(self.person_tracked_msg)                  
+                        self.publish_person_tracked(boxes)
 
             else: #if someone did the trigger move yet 
             
@@ -156,43 +329,89 @@ class TriggerTracking(Node):
 
                     if self.check_gesture(False):
                         self.get_logger().info("\n Tracking Ended!")
-                        self.tracking = False
                         self.person_tracked_midpoint = None
+                        self.selector.stop()
                             
-                    else:
+                    elif self.new_boxes_received():
                         self.update_middlepoint()
-                        self.publisher_to_track.publish(self.person_tracked_msg) 
+                        self.publish_person_tracked(self.boxes)
                         self.get_logger().info(f"\nNow we know the person to track. midpoint is {self.person_tracked_msg.middle_point} \n")
                         self.get_logger().info(f"{self.landmarks.right_hand.gesture} {self.landmarks.left_hand.gesture}")
                 
                 else: #if the tracked person is lost, we start tracking the person detected by our YOLO model with the highest confidence score (the person from the first bounding box)
-                    if self.boxes.bounding_boxes:#empty lists in Python can be evaluated as a boolean False. Hence this test is to make sure that boxes are received
-                        highest_conf_box = self.boxes.bounding_boxes[0]
+                    #The person is only tracked again if their appearance matches the tracked person's, so that the drone doesn't follow a stranger
+                    index = self.reacquire_index() if self.new_boxes_received() else None
+                    if index is not None:
+                        top_left_x, top_left_y, bottom_right_x, bottom_right_y = self.boxes_xyxyn[index].tolist()
                         self.person_tracked_midpoint = PointMsg()
-                        self.person_tracked_midpoint.x = (highest_conf_box.top_left.x / 2) + (highest_conf_box.bottom_right.x / 2) 
-                        self.person_tracked_midpoint.y = (highest_conf_box.top_left.y / 2) + (highest_conf_box.bottom_right.y / 2)
-                        self.empty_midpoint_count = 0
+                        self.person_tracked_midpoint.x = (top_left_x / 2) + (bottom_right_x / 2) 
+                        self.person_tracked_midpoint.y = (top_left_y / 2) + (bottom_right_y / 2)
                         self.get_logger().info(f"\n#######################################\nStarted tracking a new person!\n#############################################\n")
                         self.get_logger().info(f'So the midpoint of that person is {self.person_tracked_midpoint}') 
                         #self.person_tracked_msg = PersonTracked()
                         self.person_tracked_msg.middle_point = self.person_tracked_midpoint
-                        self.publisher_to_track.publish(self.person_tracked_msg)    
+                        self.set_box_size(bottom_right_x - top_left_x, bottom_right_y - top_left_y)
+                        self.publish_person_tracked(self.boxes)
 
+            #The boxes received are now processed
+            self.last_boxes_seq = self.boxes.seq
 
         
            
 
 
 
-    def check_gesture(self, trigger:bool):
+    def reacquire_index(self)->int|None:
+        """Index of the box of self.boxes to track after losing the tracked person: the box of the person whose appearance matches
+        the tracked person's gallery, or None if nobody matches (see TargetSelector.reacquire). Without any appearance of the tracked person
+        (the detector sends no embeddings), the person detected with the highest confidence (the first box) is tracked, with a warning."""
+        if not self.boxes.bounding_boxes:#empty lists in Python can be evaluated as a boolean False. Hence this test is to make sure that boxes are received
+            return None
+        if not self.selector.reid.gallery:
+            self.get_logger().warning("No appearance of the tracked person: tracking the person detected with the highest confidence")
+        index = self.selector.reacquire(msg_embeddings(self.boxes))
+        if self.selector.similarity is not None:
+            self.get_logger().info(f"Best appearance similarity with the tracked person: {self.selector.similarity:.2f}")
+        return index
+
+    def publish_person_tracked(self, boxes=None)->None:
+        """Publishes self.person_tracked_msg on /person_tracked, with the header of the frame of 'boxes' (the bounding boxes the midpoint
+        comes from), and records the timing of the frame in this node. Without boxes (no frame), it is stamped with the current time."""
+        if boxes is None:
+            self.person_tracked_msg.header.stamp = self.get_clock().now().to_msg()
+            self.person_tracked_msg.header.frame_id = ""
+            self.publisher_to_track.publish(self.person_tracked_msg)
+            return
+        self.person_tracked_msg.header = boxes.header
+        self.publisher_to_track.publish(self.person_tracked_msg)
+        self.latency.record("trigger", boxes.header, self.processing_start)
+
+    def associate_boxes(self)->None:
+        """Associates the new bounding boxes with the persons seen in the previous frames (see person_tracking.association)"""
+        self.boxes_xyxyn, _, self.boxes_track_ids = msg_arrays(self.boxes)
+        self.selector.update(self.boxes_xyxyn, self.boxes_track_ids, stamp_seconds(self.boxes.header.stamp), frame_id=self.boxes.seq)
+
+    def set_box_size(self, width:float, height:float)->None:
+        """Sets the normalized size of the tracked person's box in the message sent to /person_tracked"""
+        self.person_tracked_msg.box_width = float(width)
+        self.person_tracked_msg.box_height = float(height)
+
+    def new_boxes_received(self)->bool:
+        """Returns True if the bounding boxes in self.boxes were not processed yet (their sequence number changed), and False else"""
+        return self.boxes is not None and self.boxes.seq != self.last_boxes_seq
+
+    def check_gesture(self, trigger:bool, landmarks=None):
         """Function used to check if the trigger gesture was done by someone.
         Returns True if someone did the gesture and False if not
         Parameter trigger is used to specify whether the function is used to spot the trigger move (trigger == True)
-        Or the gesture prompting to stop the tracking (trigger == False)"""
+        Or the gesture prompting to stop the tracking (trigger == False)
+        Parameter landmarks is the landmarks message to check (the last one received by default)"""
+        if landmarks is None:
+            landmarks = self.landmarks
 
-        if trigger and self.landmarks is not None and self.landmarks.right_hand.gesture == self.right_hand_gesture_trigger and self.landmarks.left_hand.gesture == self.left_hand_gesture_trigger:
+        if trigger and landmarks is not None and landmarks.right_hand.gesture == self.right_hand_gesture_trigger and landmarks.left_hand.gesture == self.left_hand_gesture_trigger:
             return True
-        elif not trigger and self.landmarks is not None and self.landmarks.right_hand.gesture == self.right_hand_gesture_stop and self.landmarks.left_hand.gesture == self.left_hand_gesture_stop:
+        elif not trigger and landmarks is not None and landmarks.right_hand.gesture == self.right_hand_gesture_stop and landmarks.left_hand.gesture == self.left_hand_gesture_stop:
             return True
         else:
             return False
@@ -204,94 +423,63 @@ class TriggerTracking(Node):
         result.y = self.person_tracked_midpoint.y * self.image_height
         return result
 
-    def find_bounding_box_of_tracked_person(self)->None:
-        """Finds the bounding box around the person who did the triggering move and updates self.person_tracked_midpoint
-        Precondition: self.boxes is not None"""
-        
-        #Loop to go through all the bounding boxes to find the box in which are contained both the left hand and right hand wrist center point
-        for box in self.boxes.bounding_boxes:
-
-            #Extracting the normalized coordinates of the top left and bottom right corner of each box. 
-            top_left_x = box.top_left.x
-            top_left_y = box.top_left.y
-            bottom_right_x = box.bottom_right.x
-            bottom_right_y = box.bottom_right.y
-
-            #Extracting the normalized coordinates of the left and right hand wrists' center points
-            left_hand_x = self.person_tracked_left_hand_point.x
-            left_hand_y = self.person_tracked_left_hand_point.y
-            right_hand_x = self.person_tracked_right_hand_point.x
-            right_hand_y = self.person_tracked_right_hand_point.y
-
-            #If both wrist' center points are in the bounding box, we update the midpoint 
-            if top_left_x <= left_hand_x and top_left_x <= right_hand_x:
-                if bottom_right_x >= left_hand_x and bottom_right_x >= right_hand_x:
-                    if top_left_y <= left_hand_y and top_left_y <= right_hand_y:
-                        if bottom_right_y >= left_hand_y and bottom_right_y >= right_hand_y:
-
-                            self.person_tracked_midpoint.x = top_left_x/ 2 + bottom_right_x/2 
-                            self.person_tracked_midpoint.y = top_left_y/2 + bottom_right_y/2
-                            
-                            self.person_tracked_msg.middle_point = self.person_tracked_midpoint #self.denormalize()
+    def find_bounding_box_of_tracked_person(self, boxes)->None:
+        """Finds the bounding box around the person who did the triggering move among 'boxes' (the bounding boxes message
+        of the frame the hand landmarks come from) and updates self.person_tracked_midpoint.
+        The box is the tightest one containing both the left hand and right hand wrist center points, found with one NumPy operation
+        over all the boxes (see person_tracking.association.enclosing_boxes): when boxes overlap, it is the box of the person in front."""
+        xyxyn, _, _ = msg_arrays(boxes)
 
-                            self.get_logger().info(f"top_left: {top_left_x}, {top_left_y}")
-                            self.get_logger().info(f"bottom_right: {bottom_right_x}, {bottom_right_y}")
-                            self.get_logger().info(f'First time midpoint updated to {self.person_tracked_msg.middle_point} \n')#{self.person_tracked_midpoint}')
+        #Normalized coordinates of the left and right hand wrists' center points
+        left_hand = self.person_tracked_left_hand_point
+        right_hand = self.person_tracked_right_hand_point
+        hands = np.array([[[left_hand.x, left_hand.y], [right_hand.x, right_hand.y]]], dtype=np.float64)
 
-                            return  
-                            
-        if self.person_tracked_midpoint.x == 0 and self.person_tracked_midpoint.y == 0:
+        index = int(enclosing_boxes(xyxyn, hands)[0])
+        if index < 0:
             self.get_logger().info(f"\nCannot find the person who did the gesture")
-            #self.tracking = False
+            self.selector.start(None)
+            return
+
+        top_left_x, top_left_y, bottom_right_x, bottom_right_y = xyxyn[index].tolist()
+        self.person_tracked_midpoint.x = top_left_x/ 2 + bottom_right_x/2 
+        self.person_tracked_midpoint.y = top_left_y/2 + bottom_right_y/2
+        
+        self.person_tracked_msg.middle_point = self.person_tracked_midpoint #self.denormalize()
+        self.set_box_size(bottom_right_x - top_left_x, bottom_right_y - top_left_y)
+
+        #The person in this box becomes the target of the association, and their appearance the first one of the gallery
+        self.selector.start(index, boxes.seq, msg_embeddings(boxes)[index])
+        if not self.selector.reid.gallery:
+            self.get_logger().warning("The bounding boxes carry no appearance embedding: the tracked person can't be recognized after being lost "
+                                      "(is the detector's reid_embeddings parameter set to False?)")
+
+        self.get_logger().info(f"top_left: {top_left_x}, {top_left_y}")
+        self.get_logger().info(f"bottom_right: {bottom_right_x}, {bottom_right_y}")
+        self.get_logger().info(f'First time midpoint updated to {self.person_tracked_msg.middle_point} \n')#{self.person_tracked_midpoint}')
 
     
     def update_middlepoint(self)->None:
-        """Find the nearest bounding box containing the middlepoint and updates the middlepoint.
-        This function is to use only when we already have a person to track (and hence, self.person_tracked_midpoint is not None)
+        """Updates the middlepoint with the bounding box associated with the tracked person in the new frame.
+        Boxes are associated with persons using the detector's track IDs, then IoU and center distance with the position predicted
+        from each person's velocity (see person_tracking.association), so a fast move or a person passing nearby doesn't lose the target.
+        If the tracked person isn't detected in the frame, an empty midpoint (0,0) is sent.
 
         Preconditions: self.person_tracked_midpoint is not None
                       self.boxes is not None
         """
-        #error between the actual midpoint (self.person_tracked_midpoint) and the midpoint of the bounding box
-        smallest_error_margin = -1
-        prev_midpoint_x = self.person_tracked_midpoint.x
-        prev_midpoint_y = self.person_tracked_midpoint.y
-        #Loop to go through all the bounding boxes to find the bounding box whose midpoint is the closest to the midpoint of person tracked in the previous frame.
-        #The midpoint found will be the new midpoint of the person to track
-        for box in self.boxes.bounding_boxes:
-            #Extracting the normalized coordinates of the top left and bottom right corner of each box.            
-            top_left_x = box.top_left.x
-            top_left_y = box.top_left.y
-            bottom_right_x = box.bottom_right.x
-            bottom_right_y = box.bottom_right.y
-
-            #Extracting the previous midpoint's coordinates
-            midpoint_x = self.person_tracked_midpoint.x
-            midpoint_y = self.person_tracked_midpoint.y
-
-            #if the previous midpoint is contained within the box, we calculate the distance between both points
-            #if that distance is the shortest encountered yet, we update the midpoint
-            if top_left_x <= midpoint_x and top_left_y <= midpoint_y and bottom_right_x >= midpoint_x and bottom_right_y >= midpoint_y:
-                new_midpoint_x = top_left_x/ 2 + bottom_right_x/2
-                new_midpoint_y = top_left_y/2 + bottom_right_y/2
-                error_margin = self.euclidean_distance_squared(midpoint_x,midpoint_y,new_midpoint_x,new_midpoint_y) #distance between midpoints
-                self.get_logger().info(f"top_left: {top_left_x}, {top_left_y}")
-                self.get_logger().info(f"bottom_right: {bottom_right_x}, {bottom_right_y}")
-                #updating the midpoint
-                if (smallest_error_margin == -1) or (error_margin < smallest_error_margin):
-                    self.person_tracked_midpoint.x = new_midpoint_x
-                    self.person_tracked_midpoint.y = new_midpoint_y
-                    smallest_error_margin = error_margin
-        
-        #In case no bounding box is found, we send a midpoint of coordinates (0,0)
-        if prev_midpoint_x == self.person_tracked_midpoint.x and prev_midpoint_y == self.person_tracked_midpoint.y:
+        index = self.selector.follow(msg_embeddings(self.boxes))
+
+        if index is None:
             #temp_midpoint = PointMsg() is initialized to x = 0 and y = 0 by default since ROS initializes all numeric values to 0 by default
             self.person_tracked_msg.middle_point = PointMsg()
-            self.empty_midpoint_count += 1
-            #pass
+            self.set_box_size(0.0, 0.0)
         else:
+            top_left_x, top_left_y, bottom_right_x, bottom_right_y = self.boxes_xyxyn[index].tolist()
+            self.person_tracked_midpoint.x = top_left_x/ 2 + bottom_right_x/2
+            self.person_tracked_midpoint.y = top_left_y/2 + bottom_right_y/2
             self.person_tracked_msg.middle_point = self.person_tracked_midpoint #self.denormalize()
-            self.empty_midpoint_count = 0
+            self.set_box_size(bottom_right_x - top_left_x, bottom_right_y - top_left_y)
             self.get_logger().info(f'Midpoint updated to {self.person_tracked_midpoint}') 
             
     
@@ -303,10 +491,7 @@ class TriggerTracking(Node):
     def person_lost(self):
         """Function to call when someone is lost.
         Returns true when the person is lost and False else."""  
-        if self.empty_midpoint_count >= self.max_empty_midpoint_before_lost:
-            return True
-        else: 
-            return False  
+        return self.selector.person_lost()
            
 ###################################################################################################################################       
   
@@ -319,12 +504,8 @@ def main(args=None):
     #Node instantiation
     trigger_tracking = TriggerTracking('trigger_tracking_node')
 
-    #Execute the callback function until the global executor is shutdown
-    rclpy.spin(trigger_tracking)
-    
-        #trigger_tracking.video.release()
-
-    #destroy the node. It is not mandatory, since the garbage collection can do it
-    trigger_tracking.destroy_node()
-    
-    rclpy.shutdown()        
+    #Execute the callback functions on several threads until the executor is shutdown
+    try:
+        spin([trigger_tracking])
+    finally:
+        rclpy.shutdown()        
@@ -1,3 +1,5 @@
+from glob import glob
+
 from setuptools import find_packages, setup
 
 package_name = 'person_tracking'
@@ -10,6 +12,7 @@ setup(
         ('share/ament_index/resource_index/packages',
             ['resource/' + package_name]),
         ('share/' + package_name, ['package.xml']),
+        ('share/' + package_name + '/launch', glob('launch/*.launch.py')),
     ],
     install_requires=['setuptools'],
     zip_safe=True,
@@ -23,7 +26,14 @@ setup(
             'all_detected_node = person_tracking.detect_all:main',
             'trigger_node = person_tracking.tracking_trigger:main',
             'tracker_node = person_tracking.track_person:main',
-            'test = person_tracking.publish_test:main', 
+            'multi_detector_node = person_tracking.multi_detect:main',
+            'pipeline_node = person_tracking.pipeline:main',
+            'bench_boxes = person_tracking.bench_boxes:main',
+            'bench_backends = person_tracking.bench_backends:main',
+            'bench_compression = person_tracking.bench_compression:main',
+            'tracking_simulator = person_tracking.simulator:main',
+            'replay_node = person_tracking.replay:main',
+            'latency_monitor = person_tracking.latency_monitor:main',
         ],
     },
 )
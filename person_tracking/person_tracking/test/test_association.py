@@ -0,0 +1,75 @@
+from person_tracking.association import TargetAssociator, iou_matrix
+import numpy as np
+
+
+def box(x, width=0.2):
+    return [x, 0.1, x + width, 0.9]
+
+
+def untracked(count):
+    return np.full(count, -1)
+
+
+def test_iou_matrix():
+    boxes = np.array([box(0.0), box(0.1), box(0.5)])
+    iou = iou_matrix(boxes, boxes)
+    assert np.allclose(np.diag(iou), 1.0)
+    assert np.isclose(iou[0, 1], 1 / 3)
+    assert iou[0, 2] == 0.0
+
+
+def test_hungarian_keeps_identities_when_persons_cross():
+    #Two persons walk towards each other and cross: after the crossing, the nearest box would swap them, the predicted positions don't
+    associator = TargetAssociator()
+    associator.update(np.array([box(0.1), box(0.6)]), untracked(2), 0.0)
+    associator.lock(0)
+    for step in range(1, 10):
+        walking_right, walking_left = box(0.1 + 0.05 * step), box(0.6 - 0.05 * step)
+        associator.update(np.array([walking_left, walking_right]), untracked(2), step * 0.1)
+        if step != 5: #both boxes are the same at the crossing
+            assert associator.target_index() == 1
+    assert np.isclose(associator.target.box[0], 0.55)
+
+
+def test_detector_ids_take_precedence():
+    associator = TargetAssociator()
+    associator.update(np.array([box(0.1), box(0.6)]), np.array([7, 8]), 0.0)
+    associator.lock(1)
+    #The boxes jump, but the detector's IDs say who is who
+    associator.update(np.array([box(0.6), box(0.1)]), np.array([8, 7]), 0.1)
+    assert associator.target_index() == 0
+
+
+def test_target_kept_across_misses_then_matched_again():
+    associator = TargetAssociator(max_misses=3)
+    associator.update(np.array([box(0.4)]), untracked(1), 0.0)
+    associator.lock(0)
+    target = associator.target
+    for step in range(1, 6):
+        associator.update(np.zeros((0, 4)), untracked(0), step * 0.1)
+        assert associator.target_index() is None
+    #The target is never forgotten while locked, even after max_misses frames
+    assert target in associator.tracks
+    associator.update(np.array([box(0.41)]), untracked(1), 0.6)
+    assert associator.target_index() == 0
+    assert associator.target is target
+
+
+def test_unlocked_persons_forgotten_after_misses():
+    associator = TargetAssociator(max_misses=2)
+    associator.update(np.array([box(0.4)]), untracked(1), 0.0)
+    for step in range(1, 4):
+        associator.update(np.zeros((0, 4)), untracked(0), step * 0.1)
+    assert associator.tracks == []
+
+
+def test_unlock_and_lock_older_frame():
+    associator = TargetAssociator()
+    associator.update(np.array([box(0.1), box(0.6)]), untracked(2), 0.0, frame_id=1)
+    associator.update(np.array([box(0.11), box(0.61)]), untracked(2), 0.1, frame_id=2)
+    assert associator.lock(1, frame_id=1)
+    assert associator.target_index() == 1
+    associator.unlock()
+    assert associator.target_index() is None
+    #Frames out of the history can't be locked
+    assert not associator.lock(0, frame_id=0)
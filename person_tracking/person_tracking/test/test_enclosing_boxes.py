@@ -0,0 +1,41 @@
+from person_tracking.association import enclosing_boxes
+import numpy as np
+
+
+def hands(*points):
+    return np.array([points], dtype=np.float64)
+
+
+def test_box_containing_both_hands():
+    boxes = np.array([[0.0, 0.0, 0.3, 1.0], [0.5, 0.0, 0.8, 1.0]])
+    assert enclosing_boxes(boxes, hands((0.6, 0.4), (0.7, 0.4))).tolist() == [1]
+
+
+def test_no_box_contains_both_hands():
+    boxes = np.array([[0.0, 0.0, 0.3, 1.0], [0.5, 0.0, 0.8, 1.0]])
+    assert enclosing_boxes(boxes, hands((0.2, 0.4), (0.6, 0.4))).tolist() == [-1]
+
+
+def test_empty_inputs():
+    assert enclosing_boxes(np.zeros((0, 4)), hands((0.5, 0.5), (0.5, 0.5))).tolist() == [-1]
+    assert enclosing_boxes(np.array([[0.0, 0.0, 1.0, 1.0]]), np.zeros((0, 2, 2))).tolist() == []
+
+
+def test_overlapping_boxes_tightest_wins():
+    #A person in front of a larger box (a person closer to the camera, or a group): the tightest box is the gesturing person
+    boxes = np.array([[0.1, 0.0, 0.9, 1.0], [0.4, 0.2, 0.6, 0.9]])
+    assert enclosing_boxes(boxes, hands((0.45, 0.5), (0.55, 0.5))).tolist() == [1]
+
+
+def test_several_groups_get_different_boxes():
+    #Every group is inside the large box, but only the first one has no other box:
+    #it gets the large box, and the other groups get the small boxes around them
+    boxes = np.array([[0.0, 0.0, 1.0, 1.0], [0.6, 0.0, 0.9, 1.0], [0.1, 0.0, 0.3, 1.0]])
+    groups = np.array([[[0.4, 0.5], [0.5, 0.5]], [[0.7, 0.5], [0.8, 0.5]], [[0.15, 0.5], [0.25, 0.5]]])
+    assert enclosing_boxes(boxes, groups).tolist() == [0, 1, 2]
+
+
+def test_group_without_box_among_several():
+    boxes = np.array([[0.6, 0.0, 0.9, 1.0]])
+    groups = np.array([[[0.7, 0.5], [0.8, 0.5]], [[0.1, 0.5], [0.2, 0.5]]])
+    assert enclosing_boxes(boxes, groups).tolist() == [0, -1]
@@ -0,0 +1,75 @@
+from person_tracking.flight_control import FlightController, FlightState, NO_COMMAND, make_flight_controller
+from math import pi
+import pytest
+
+
+CENTER = (0.5, 0.5, 0.2, 0.6)
+
+
+def test_idle_until_flying():
+    controller = FlightController()
+    assert controller.step(0.0, False, False, CENTER, None) == NO_COMMAND
+    assert controller.state == FlightState.IDLE
+    controller.step(0.1, True, False, CENTER, None)
+    assert controller.state == FlightState.TRACKING
+
+
+def test_tracking_follows_the_person():
+    controller = FlightController()
+    command = controller.step(0.0, True, False, (0.8, 0.5, 0.2, 0.6), None)
+    #The person is on the right: the drone moves right (negative lateral speed)
+    assert command.linear_y < 0
+    assert not command.land
+
+
+@pytest.mark.parametrize("height, sign", [(0.1, 1), (0.9, -1)])
+def test_default_controllers_keep_the_distance(height, sign):
+    controller = make_flight_controller()
+    command = controller.step(0.0, True, False, (0.8, 0.5, 0.2, height), None)
+    #Far person (small box): forward, close person (large box): backward. The drone also turns right
+    assert command.linear_x * sign > 0
+    assert command.angular_z < 0
+
+
+def test_no_target_no_move():
+    controller = FlightController()
+    assert controller.step(0.0, True, False, None, None) == NO_COMMAND
+    assert controller.state == FlightState.TRACKING
+
+
+def test_lost_without_direction_waits():
+    controller = FlightController()
+    controller.step(0.0, True, False, CENTER, None)
+    assert controller.step(0.1, True, True, None, None) == NO_COMMAND
+    assert controller.state == FlightState.TRACKING
+
+
+@pytest.mark.parametrize("direction, sign", [("left", 1), ("right", -1)])
+def test_search_rotates_towards_direction(direction, sign):
+    controller = FlightController(search_speed=pi / 4)
+    controller.step(0.0, True, False, CENTER, None)
+    command = controller.step(0.1, True, True, None, direction)
+    assert controller.state == FlightState.SEARCHING
+    assert command.angular_z == pytest.approx(sign * pi / 4)
+
+
+def test_search_ends_when_person_found():
+    controller = FlightController()
+    controller.step(0.0, True, True, None, "left")
+    controller.step(0.1, True, True, None, "left")
+    controller.step(0.2, True, False, CENTER, None)
+    assert controller.state == FlightState.TRACKING
+
+
+def test_lands_after_a_complete_rotation():
+    controller = FlightController(search_speed=pi, search_angle=2 * pi)
+    controller.step(0.0, True, True, None, "right")
+    #The rotated angle is integrated from the time between steps: 2 s at pi rad/s
+    command = controller.step(1.0, True, True, None, "right")
+    assert not command.land
+    command = controller.step(2.0, True, True, None, "right")
+    assert command.land
+    assert controller.state == FlightState.LANDING
+    assert controller.step(2.1, True, True, None, "right") == NO_COMMAND
+    controller.step(2.2, False, True, None, None)
+    assert controller.state == FlightState.IDLE
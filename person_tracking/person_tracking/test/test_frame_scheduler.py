@@ -0,0 +1,66 @@
+from person_tracking.frame_scheduler import AdaptiveFrameScheduler
+import pytest
+
+
+#Synthetic timings, exact in binary so that the strides don't depend on rounding: frames every 0.125 s
+FRAME_PERIOD = 0.125
+
+
+def measured(latency_budget, inference_time, max_stride=30):
+    """Scheduler that received a few frames at FRAME_PERIOD and measured one inference of inference_time"""
+    scheduler = AdaptiveFrameScheduler(latency_budget, max_stride=max_stride)
+    for index in range(5):
+        scheduler.on_frame(index * FRAME_PERIOD)
+    scheduler.on_inference(inference_time)
+    return scheduler
+
+
+def test_every_frame_until_measured():
+    scheduler = AdaptiveFrameScheduler(0.5)
+    assert scheduler.compute_stride() == 1
+    assert scheduler.expected_latency() is None
+    assert all(scheduler.on_frame(index * FRAME_PERIOD) for index in range(3))
+
+
+def test_fast_model_every_frame():
+    #I <= budget / 2: no frame waits long enough to exceed the budget
+    scheduler = measured(0.5, 0.125)
+    assert scheduler.stride == 1
+
+
+@pytest.mark.parametrize("inference_time, stride", [(0.375, 2), (0.5, 4)])
+def test_stride_meets_the_budget(inference_time, stride):
+    #stride = ceil((2I - budget) / T)
+    scheduler = measured(0.5, inference_time)
+    assert scheduler.stride == stride
+    assert scheduler.expected_latency() <= 0.5
+    assert scheduler.detection_rate() == pytest.approx(1 / (stride * FRAME_PERIOD))
+
+    #One frame less would exceed it
+    scheduler.stride -= 1
+    assert scheduler.expected_latency() > 0.5
+
+
+def test_budget_out_of_reach():
+    #I > budget: the stride avoids waiting behind a running inference, the latency is the inference time
+    scheduler = measured(0.5, 1.0)
+    assert scheduler.stride == 8
+    assert scheduler.expected_latency() == pytest.approx(1.0)
+
+
+def test_max_stride():
+    scheduler = measured(0.5, 1.0, max_stride=4)
+    assert scheduler.stride == 4
+    assert scheduler.expected_latency() == pytest.approx(1.5)
+
+
+def test_skipped_frames():
+    scheduler = measured(0.5, 0.375)
+    counts = scheduler.received, scheduler.submitted, scheduler.skipped
+    decisions = [scheduler.on_frame((5 + index) * FRAME_PERIOD) for index in range(6)]
+    #Stride 2: one frame out of two
+    assert decisions == [False, True] * 3
+    assert scheduler.received - counts[0] == 6
+    assert scheduler.submitted - counts[1] == 3
+    assert scheduler.skipped - counts[2] == 3
+    assert scheduler.received == scheduler.submitted + scheduler.skipped
@@ -0,0 +1,56 @@
+from person_tracking.kalman import TargetKalmanFilter
+import numpy as np
+
+
+def test_first_update_initializes_without_velocity():
+    target_filter = TargetKalmanFilter()
+    assert not target_filter.initialized
+    target_filter.predict(0.1) #nothing to predict yet
+    target_filter.update((0.4, 0.5, 0.2, 0.6))
+    assert target_filter.initialized
+    assert np.allclose(target_filter.position, (0.4, 0.5))
+    assert np.allclose(target_filter.size, (0.2, 0.6))
+    assert np.allclose(target_filter.velocity, 0.0)
+
+
+def test_velocity_estimated_and_predicted():
+    target_filter = TargetKalmanFilter()
+    for step in range(20):
+        if step:
+            target_filter.predict(0.1)
+        target_filter.update((0.2 + 0.02 * step, 0.5, 0.2, 0.6))
+    assert np.isclose(target_filter.velocity[0], 0.2, atol=0.02)
+    target_filter.predict(0.5)
+    assert np.isclose(target_filter.position[0], 0.58 + 0.1, atol=0.02)
+
+
+def test_non_positive_dt_is_ignored():
+    target_filter = TargetKalmanFilter()
+    target_filter.update((0.4, 0.5, 0.2, 0.6))
+    target_filter.predict(0.1)
+    target_filter.update((0.42, 0.5, 0.2, 0.6))
+    state, covariance = target_filter.state.copy(), target_filter.covariance.copy()
+    for dt in (0.0, -0.1):
+        target_filter.predict(dt)
+        assert np.array_equal(target_filter.state, state)
+        assert np.array_equal(target_filter.covariance, covariance)
+
+
+def test_uncertainty_grows_with_prediction_and_shrinks_with_update():
+    target_filter = TargetKalmanFilter()
+    target_filter.update((0.4, 0.5, 0.2, 0.6))
+    before = target_filter.position_std()
+    target_filter.predict(1.0)
+    predicted = target_filter.position_std()
+    target_filter.update((0.4, 0.5, 0.2, 0.6))
+    assert predicted > before
+    assert target_filter.position_std() < predicted
+
+
+def test_reset():
+    target_filter = TargetKalmanFilter()
+    target_filter.update((0.4, 0.5, 0.2, 0.6))
+    target_filter.reset()
+    assert not target_filter.initialized
+    target_filter.update((0.8, 0.5, 0.2, 0.6))
+    assert np.allclose(target_filter.position, (0.8, 0.5))
@@ -0,0 +1,67 @@
+from person_tracking.pid import PID, PIDRange
+import numpy as np
+import pytest
+
+
+def test_proportional_on_several_axes():
+    pid = PID(kp=(1.0, 2.0), setpoint=(0.5, 0.5))
+    assert np.allclose(pid.compute((0.4, 0.7), now=0.0), (0.1, -0.4))
+
+
+def test_integral_uses_real_dt():
+    pid = PID(kp=0.0, ki=1.0)
+    pid.compute_error(1.0, now=0.0) #first call: no dt yet, nothing integrated
+    assert pid.compute_error(1.0, now=0.5) == pytest.approx(0.5)
+    assert pid.compute_error(1.0, now=2.0) == pytest.approx(2.0)
+
+
+def test_non_positive_dt_changes_nothing():
+    pid = PID(kp=0.0, ki=1.0, kd=1.0)
+    pid.compute_error(0.0, now=0.0)
+    pid.compute_error(1.0, now=1.0)
+    integral, derivative = pid.integral.copy(), pid.derivative.copy()
+    for now in (1.0, 0.5): #same time, clock going backwards
+        pid.compute_error(5.0, now=now)
+        assert np.array_equal(pid.integral, integral)
+        assert np.array_equal(pid.derivative, derivative)
+
+
+def test_anti_windup_while_saturated():
+    pid = PID(kp=1.0, ki=1.0, output_limits=(-0.3, 0.3))
+    pid.compute_error(1.0, now=0.0)
+    for step in range(1, 50):
+        output = pid.compute_error(1.0, now=step * 0.1)
+    assert output == pytest.approx(0.3)
+    #The output saturated at once: the integral didn't keep growing, so it recovers as soon as the error changes sign
+    assert pid.integral < 0.2
+    assert pid.compute_error(-0.5, now=5.0) < 0.0
+
+
+def test_integral_limits():
+    pid = PID(kp=0.0, ki=1.0, integral_limits=(-1.0, 1.0))
+    pid.compute_error(1.0, now=0.0)
+    pid.compute_error(1.0, now=10.0)
+    assert pid.integral == pytest.approx(1.0)
+
+
+def test_dead_zone():
+    pid = PID(kp=1.0, setpoint=0.5, dead_zone=0.05)
+    assert pid.compute(0.47, now=0.0) == 0.0
+    assert pid.compute(0.4, now=0.1) == pytest.approx(0.1)
+
+
+def test_reset():
+    pid = PID(kp=1.0, ki=1.0, kd=1.0)
+    pid.compute_error(1.0, now=0.0)
+    pid.compute_error(1.0, now=1.0)
+    pid.reset()
+    assert pid.last_time is None
+    assert pid.integral == 0.0
+    assert pid.compute_error(1.0, now=2.0) == pytest.approx(1.0)
+
+
+def test_range_controller():
+    pid = PIDRange(0.4, 0.8, kp=1.0, ki=0.0)
+    assert pid.compute(0.6, now=0.0) == 0.0
+    assert pid.compute(0.3, now=0.1) == pytest.approx(0.1)
+    assert pid.compute(0.9, now=0.2) == pytest.approx(-0.1)
@@ -0,0 +1,27 @@
+from person_tracking.simulator import Simulation, paths
+import pytest
+
+
+#Limits per path (with the default gains, latency, dropout and seed): mean tracking error, fraction of the time at the right distance,
+#visible fraction, mean time to reacquire
+limits = {
+    "walk": {"error_mean": 0.17, "in_range": 0.95, "visible": 0.99, "reacquire_mean": None},
+    "zigzag": {"error_mean": 0.25, "in_range": 0.95, "visible": 0.99, "reacquire_mean": None},
+    "circle": {"error_mean": 0.1, "in_range": 0.4, "visible": 0.99, "reacquire_mean": None},
+    "sprint": {"error_mean": 0.08, "in_range": 0.6, "visible": 0.99, "reacquire_mean": None},
+}
+
+
+@pytest.mark.parametrize("name", sorted(limits))
+def test_scripted_paths(name):
+    stats = Simulation(paths[name]).run()
+    limit = limits[name]
+    assert stats["error_mean"] <= limit["error_mean"]
+    assert stats["in_range"] >= limit["in_range"]
+    assert stats["visible"] >= limit["visible"]
+    if limit["reacquire_mean"] is None:
+        assert stats["losses"] == 0
+    else:
+        assert stats["reacquire_mean"] <= limit["reacquire_mean"]
+    assert not stats["landed"]
+
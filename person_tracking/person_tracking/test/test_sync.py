@@ -0,0 +1,43 @@
+from person_tracking.sync import ApproximateTimeSynchronizer
+
+
+def make_synchronizer(slop=0.05, queue_size=3):
+    return ApproximateTimeSynchronizer(["landmarks", "boxes"], slop, queue_size)
+
+
+def test_match_within_slop():
+    synchronizer = make_synchronizer()
+    assert synchronizer.add("boxes", "b1", 1.00) is None
+    assert synchronizer.add("landmarks", "l1", 1.03) == {"landmarks": "l1", "boxes": "b1"}
+    stats = synchronizer.stats()
+    assert stats["matches"] == 1
+    assert abs(stats["skew_max"] - 0.03) < 1e-9
+
+
+def test_no_match_beyond_slop():
+    synchronizer = make_synchronizer()
+    synchronizer.add("boxes", "b1", 1.00)
+    assert synchronizer.add("landmarks", "l1", 1.06) is None
+    assert synchronizer.stats()["matches"] == 0
+
+
+def test_closest_message_matched_and_older_ones_dropped():
+    synchronizer = make_synchronizer()
+    for index, stamp in enumerate((1.00, 1.04, 1.08)):
+        synchronizer.add("boxes", f"b{index}", stamp)
+    assert synchronizer.add("landmarks", "l1", 1.05) == {"landmarks": "l1", "boxes": "b1"}
+    #b0 is older than the match: it can't be matched anymore. b2 waits for the next landmarks
+    assert [msg for _, msg in synchronizer.buffers["boxes"]] == ["b2"]
+    assert synchronizer.add("landmarks", "l2", 1.09) == {"landmarks": "l2", "boxes": "b2"}
+    assert synchronizer.match_rate("boxes") == 2 / 3
+
+
+def test_queue_bound():
+    synchronizer = make_synchronizer(queue_size=3)
+    for index in range(5):
+        synchronizer.add("boxes", f"b{index}", 1.0 + index * 0.1)
+    assert len(synchronizer.buffers["boxes"]) == 3
+    #b0 was pushed out of the full buffer
+    assert synchronizer.add("landmarks", "l0", 1.0) is None
+    assert synchronizer.match_rate("landmarks") == 0.0
+    assert synchronizer.match_rate("boxes") == 0.0
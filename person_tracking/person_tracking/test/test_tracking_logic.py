@@ -0,0 +1,80 @@
+from person_tracking.tracking_logic import TargetSelector, TargetFollower
+from person_tracking.flight_control import FlightState
+import numpy as np
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+
+TARGET = unit([1.0, 0.0, 0.0])
+STRANGER = unit([0.0, 1.0, 0.0])
+NO_IDS = np.full(2, -1)
+
+
+def test_selector_follows_then_loses_target():
+    selector = TargetSelector(max_misses=3)
+    boxes = np.array([[0.1, 0.1, 0.3, 0.9], [0.6, 0.1, 0.8, 0.9]])
+    selector.update(boxes, NO_IDS, 0.0)
+    selector.start(1, embedding=TARGET)
+    assert selector.tracking
+
+    selector.update(boxes + 0.01, NO_IDS, 0.1)
+    assert selector.follow([STRANGER, TARGET]) == 1
+
+    for frame in range(3):
+        selector.update(np.zeros((0, 4)), np.zeros(0, dtype=int), 0.2 + frame * 0.1)
+        assert selector.follow([]) is None
+    assert selector.person_lost()
+
+
+def test_selector_reacquires_only_the_target():
+    selector = TargetSelector(max_misses=1)
+    boxes = np.array([[0.1, 0.1, 0.3, 0.9], [0.6, 0.1, 0.8, 0.9]])
+    selector.update(boxes, NO_IDS, 0.0)
+    selector.start(0, embedding=TARGET)
+    selector.miss()
+    assert selector.person_lost()
+
+    #Only a stranger is visible: nobody is tracked
+    selector.update(boxes[:1], NO_IDS[:1], 1.0)
+    assert selector.reacquire([STRANGER]) is None
+    assert selector.person_lost()
+
+    #The target comes back, behind the stranger
+    selector.update(boxes, NO_IDS, 2.0)
+    assert selector.reacquire([STRANGER, unit([0.95, 0.05, 0.0])]) == 1
+    assert not selector.person_lost()
+    assert selector.associator.target_index() == 1
+
+
+def test_selector_without_appearance_takes_first_box():
+    selector = TargetSelector(max_misses=1)
+    boxes = np.array([[0.1, 0.1, 0.3, 0.9], [0.6, 0.1, 0.8, 0.9]])
+    selector.update(boxes, NO_IDS, 0.0)
+    selector.start(1)
+    selector.miss()
+    assert selector.reacquire([None, None]) == 0
+
+
+def test_follower_searches_in_the_direction_of_the_person():
+    follower = TargetFollower(max_misses=2)
+    #The person moves to the left of the image, then disappears
+    for tick in range(10):
+        follower.on_target(tick * 0.1, (0.5 - tick * 0.03, 0.5, 0.2, 0.6))
+        follower.command(tick * 0.1 + 0.05, True)
+    assert follower.flight_controller.state == FlightState.TRACKING
+    follower.on_target(1.0, None)
+    follower.on_target(1.1, None)
+    command = follower.command(1.15, True)
+    assert follower.flight_controller.state == FlightState.SEARCHING
+    assert command.angular_z > 0
+
+
+def test_follower_stops_on_frozen_midpoint():
+    follower = TargetFollower(max_misses=2)
+    follower.on_target(0.0, (0.9, 0.5, 0.2, 0.6))
+    commands = [follower.command(0.1 * tick, True) for tick in range(1, 6)]
+    assert commands[0].linear_y != 0.0
+    assert commands[-1].linear_y == 0.0
@@ -2,11 +2,15 @@
 import rclpy
 from rclpy.node import Node
 
-#ROS image message
-from sensor_msgs.msg import Image
+#ROS image messages
+from sensor_msgs.msg import Image, CompressedImage
+from std_msgs.msg import Header
 
-#To handle images
-#import cv2
+#Diagnostics messages, to expose the counters of the capture
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+
+#JPEG outputs (also used by the person_tracking nodes)
+from tello.jpeg import compressed_msg, downscale
 
 #To connect to the drone
 from djitellopy import Tello, tello
@@ -14,18 +18,56 @@ from djitellopy import Tello, tello
 #To convert cv2 images to ROS Image messages
 from cv_bridge import CvBridge
 
+#To read the decoder and publish the frames on dedicated threads
+import time
+from threading import Thread, Event
+from tello.frame_ring import FrameRing, CapturedFrame
+
 
 
 class ImagePublisher(Node):
-    def __init__(self,name):
+
+    #Period (in seconds) at which the capture thread checks whether the decoder produced a new frame.
+    #Well below the frame period of the drone (~33 ms at 30 FPS), so that a frame is stamped right after it is decoded.
+    capture_period = 0.002
+
+    #Amount of decoded frames waiting to be published. When the publishing thread falls behind, the oldest frames are dropped.
+    ring_size = 4
+
+    #Frame of reference of the images
+    camera_frame_id = "tello_camera"
+
+    #Period (in seconds) of the diagnostics messages
+    diagnostics_period = 1.0
+    diagnostics_topic = "/diagnostics"
+
+    def __init__(self,name,frame_bus=None,frame_topic='image_raw'):
+        """If a frame bus is given (composed mode, see person_tracking.frame_bus), frames are handed to the nodes of the same process
+        through the bus on 'frame_topic', without conversion. They are then only converted to Image messages if someone subscribes to image_raw.
+        Frames are published as soon as the drone's decoder produces them, and each decoded frame is published exactly once:
+        a capture thread stamps each new frame with its decode time and puts it in a ring buffer, and a publishing thread takes them out."""
         #Creation of the node
         super().__init__(name)
 
-        #Creation of the publisher
+        #In-process frame transport (composed mode)
+        self.frame_bus = frame_bus
+        self.frame_topic = frame_topic
+
+        #Creation of the publishers
         self.publisher_ = self.create_publisher(Image, 'image_raw', 10)
 
-        #Creation of a timer to execute the callback function
-        self.timer = self.create_timer(0.1, self.timer_callback)
+        #JPEG outputs, for ground stations on a limited link: image_raw/compressed at full resolution,
+        #and image_raw/preview/compressed downscaled to preview_width pixels
+        self.publisher_compressed = self.create_publisher(CompressedImage, 'image_raw/compressed', 10)
+        self.publisher_preview = self.create_publisher(CompressedImage, 'image_raw/preview/compressed', 10)
+        self.jpeg_quality = self.declare_parameter("jpeg_quality", 80).value
+        self.preview_width = self.declare_parameter("preview_width", 320).value
+        self.preview_quality = self.declare_parameter("preview_quality", 60).value
+
+        self.publisher_diagnostics = self.create_publisher(DiagnosticArray, self.diagnostics_topic, 5)
+
+        #Creation of a timer to publish the capture counters
+        self.timer_diagnostics = self.create_timer(self.diagnostics_period, self.diagnostics_callback)
 
         #Connection to the drone
         self.drone = tello.Tello()
@@ -33,23 +75,93 @@ class ImagePublisher(Node):
         self.drone.streamon()
 
         #Variable to receive a frame from the drone
-        self.cap = self.drone.get_frame_read()  
+        self.cap = self.drone.get_frame_read()
 
-        #counter for frames
+        #counter for frames (sequence number of the last decoded frame)
         self.i = 0
 
-        #image Converter, from OpenCv format to ROS image message format 
+        #Counter of the frames published
+        self.published = 0
+
+        #image Converter, from OpenCv format to ROS image message format
         self.cv_bridge = CvBridge()
-        
-    def timer_callback(self):
-        """Callback function to publish a frame received from the drone. It notifies that the frame has been published."""
-        frame = self.cap.frame
-        self.publisher_.publish(self.cv_bridge.cv2_to_imgmsg(frame,'rgb8'))  
-        self.get_logger().info('Publishing frame %d'%self.i)
-        self.i +=1
+
+        #Frames decoded and not published yet
+        self.ring = FrameRing(self.ring_size)
+
+        #Threads reading the decoder and publishing the frames
+        self.stopped = Event()
+        self.capture_thread = Thread(target=self.capture_loop, name="camera_capture", daemon=True)
+        self.publish_thread = Thread(target=self.publish_loop, name="camera_publish", daemon=True)
+        self.capture_thread.start()
+        self.publish_thread.start()
+
+    def capture_loop(self):
+        """Loop of the capture thread: puts each new frame of the decoder in the ring, stamped with the time it was seen.
+        djitellopy's reader replaces its frame array for each decoded frame, so a new frame is a new array object."""
+        last_frame = None
+        while not self.stopped.is_set():
+            frame = self.cap.frame
+            if frame is None or frame is last_frame:
+                time.sleep(self.capture_period)
+                continue
+            stamp = self.get_clock().now()
+            last_frame = frame
+            self.i += 1
+            self.ring.put(CapturedFrame(frame, self.i, stamp))
+
+    def publish_loop(self):
+        """Loop of the publishing thread: publishes each frame of the ring once, in order"""
+        while not self.ring.closed:
+            captured = self.ring.take(timeout=0.1)
+            if captured is not None:
+                self.publish_frame(captured)
+
+    def publish_frame(self, captured:CapturedFrame):
+        """Publishes a frame received from the drone, stamped with its decode time.
+        The JPEG outputs are only encoded if someone subscribes to them, on the publishing thread (never on the executor)."""
+        header = Header()
+        header.stamp = captured.stamp.to_msg()
+        header.frame_id = self.camera_frame_id
+        if self.frame_bus is not None:
+            self.frame_bus.publish(self.frame_topic, captured.image, header)
+        if self.frame_bus is None or self.publisher_.get_subscription_count() > 0:
+            self.publisher_.publish(self.cv_bridge.cv2_to_imgmsg(captured.image,'rgb8',header))
+        if self.publisher_compressed.get_subscription_count() > 0:
+            self.publisher_compressed.publish(compressed_msg(captured.image, header, self.jpeg_quality))
+        if self.publisher_preview.get_subscription_count() > 0:
+            self.publisher_preview.publish(compressed_msg(downscale(captured.image, self.preview_width), header, self.preview_quality))
+        self.published += 1
+        self.get_logger().debug('Publishing frame %d'%captured.seq)
+
+    def diagnostics_callback(self):
+        """Callback function for the diagnostics publisher (to topic /diagnostics).
+        It publishes the counters of the capture: frames decoded, published and dropped by the ring buffer."""
+        values = {
+            "sequence": self.i,
+            "published": self.published,
+            "dropped": self.ring.dropped,
+            "queued": len(self.ring),
+        }
+        status = DiagnosticStatus()
+        status.level = DiagnosticStatus.OK if self.capture_thread.is_alive() else DiagnosticStatus.ERROR
+        status.name = f"{self.get_name()}: capture"
+        status.values = [KeyValue(key=key, value=str(value)) for key, value in values.items()]
+        array = DiagnosticArray()
+        array.header.stamp = self.get_clock().now().to_msg()
+        array.status = [status]
+        self.publisher_diagnostics.publish(array)
+
+    def destroy_node(self):
+        """Stops the capture and publishing threads before destroying the node"""
+        self.stopped.set()
+        self.ring.close()
+        self.capture_thread.join(timeout=1.0)
+        self.publish_thread.join(timeout=1.0)
+        super().destroy_node()
 
 def main(args=None):
-    #Intialization ROS communication 
+    #Intialization ROS communication
     rclpy.init(args=args)
     image_publisher = ImagePublisher('camera_1_pub')
 
@@ -58,5 +170,5 @@ def main(args=None):
 
     #destroy the node. It is not mandatory, since the garbage collection can do it
     image_publisher.destroy_node()
-    
-    rclpy.shutdown()        
+
+    rclpy.shutdown()
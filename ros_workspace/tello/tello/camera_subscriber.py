@@ -3,15 +3,12 @@ from rclpy.node import Node
 from sensor_msgs.msg import Image
 import cv2
 from cv_bridge import CvBridge
-##for object detection
-from ultralytics import YOLO
+##for object detection. The model is loaded on the first frame received
+from time import perf_counter
+from tello.model import get_model, classes_ids, Tracker
 
-
-model = YOLO('yolov8n.pt') 
-classes = model.names
 minimum_prob = 0.4  
 classes_needed = ["person"]
-classes_ID = [k for k,v in classes.items() if v in classes_needed]
 
 class ImageSubscriber(Node):
 
@@ -20,10 +17,25 @@ class ImageSubscriber(Node):
         self.sub = self.create_subscription(Image,'image_raw',self.listener_callback,10)
         self.cv_bridge = CvBridge()
         #self.subscription  # prevent unused variable warning
+
+        #object detection model and ids of the classes of interest, set on the first frame
+        self.model = None
+        self.classes_ID = None
+
+        #Tracker of this node's objects (the model is shared by the nodes of the process, but not the tracks)
+        self.tracker = Tracker()
+        self.first_inference = True
         
     def detection(self,frame):
         """Function to perform object detection"""
-        results = model.track(frame, persist=True, classes=classes_ID, conf=minimum_prob)
+        if self.model is None:
+            self.model = get_model('yolov8n.pt', self.get_logger())
+            self.classes_ID = classes_ids(self.model, classes_needed)
+        start = perf_counter()
+        results = self.tracker.track(self.model, frame, classes=self.classes_ID, conf=minimum_prob)
+        if self.first_inference:
+            self.get_logger().info(f"First inference done in {perf_counter() - start:.2f}s")
+            self.first_inference = False
         frame_ = results[0].plot()
         return frame_
         
@@ -0,0 +1,59 @@
+#To hand the frames from the capture thread to the publishing thread
+from collections import deque, namedtuple
+from threading import Condition
+
+
+#Frame decoded by the drone: the image, its sequence number (counted from the start of the stream) and its decode time (ROS Time).
+#A frame put in a FrameRing without sequence number (None) is numbered by the ring.
+CapturedFrame = namedtuple("CapturedFrame", ["image", "seq", "stamp"])
+
+
+class FrameRing():
+    """Bounded ring buffer of captured frames, between the thread reading the decoder and the thread publishing the frames.
+    When the buffer is full, the oldest frame is overwritten (the stream stays live) and counted as dropped.
+    Each frame is taken exactly once."""
+
+    def __init__(self, size:int=4):
+        self._condition = Condition()
+        self._frames = deque(maxlen=size)
+
+        #Set to True when the ring is closed, to wake up and release the consumer
+        self._closed = False
+
+        #Amount of frames put in the ring, and amount of frames overwritten before being taken
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame:CapturedFrame)->None:
+        """Adds a frame to the ring, overwriting (and counting as dropped) the oldest one if the ring is full.
+        A frame without sequence number gets the amount of frames put before it, so that producers on several threads never share a number."""
+        with self._condition:
+            if frame.seq is None:
+                frame = frame._replace(seq=self.received)
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self.received += 1
+            self._condition.notify()
+
+    def take(self, timeout=None)->CapturedFrame|None:
+        """Waits for a frame and removes the oldest one from the ring.
+        Returns None if no frame arrived before the timeout or if the ring was closed."""
+        with self._condition:
+            if not self._frames and not self._closed:
+                self._condition.wait(timeout)
+            return self._frames.popleft() if self._frames else None
+
+    def close(self)->None:
+        """Closes the ring and wakes up the consumer waiting on it"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self)->bool:
+        return self._closed
+
+    def __len__(self)->int:
+        with self._condition:
+            return len(self._frames)
@@ -0,0 +1,31 @@
+#To encode the frames in JPEG
+import cv2
+import numpy as np
+
+#ROS compressed image message
+from sensor_msgs.msg import CompressedImage
+
+
+def encode_jpeg(image:np.ndarray, quality:int=80)->bytes:
+    """JPEG encoding of an RGB image (cv2 encodes BGR images, so the channels are swapped first)"""
+    success, buffer = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not success:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def downscale(image:np.ndarray, width:int)->np.ndarray:
+    """Image resized to 'width' pixels wide, keeping its aspect ratio. Images already that small are returned as they are"""
+    height, image_width = image.shape[:2]
+    if width <= 0 or image_width <= width:
+        return image
+    return cv2.resize(image, (width, max(1, round(height * width / image_width))), interpolation=cv2.INTER_AREA)
+
+
+def compressed_msg(image:np.ndarray, header, quality:int=80)->CompressedImage:
+    """CompressedImage message of an RGB image, in JPEG, with the header of the frame"""
+    msg = CompressedImage()
+    msg.header = header
+    msg.format = "jpeg"
+    msg.data = encode_jpeg(image, quality)
+    return msg
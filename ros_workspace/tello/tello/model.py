@@ -0,0 +1,74 @@
+#To share the loaded models between the nodes of a process, and time their loading
+from threading import Lock
+from time import perf_counter
+
+#Models already loaded in this process, by weights file
+_models = {}
+_models_lock = Lock()
+
+
+def get_model(weights='yolov8n.pt', logger=None):
+    """Returns the YOLOv8 model of the weights file, loading it on the first call only.
+    ultralytics (and PyTorch) are only imported here, since importing them takes several seconds:
+    importing a node module or starting a node doesn't load anything. The timings are logged with 'logger'."""
+    with _models_lock:
+        if weights not in _models:
+            start = perf_counter()
+            from ultralytics import YOLO
+            import_time = perf_counter() - start
+
+            start = perf_counter()
+            _models[weights] = YOLO(weights)
+            if logger is not None:
+                logger.info(f"ultralytics imported in {import_time:.2f}s, model {weights} loaded in {perf_counter() - start:.2f}s")
+        return _models[weights]
+
+
+def classes_ids(model, classes_needed:list)->list:
+    """Ids of the classes of interest"""
+    return [k for k,v in model.names.items() if v in classes_needed]
+
+
+class Tracker():
+    """Multi-object tracker of one node: model.track(frame, persist=True, ...) with a tracker that belongs to the node.
+    model.track() keeps its tracker in the model, which get_model shares between the nodes of the process: the nodes would
+    mix their tracks. Here the shared model only predicts (it never tracks), and the tracking is done by this object's BYTETracker."""
+
+    #Tracker configuration file of ultralytics, the same that model.track() uses by default
+    tracker_config = "bytetrack.yaml"
+
+    def __init__(self, frame_rate:int=30):
+        self.frame_rate = frame_rate
+
+        #BYTETracker, created on the first frame (ultralytics is only imported once the model is loaded)
+        self.tracker = None
+
+    def update(self, result, frame):
+        """Tracks the objects detected in a frame (one ultralytics Results of model.predict()).
+        Returns the Results with the tracked detections only and their track IDs, like model.track()"""
+        import torch #already imported by ultralytics when the model was loaded
+        if self.tracker is None:
+            from ultralytics.utils import IterableSimpleNamespace, yaml_load
+            from ultralytics.utils.checks import check_yaml
+            from ultralytics.trackers.byte_tracker import BYTETracker
+            self.tracker = BYTETracker(args=IterableSimpleNamespace(**yaml_load(check_yaml(self.tracker_config))), frame_rate=self.frame_rate)
+
+        detections = result.boxes.cpu().numpy()
+        if len(detections) == 0:
+            return result
+        tracks = self.tracker.update(detections, frame)
+        if len(tracks) == 0:
+            #No confirmed track yet: empty Boxes with the columns of tracked boxes (x1, y1, x2, y2, id, conf, cls)
+            result.update(boxes=torch.empty((0, 7)))
+            return result
+        #Same post-processing as model.track(): keep tracked detections only, with their track ID
+        result = result[tracks[:, -1].astype(int)]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return result
+
+    def track(self, model, frame, **kwargs)->list:
+        """Detects and tracks the objects of a frame with 'model' (a YOLO model or a detector backend, anything with predict()).
+        Returns the ultralytics Results, like model.track()"""
+        results = model.predict(frame, verbose=False, **kwargs)
+        results[0] = self.update(results[0], frame)
+        return results
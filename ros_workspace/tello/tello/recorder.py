@@ -0,0 +1,135 @@
+#To encode the video files
+import cv2
+
+#To name, size and rotate the video files
+import os
+from pathlib import Path
+from datetime import datetime
+from time import monotonic
+
+#To encode the frames on a dedicated thread
+from threading import Thread
+from tello.frame_ring import FrameRing, CapturedFrame
+
+
+class VideoRecorder(Thread):
+    """Recording sink usable from any node: write() hands a frame to an encoder thread through a bounded ring buffer, and returns at once.
+    When the encoder falls behind, the oldest frames waiting are dropped (and counted), so recording never slows the node down.
+    - the size of the video is the size of the first frame (a new file is started if the size changes)
+    - the frame rate is measured on the stamps of the first frames, unless it is given
+    - a new file is started every 'max_duration' seconds of stream, or when the file reaches 'max_bytes' bytes (0 to disable).
+      The size is the size on the disk, which grows by the writer's buffer (256 KiB with OpenCV's AVI writer): files can exceed max_bytes by that much
+    The recorder owns the frames it receives: a node must not modify a frame after writing it."""
+
+    #Amount of frames the frame rate is measured on, before the first file is opened
+    fps_frames = 15
+
+    #Amount of frames written between two checks of the file size
+    size_check_period = 30
+
+    def __init__(self, directory="~", prefix:str="output", fourcc:str="MJPG", extension:str=".avi", fps:float=None,
+                 max_duration:float=300.0, max_bytes:int=0, queue_size:int=32, rgb:bool=True, logger=None):
+        super().__init__(name="video_recorder", daemon=True)
+        self.directory = Path(directory).expanduser()
+        self.prefix = prefix
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+        self.fps = fps
+        self.max_duration = max_duration
+        self.max_bytes = max_bytes
+        self.rgb = rgb
+        self.logger = logger
+
+        #Frames waiting to be encoded
+        self.ring = FrameRing(queue_size)
+
+        #File being written, its path, frame size, and stamp of its first frame
+        self.video = None
+        self.path = None
+        self.size = None
+        self.file_start = None
+
+        #Frames kept while the frame rate is measured
+        self.pending = []
+
+        #Amount of frames written, and of files created
+        self.written = 0
+        self.files = 0
+
+    @property
+    def dropped(self)->int:
+        """Amount of frames dropped because the encoder fell behind"""
+        return self.ring.dropped
+
+    def write(self, image, stamp:float=None)->None:
+        """Hands a frame to the encoder. 'stamp' is the time of the frame in seconds (default: the time of the call)"""
+        self.ring.put(CapturedFrame(image, None, monotonic() if stamp is None else stamp))
+
+    def run(self)->None:
+        while True:
+            frame = self.ring.take(0.1)
+            if frame is None:
+                if self.ring.closed:
+                    break
+                continue
+            try:
+                self.encode(frame)
+            except Exception as error: #an error on one frame must not stop the recording
+                if self.logger is not None:
+                    self.logger.error(f"Recording failed on a frame: {error}")
+        #Frames received before the frame rate could be measured
+        if self.pending:
+            self.open(self.pending)
+        self.close_file()
+
+    def encode(self, frame:CapturedFrame)->None:
+        """Writes a frame, opening a new file first if needed"""
+        if self.video is None:
+            self.pending.append(frame)
+            if self.fps is None and len(self.pending) < self.fps_frames:
+                return
+            self.open(self.pending)
+            return
+
+        height, width = frame.image.shape[:2]
+        rotate = (width, height) != self.size or (self.max_duration > 0 and frame.stamp - self.file_start >= self.max_duration)
+        if not rotate and self.max_bytes > 0 and self.written % self.size_check_period == 0:
+            rotate = os.path.getsize(self.path) >= self.max_bytes
+        if rotate:
+            self.close_file()
+            self.open([frame])
+        else:
+            self.write_frame(frame)
+
+    def open(self, frames:list)->None:
+        """Starts a new file and writes the frames given in it"""
+        if self.fps is None:
+            duration = frames[-1].stamp - frames[0].stamp
+            self.fps = (len(frames) - 1) / duration if len(frames) > 1 and duration > 0 else 30.0
+        height, width = frames[0].image.shape[:2]
+        self.size = (width, height)
+        self.file_start = frames[0].stamp
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{self.prefix}_{datetime.now():%Y%m%d_%H%M%S}_{self.files}{self.extension}"
+        self.video = cv2.VideoWriter(str(self.path), self.fourcc, self.fps, self.size)
+        self.files += 1
+        if self.logger is not None:
+            self.logger.info(f"Recording {width}x{height} at {self.fps:.1f} FPS to {self.path}")
+        for frame in frames:
+            self.write_frame(frame)
+        self.pending = []
+
+    def write_frame(self, frame:CapturedFrame)->None:
+        image = cv2.cvtColor(frame.image, cv2.COLOR_RGB2BGR) if self.rgb else frame.image
+        self.video.write(image)
+        self.written += 1
+
+    def close_file(self)->None:
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+    def stop(self, timeout=None)->None:
+        """Stops the recorder once the frames waiting are written, and closes the file"""
+        self.ring.close()
+        self.join(timeout)
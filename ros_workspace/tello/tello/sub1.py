@@ -12,18 +12,15 @@ import numpy as np
 #To convert cv2 images to ROS Image messages
 from cv_bridge import CvBridge
 
-#for object detection
-from ultralytics import YOLO
+#for object detection. The model is loaded on the first frame received
+from time import perf_counter
+from tello.model import get_model, classes_ids, Tracker
 
-
-
-#load the object detection model
-model = YOLO('yolov8n.pt') 
+#To record the detections without slowing the node down
+from tello.recorder import VideoRecorder
 
 #Filtering our classes of interest
-classes = model.names
 classes_needed = ["cell phone"]
-classes_ID = [k for k,v in classes.items() if v in classes_needed]
 
 #Detection threshold probability
 minimum_prob = 0.4  
@@ -44,17 +41,36 @@ class ImageSubscriberDetectedPublisher(Node):
         
         self.cv_bridge = CvBridge()
 
-        #output video initialization
-        self.fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-        self.video = cv2.VideoWriter('~/output.avi',self.fourcc,20.0,(640,480))
+        #output video initialization: the frames are encoded by the recorder's thread, in the directory given by the
+        #recording_directory parameter. A new file is started every recording_duration seconds.
+        self.video = VideoRecorder(self.declare_parameter("recording_directory", "~").value,
+                                   max_duration=self.declare_parameter("recording_duration", 300.0).value,
+                                   logger=self.get_logger())
+        self.video.start()
 
         #Variable to read each frame
         self.image=None
 
+        #object detection model and ids of the classes of interest, set on the first frame
+        self.model = None
+        self.classes_ID = None
+
+        #Tracker of this node's objects (the model is shared by the nodes of the process, but not the tracks)
+        self.tracker = Tracker()
+        self.first_inference = True
+
     
     def detection(self,frame):
-        """Function to perform object detection on frames"""
-        results = model.track(frame, persist=True, classes=classes_ID, conf=minimum_prob)
+        """Function to perform object detection on frames.
+        The model is loaded (or taken from the other nodes of the process) on the first call."""
+        if self.model is None:
+            self.model = get_model('yolov8n.pt', self.get_logger())
+            self.classes_ID = classes_ids(self.model, classes_needed)
+        start = perf_counter()
+        results = self.tracker.track(self.model, frame, classes=self.classes_ID, conf=minimum_prob)
+        if self.first_inference:
+            self.get_logger().info(f"First inference done in {perf_counter() - start:.2f}s")
+            self.first_inference = False
         frame_ = results[0].plot()
         return frame_
         
@@ -62,11 +78,12 @@ class ImageSubscriberDetectedPublisher(Node):
         """Callback function for the subscriber node (to topic image_raw).
         For each image received, save in the log that an image has been received.
         Then convert that image into cv2 format, perform detection on that image, 
-        and write the frame on the output video."""
+        and hand the frame to the recorder of the output video."""
         self.get_logger().info('I saw an image')
         image = self.cv_bridge.imgmsg_to_cv2(img,'rgb8')
         self.image = self.detection(image)
-        self.video.write(np.array(self.image))
+        stamp = img.header.stamp.sec + img.header.stamp.nanosec * 1e-9
+        self.video.write(self.image, stamp if stamp > 0 else None)
           
     def timer_callback(self):
         """callback funtion for the publisher node (to topis image_detected).
@@ -85,8 +102,9 @@ def main(args=None):
     #execute the callback function until the global executor is shutdown
     rclpy.spin(image_subscriber)
 
-    #release the video output writer.
-    image_subscriber.video.release()
+    #write the frames waiting and release the video output writer.
+    image_subscriber.video.stop(timeout=5.0)
+    image_subscriber.get_logger().info(f"{image_subscriber.video.written} frames recorded, {image_subscriber.video.dropped} dropped")
     image_subscriber.destroy_node()
     
     rclpy.shutdown()
@@ -0,0 +1,103 @@
+from tello.frame_ring import FrameRing, CapturedFrame
+from tello.recorder import VideoRecorder
+import cv2
+import numpy as np
+import pytest
+
+
+def frame(seq=None, stamp=0.0, size=(64, 48)):
+    return CapturedFrame(np.zeros((size[1], size[0], 3), dtype=np.uint8), seq, stamp)
+
+
+def images(count, size=(64, 48), seed=0):
+    #Noise, so that the files grow with each frame
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+def videos(directory):
+    """Files of a directory, in the order they were created, with their frame count and frame rate"""
+    result = []
+    for path in sorted(directory.iterdir(), key=lambda path: int(path.stem.rsplit("_", 1)[1])):
+        capture = cv2.VideoCapture(str(path))
+        result.append((int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), capture.get(cv2.CAP_PROP_FPS)))
+        capture.release()
+    return result
+
+
+def test_ring_drops_the_oldest():
+    ring = FrameRing(2)
+    for seq in range(3):
+        ring.put(frame(seq))
+    assert (ring.received, ring.dropped, len(ring)) == (3, 1, 2)
+    assert [ring.take(0).seq for _ in range(2)] == [1, 2]
+    assert ring.take(0) is None
+
+
+def test_ring_numbers_the_frames():
+    ring = FrameRing(4)
+    ring.put(frame(seq=10))
+    ring.put(frame())
+    ring.put(frame())
+    assert [ring.take(0).seq for _ in range(3)] == [10, 1, 2]
+
+
+def test_ring_close_releases_the_consumer():
+    ring = FrameRing()
+    ring.close()
+    assert ring.closed
+    assert ring.take() is None
+
+
+def test_recorder_drops_the_oldest(tmp_path):
+    recorder = VideoRecorder(tmp_path, fps=10.0, queue_size=4)
+    #The encoder isn't started: the ring fills up
+    for index, image in enumerate(images(6)):
+        recorder.write(image, stamp=index * 0.1)
+    recorder.start()
+    recorder.stop(timeout=5.0)
+    assert recorder.dropped == 2
+    assert recorder.written == 4
+    assert videos(tmp_path) == [(4, 10.0)]
+
+
+def test_recorder_measures_the_frame_rate(tmp_path):
+    recorder = VideoRecorder(tmp_path)
+    recorder.start()
+    for index, image in enumerate(images(20)):
+        recorder.write(image, stamp=index / 12.5)
+    recorder.stop(timeout=5.0)
+    assert recorder.fps == pytest.approx(12.5)
+    assert recorder.dropped == 0
+    assert videos(tmp_path) == [(20, pytest.approx(12.5))]
+
+
+def test_recorder_rotates_by_duration(tmp_path):
+    recorder = VideoRecorder(tmp_path, fps=10.0, max_duration=1.0)
+    recorder.start()
+    for index, image in enumerate(images(25)):
+        recorder.write(image, stamp=index * 0.1)
+    recorder.stop(timeout=5.0)
+    assert recorder.files == 3
+    assert [count for count, _ in videos(tmp_path)] == [10, 10, 5]
+
+
+def test_recorder_rotates_by_size(tmp_path):
+    #The size is checked every size_check_period frames: any file is too large then.
+    #The frames are large enough for the writer to flush its buffer (256 KiB) to the disk before the check.
+    recorder = VideoRecorder(tmp_path, fps=10.0, max_duration=0, max_bytes=1, queue_size=100)
+    recorder.start()
+    for index, image in enumerate(images(70, size=(320, 240))):
+        recorder.write(image, stamp=index * 0.1)
+    recorder.stop(timeout=5.0)
+    period = VideoRecorder.size_check_period
+    assert [count for count, _ in videos(tmp_path)] == [period, period, 70 - 2 * period]
+
+
+def test_recorder_rotates_when_the_size_changes(tmp_path):
+    recorder = VideoRecorder(tmp_path, fps=10.0)
+    recorder.start()
+    for index, image in enumerate(images(3) + images(2, size=(32, 24))):
+        recorder.write(image, stamp=index * 0.1)
+    recorder.stop(timeout=5.0)
+    assert [count for count, _ in videos(tmp_path)] == [3, 2]